@@ -5,22 +5,35 @@ Custom context manager for handling SQLite connections.
 - Ensures connection open/close.
 - Commits on success; rolls back on exception.
 - Creates 'users' table and seeds sample data if empty before SELECT.
+- Opens connections through the shared backend layer (backends.py).
 """
 
+import os
 import sqlite3
+import sys
+
+try:
+    from backends import Backend, SQLiteBackend
+except ImportError:
+    # the backend layer lives in the sibling generators directory
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 os.pardir, "python-generators-0x00"))
+    from backends import Backend, SQLiteBackend
 
 
 class DatabaseConnection:
     """Context manager to handle DB connection automatically"""
 
-    def __init__(self, db_name: str = "my_database.db"):
+    def __init__(self, db_name: str = "my_database.db",
+                 backend: Backend | None = None):
         self.db_name = db_name
+        self.backend = backend or SQLiteBackend(db_name)
         self.conn: sqlite3.Connection | None = None
-        self.cursor: sqlite3.Cursor | None = None
+        self.cursor = None
 
-    def __enter__(self) -> sqlite3.Cursor:
-        self.conn = sqlite3.connect(self.db_name)
-        self.cursor = self.conn.cursor()
+    def __enter__(self):
+        self.conn = self.backend.connect()
+        self.cursor = self.backend.cursor(self.conn)
         return self.cursor
 
     def __exit__(self, exc_type, exc_value, traceback):
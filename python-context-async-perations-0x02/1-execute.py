@@ -5,27 +5,55 @@ Reusable query execution context manager.
 - Manages connection + execution.
 - Returns fetched results from __enter__.
 - Commits on success; rolls back on exception.
+- Calls every ExecuteQuery.write_hooks(db_name, query) after a write commits, so
+  caches can drop results that depend on the tables a statement wrote
+  (query_cache.note_write, registered by default).
+- Opens connections through the shared backend layer (backends.py).
 - Includes schema creation + seed before demo run.
 """
 
+import os
 import sqlite3
-from typing import Iterable, Tuple
+import sys
+from typing import Callable, Iterable, List, Tuple
+
+try:
+    from query_cache import note_write
+except ImportError:
+    # the query cache lives in the sibling decorators directory
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 os.pardir, "python-decorators-0x01"))
+    from query_cache import note_write
+
+try:
+    from backends import Backend, SQLiteBackend
+except ImportError:
+    # the backend layer lives in the sibling generators directory
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 os.pardir, "python-generators-0x00"))
+    from backends import Backend, SQLiteBackend
 
 
 class ExecuteQuery:
     """Context manager for executing queries with params"""
 
-    def __init__(self, query: str, params: Iterable | Tuple = (), db_name: str = "my_database.db"):
-        self.db_name = db_name
+    #: callables run with (db_name, query) after a write commits
+    write_hooks: List[Callable[[str, str], object]] = [note_write]
+
+    def __init__(self, query: str, params: Iterable | Tuple = (), db_name: str = "my_database.db",
+                 backend: Backend | None = None):
+        self.backend = backend or SQLiteBackend(db_name)
+        # write hooks key caches by the file actually written
+        self.db_name = getattr(self.backend, "path", db_name)
         self.query = query
         self.params = tuple(params) if params else ()
         self.conn: sqlite3.Connection | None = None
-        self.cursor: sqlite3.Cursor | None = None
+        self.cursor = None
         self.result = None
 
     def __enter__(self):
-        self.conn = sqlite3.connect(self.db_name)
-        self.cursor = self.conn.cursor()
+        self.conn = self.backend.connect()
+        self.cursor = self.backend.cursor(self.conn)
         self.cursor.execute(self.query, self.params)
         self.result = self.cursor.fetchall()
         return self.result
@@ -33,16 +61,22 @@ class ExecuteQuery:
     def __exit__(self, exc_type, exc_value, traceback):
         if not self.conn:
             return False
-        if exc_type is None:
-            self.conn.commit()
-        else:
-            self.conn.rollback()
-        self.conn.close()
+        try:
+            if exc_type is None:
+                self.conn.commit()
+                # statements without a result set are DML/DDL
+                if self.cursor.description is None:
+                    for hook in self.write_hooks:
+                        hook(self.db_name, self.query)
+            else:
+                self.conn.rollback()
+        finally:
+            self.conn.close()
         return False
 
 
 def _ensure_schema_and_seed(db_name: str = "my_database.db") -> None:
-    with sqlite3.connect(db_name) as conn:
+    with SQLiteBackend(db_name).connect() as conn:
         cur = conn.cursor()
         cur.execute(
             """
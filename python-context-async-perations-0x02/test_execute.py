@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Unit tests for the ExecuteQuery context manager."""
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+ExecuteQuery = __import__('1-execute').ExecuteQuery
+
+import query_cache  # noqa: E402  (made importable by 1-execute)
+from query_cache import QueryCache, database_id, set_cache  # noqa: E402
+
+
+class TestExecuteQuery(unittest.TestCase):
+    """Test suite for ExecuteQuery's commits and write hooks."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.db = os.path.join(self.dir.name, "my_database.db")
+        with ExecuteQuery("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                          "name TEXT, age INTEGER)", db_name=self.db):
+            pass
+        self.addCleanup(set_cache, query_cache._cache)
+        self.cache = set_cache(QueryCache())
+
+    def test_select_returns_rows(self):
+        with ExecuteQuery("INSERT INTO users (name, age) VALUES (?, ?)",
+                          ("Ada", 30), db_name=self.db):
+            pass
+        with ExecuteQuery("SELECT name FROM users WHERE age > ?", (25,),
+                          db_name=self.db) as rows:
+            self.assertEqual(rows, [("Ada",)])
+
+    def test_runs_through_the_backend_layer(self):
+        """Connections and cursors come from backends.SQLiteBackend."""
+        from backends import SQLiteBackend
+        backend = SQLiteBackend(self.db)
+        with ExecuteQuery("INSERT INTO users (name, age) VALUES (%s, %s)",
+                          ("Bayo", 41), backend=backend):
+            pass
+        with ExecuteQuery("SELECT name FROM users WHERE age > ?", (40,),
+                          db_name=self.db) as rows:
+            self.assertEqual(rows, [("Bayo",)])
+        self.assertEqual(ExecuteQuery("SELECT 1", backend=backend).db_name,
+                         self.db)
+
+    def test_writes_invalidate_the_query_cache(self):
+        """note_write is registered by default and bumps the table version."""
+        versions = self.cache.versions
+        before = versions.current(database_id(self.db), {"users"})["users"]
+        with ExecuteQuery("UPDATE users SET age = age + 1", db_name=self.db):
+            pass
+        self.assertEqual(versions.current(database_id(self.db), {"users"}),
+                         {"users": before + 1})
+
+    def test_failing_hook_still_closes_the_connection(self):
+        def broken_hook(db_name, query):
+            raise RuntimeError("hook failed")
+
+        manager = ExecuteQuery("DELETE FROM users", db_name=self.db)
+        with patch.object(ExecuteQuery, "write_hooks", [broken_hook]):
+            with self.assertRaises(RuntimeError):
+                with manager:
+                    pass
+        with self.assertRaises(sqlite3.ProgrammingError):
+            manager.conn.execute("SELECT 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,21 +1,46 @@
-import sqlite3
+import random
 import functools
-from datetime import datetime
+from time import perf_counter
+
+from db_pool import SQLiteBackend
+from query_log import get_logger
+
+def log_queries(func=None, *, logger=None):
+    """
+    Decorator that logs each SQL query as a structured record (timestamp,
+    duration, row count, parameter fingerprint, error) through a
+    background writer; see query_log.py. Calls outside the sample, or with
+    logging disabled, skip the timing and the record entirely.
+    """
+    if func is None:
+        return functools.partial(log_queries, logger=logger)
 
-def log_queries(func):
-    """Decorator that logs the SQL query with a timestamp before executing."""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # extract the SQL string
+        log = logger or get_logger()
+        if not log.enabled or (log.sample_rate < 1.0 and random.random() >= log.sample_rate):
+            return func(*args, **kwargs)
+        # extract the SQL string and its parameters
         query = kwargs.get('query') if 'query' in kwargs else (args[0] if args else None)
-        ts = datetime.now().isoformat(sep=' ', timespec='seconds')
-        print(f"[{ts}] Executing SQL query: {query}")
-        return func(*args, **kwargs)
+        params = kwargs.get('params') if 'params' in kwargs else (args[1] if len(args) > 1 else None)
+        error = None
+        rows = None
+        start = perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            if isinstance(result, (list, tuple)):
+                rows = len(result)
+            return result
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            log.record(query, params, perf_counter() - start, rows, error)
     return wrapper
 
 @log_queries
 def fetch_all_users(query):
-    conn = sqlite3.connect('users.db')
+    conn = SQLiteBackend('users.db').connect()
     cursor = conn.cursor()
     cursor.execute(query)
     results = cursor.fetchall()
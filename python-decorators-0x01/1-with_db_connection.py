@@ -1,16 +1,5 @@
-import sqlite3
-import functools
-
-def with_db_connection(func):
-    """Decorator that opens a sqlite3 connection, passes it to the function, then closes it."""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper
+# borrows a pooled sqlite3 connection, passes it to the function, then returns it
+from db_pool import with_db_connection
 
 @with_db_connection
 def get_user_by_id(conn, user_id):
@@ -1,21 +1,35 @@
-import sqlite3
 import functools
 
-def transactional(func):
-    """Decorator that wraps a function in a transaction (commit/rollback)."""
+from transactions import current_connection, get_committer, transaction
+
+def transactional(func=None, *, group_commit=False):
+    """
+    Decorator that wraps a function in a transaction (commit/rollback).
+
+    The function gets the ambient connection: a pooled one for the
+    outermost call, and the caller's (inside a SAVEPOINT) when it runs
+    within another @transactional function or transaction() block.
+    With group_commit=True, concurrent calls are committed together by
+    the process-wide GroupCommitter (see transactions.py), trading up to
+    its window of latency for one fsync per group.
+
+    Tables written inside the transaction are recorded and, once it
+    commits, cached reads of them (see 4-cache_query.py) are invalidated.
+    """
+    if func is None:
+        return functools.partial(transactional, group_commit=group_commit)
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
         try:
-            result = func(conn, *args, **kwargs)
-            conn.commit()
-            return result
+            # joining an open transaction must not wait on another commit
+            if group_commit and current_connection() is None:
+                return get_committer().run(lambda conn: func(conn, *args, **kwargs))
+            with transaction() as conn:
+                return func(conn, *args, **kwargs)
         except Exception as e:
-            conn.rollback()
             print(f"Rolled back due to: {e}")
             raise
-        finally:
-            conn.close()
     return wrapper
 
 @transactional
@@ -1,35 +1,95 @@
 import time
-import sqlite3
+import asyncio
 import functools
 
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper
-
-def retry_on_failure(retries=3, delay=2):
+from db_pool import with_db_connection
+from retry_policy import CircuitBreaker, full_jitter, is_transient, retry_budget
+
+def retry_on_failure(retries=3, delay=2, max_delay=30, retry_on=is_transient,
+                     budget=None, breaker=None, sleep=time.sleep):
+    """
+    Decorator that makes up to `retries` (at least 1) attempts, sleeping a full-jitter
+    exponential backoff (`delay` * 2**n, capped at `max_delay`) between them.
+
+    Only errors `retry_on` accepts are retried (by default: database busy
+    or locked); anything else is raised at once. Each retry spends a token
+    from `budget` (the process-wide retry_budget by default) and gives up
+    when it is empty. Transient failures feed a per-function
+    CircuitBreaker (`wrapper.breaker`) that fails fast with
+    CircuitOpenError while the database is down.
+    """
+    if retries < 1:
+        raise ValueError("retries must be at least 1")
+
     def decorator(func):
+        circuit = breaker or CircuitBreaker()
+        tokens = budget or retry_budget
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exc = None
-            for attempt in range(1, retries + 1):
+            for attempt in range(retries):
+                circuit.allow()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    pause = _after_failure(e, attempt, retries, delay,
+                                           max_delay, retry_on, tokens, circuit)
+                    print(f"Attempt {attempt + 1} failed ({e}). Retrying in {pause:.2f}s...")
+                    sleep(pause)
+                except BaseException:
+                    # cancelled or interrupted: free a half-open probe slot
+                    circuit.release_probe()
+                    raise
+                else:
+                    circuit.record_success()
+                    return result
+        wrapper.breaker = circuit
+        return wrapper
+    return decorator
+
+def async_retry_on_failure(retries=3, delay=2, max_delay=30, retry_on=is_transient,
+                           budget=None, breaker=None, sleep=asyncio.sleep):
+    """retry_on_failure for coroutine functions: awaits between attempts."""
+    if retries < 1:
+        raise ValueError("retries must be at least 1")
+
+    def decorator(func):
+        circuit = breaker or CircuitBreaker()
+        tokens = budget or retry_budget
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(retries):
+                circuit.allow()
                 try:
-                    return func(*args, **kwargs)
+                    result = await func(*args, **kwargs)
                 except Exception as e:
-                    last_exc = e
-                    if attempt == retries:
-                        raise
-                    print(f"Attempt {attempt} failed ({e}). Retrying in {delay}s...")
-                    time.sleep(delay)
-            raise last_exc
+                    pause = _after_failure(e, attempt, retries, delay,
+                                           max_delay, retry_on, tokens, circuit)
+                    print(f"Attempt {attempt + 1} failed ({e}). Retrying in {pause:.2f}s...")
+                    await sleep(pause)
+                except BaseException:
+                    # cancelled or interrupted: free a half-open probe slot
+                    circuit.release_probe()
+                    raise
+                else:
+                    circuit.record_success()
+                    return result
+        wrapper.breaker = circuit
         return wrapper
     return decorator
 
+def _after_failure(exc, attempt, retries, delay, max_delay, retry_on, budget, breaker):
+    """Re-raise `exc` unless it should be retried; return the backoff delay."""
+    if not retry_on(exc):
+        # says nothing about the database's health: leave the state alone
+        breaker.release_probe()
+        raise exc
+    breaker.record_failure()
+    if attempt == retries - 1 or not budget.try_acquire():
+        raise exc
+    return full_jitter(attempt, delay, max_delay)
+
 @with_db_connection
 @retry_on_failure(retries=3, delay=1)
 def fetch_users_with_retry(conn):
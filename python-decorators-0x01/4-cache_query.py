@@ -1,37 +1,147 @@
-import sqlite3
+import asyncio
 import functools
+import inspect
+import math
+import time
 
-query_cache = {}
+from db_pool import with_db_connection
+from query_cache import (MISSING, adatabase_of, database_of, get_cache,
+                         is_read, make_key, note_write, tables_read)
+from single_flight import AsyncSingleFlight, SingleFlight
 
-def cache_query(func):
-    @functools.wraps(func)
-    def wrapper(conn, *args, **kwargs):
+
+def cache_query(func=None, *, cache=None, ttl=MISSING, stale_ttl=None):
+    """
+    Decorator that caches query results keyed on (database, query, params).
+
+    Use bare (@cache_query) or with options (@cache_query(ttl=30)).
+    Writes (anything but SELECT/WITH) always run, are never cached and
+    invalidate cached reads of the tables they touch; entries also go
+    stale when a @transactional write commits to one of their tables.
+    Results go to the active cache (query_cache.get_cache(): in-process
+    LRU, or a SQLite file / Redis server shared by every worker, picked
+    with QUERY_CACHE_URL) unless `cache` is given.
+    Hit/miss/eviction counters are in `get_cache().stats`.
+
+    Concurrent misses for one key are coalesced: a single caller runs the
+    query and the others wait for its result (`wrapper.flight.stats`).
+    With stale_ttl, results older than ttl are still served for another
+    stale_ttl seconds while one caller refreshes them.
+    Coroutine functions (e.g. taking an aiosqlite connection) get an
+    async wrapper.
+    """
+    if func is None:
+        return functools.partial(cache_query, cache=cache, ttl=ttl,
+                                 stale_ttl=stale_ttl)
+    is_async = inspect.iscoroutinefunction(func)
+    flight = AsyncSingleFlight() if is_async else SingleFlight()
+
+    def arguments(args, kwargs):
+        store = cache if cache is not None else get_cache()
         query = kwargs.get('query') if 'query' in kwargs else (args[0] if args else None)
-        if query in query_cache:
-            print(f"[cache] hit for {query}")
-            return query_cache[query]
+        params = kwargs.get('params') if 'params' in kwargs else (args[1] if len(args) > 1 else ())
+        return store, query, params
+
+    def key_of(db, query, params):
+        key = make_key(db, query, params)
+        # stale_ttl entries are stored as (fresh_until, result): keep them
+        # apart from plain entries for the same query
+        return key if stale_ttl is None else key + ("swr",)
 
-        result = func(conn, *args, **kwargs)
-        query_cache[query] = result
+    def lookup(store, key, count=True):
+        """Cached (result, fresh), or (MISSING, False)."""
+        cached = store.get(key, MISSING, count=count)
+        if cached is MISSING or stale_ttl is None:
+            return cached, cached is not MISSING
+        fresh_until, result = cached
+        return result, fresh_until > time.time()
+
+    def save(store, key, query, result, deps):
+        if stale_ttl is None:
+            store.set(key, result, ttl, deps=deps)
+        else:
+            life = store.ttl if ttl is MISSING else ttl
+            fresh_until = time.time() + life if life is not None else math.inf
+            store.set(key, (fresh_until, result),
+                      life + stale_ttl if life is not None else None, deps=deps)
         print(f"[cache] set for {query}")
-        return result
-    return wrapper
 
-def with_db_connection(func):
+    def cached(key, query, result, fresh):
+        """True if `result` may be returned without running the query."""
+        if fresh:
+            print(f"[cache] hit for {query}")
+            return True
+        if result is not MISSING and flight.busy(key):
+            print(f"[cache] stale for {query}")
+            return True
+        return False
+
     @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
+    def wrapper(conn, *args, **kwargs):
+        store, query, params = arguments(args, kwargs)
+        db = database_of(conn)
+        if not is_read(query):
+            try:
+                return func(conn, *args, **kwargs)
+            finally:
+                note_write(db, query, store.versions)
+        key = key_of(db, query, params)
+        result, fresh = lookup(store, key)
+        if cached(key, query, result, fresh):
+            return result
+
+        def load():
+            # the previous leader may have saved since our lookup
+            result, fresh = lookup(store, key, count=False)
+            if fresh:
+                return result
+            # stamp versions before running so a concurrent write wins
+            deps = store.versions_of(db, tables_read(query))
+            result = func(conn, *args, **kwargs)
+            save(store, key, query, result, deps)
+            return result
+        return flight.do(key, load)
+
+    async def offload(store, fn, *args):
+        # SQLite / Redis caches do blocking I/O: keep it off the event loop
+        if store.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    @functools.wraps(func)
+    async def async_wrapper(conn, *args, **kwargs):
+        store, query, params = arguments(args, kwargs)
+        db = await adatabase_of(conn)
+        if not is_read(query):
+            try:
+                return await func(conn, *args, **kwargs)
+            finally:
+                await offload(store, note_write, db, query, store.versions)
+        key = key_of(db, query, params)
+        result, fresh = await offload(store, lookup, store, key)
+        if cached(key, query, result, fresh):
+            return result
+
+        async def load():
+            result, fresh = await offload(store, lookup, store, key, False)
+            if fresh:
+                return result
+            deps = await offload(store, store.versions_of, db,
+                                 tables_read(query))
+            result = await func(conn, *args, **kwargs)
+            await offload(store, save, store, key, query, result, deps)
+            return result
+        return await flight.do(key, load)
+
+    wrapper = async_wrapper if is_async else wrapper
+    wrapper.flight = flight
     return wrapper
 
 @with_db_connection
 @cache_query
-def fetch_users_with_cache(conn, query):
+def fetch_users_with_cache(conn, query, params=()):
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
 if __name__ == "__main__":
@@ -39,3 +149,4 @@ if __name__ == "__main__":
     print(users)
     users_again = fetch_users_with_cache(query="SELECT * FROM users")
     print(users_again)
+    print(get_cache().stats)
@@ -0,0 +1,49 @@
+import functools
+from time import perf_counter
+
+from db_pool import with_db_connection
+from query_profile import get_registry, serve_metrics  # noqa: F401
+
+def profile_query(func=None, *, registry=None):
+    """
+    Decorator that records each call's latency, row count and errors in a
+    per-normalised-SQL profile (see query_profile.py). Calls slower than
+    the registry's slow_threshold also capture EXPLAIN QUERY PLAN through
+    the function's connection.
+    """
+    if func is None:
+        return functools.partial(profile_query, registry=registry)
+
+    @functools.wraps(func)
+    def wrapper(conn, *args, **kwargs):
+        query = kwargs.get('query') if 'query' in kwargs else (args[0] if args else None)
+        params = kwargs.get('params') if 'params' in kwargs else (args[1] if len(args) > 1 else ())
+        rows = None
+        error = None
+        start = perf_counter()
+        try:
+            result = func(conn, *args, **kwargs)
+            if isinstance(result, (list, tuple)):
+                rows = len(result)
+            return result
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            (registry or get_registry()).observe(
+                query, perf_counter() - start, rows, error, conn, params)
+    return wrapper
+
+@with_db_connection
+@profile_query
+def fetch_users(conn, query, params=()):
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+if __name__ == "__main__":
+    for user_id in range(1, 6):
+        fetch_users(query="SELECT * FROM users WHERE id = ?", params=(user_id,))
+    fetch_users(query="SELECT * FROM users")
+    print(get_registry().to_json())
+    print(get_registry().to_prometheus())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-call overhead of the log_queries decorator.
+
+    python bench_log_queries.py [calls]
+
+Times a no-op query function bare and wrapped with logging disabled,
+sampled at 1% and fully enabled (records go to os.devnull), and prints
+the overhead per call over the bare function.
+"""
+import os
+import sys
+import time
+
+from query_log import QueryLogger
+
+log_queries = __import__('0-log_queries').log_queries
+
+
+def query(query, params=()):
+    return [(1, "ada")]
+
+
+def per_call(func, calls):
+    """Best-of-5 time per call, in microseconds."""
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func("SELECT * FROM users WHERE id = ?", (1,))
+        best = min(best, time.perf_counter() - start)
+    return best / calls * 1e6
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    sink = open(os.devnull, "w")
+    bare = per_call(query, calls)
+    print(f"{'bare':<10} {bare:7.3f}us/call")
+    for label, logger in [
+        ("disabled", QueryLogger(sink=sink, enabled=False)),
+        ("sampled", QueryLogger(sink=sink, sample_rate=0.01)),
+        ("enabled", QueryLogger(sink=sink, max_pending=10 * calls)),
+    ]:
+        cost = per_call(log_queries(logger=logger)(query), calls)
+        logger.close()
+        print(f"{label:<10} {cost:7.3f}us/call overhead={cost - bare:7.3f}us "
+              f"written={logger.written} dropped={logger.dropped}")
+    sink.close()
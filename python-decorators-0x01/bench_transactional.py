@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: inserts/sec through the transactional decorator.
+
+    python bench_transactional.py [inserts] [threads]
+
+Inserts into a scratch users table (synchronous=FULL, so every commit
+pays an fsync) three ways: a new connection and commit per insert (the
+old decorator), @transactional on pooled connections, and
+@transactional(group_commit=True). Each runs `threads` writer threads.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import db_pool
+import transactions
+
+transactional = __import__('2-transactional').transactional
+
+PRAGMAS = dict(db_pool.DEFAULT_PRAGMAS, synchronous="FULL")
+
+
+def insert(conn, n):
+    conn.execute("INSERT INTO users (username, email) VALUES (?, ?)",
+                 (f"user{n}", f"user{n}@example.com"))
+
+
+def connect_per_call(path):
+    def add(n):
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            conn.execute("PRAGMA synchronous = FULL")
+            insert(conn, n)
+            conn.commit()
+        finally:
+            conn.close()
+    return add
+
+
+def run(label, add, inserts, threads):
+    per_thread = inserts // threads
+
+    def worker(t):
+        for i in range(per_thread):
+            add(t * per_thread + i)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    rate = per_thread * threads / elapsed
+    print(f"{label:<14} {rate:10.0f} inserts/s  ({elapsed:.2f}s)")
+    return rate
+
+
+def fresh_db(directory, name):
+    path = os.path.join(directory, name)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                 "username TEXT, email TEXT)")
+    conn.close()
+    return path
+
+
+if __name__ == "__main__":
+    inserts = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    with tempfile.TemporaryDirectory() as directory:
+        before = run("connect+commit", connect_per_call(fresh_db(directory, "a.db")),
+                     inserts, threads)
+
+        db_pool.configure_pool(database=fresh_db(directory, "b.db"), pragmas=PRAGMAS)
+        run("pooled", transactional(insert), inserts, threads)
+
+        db_pool.configure_pool(database=fresh_db(directory, "c.db"), pragmas=PRAGMAS)
+        after = run("group commit", transactional(group_commit=True)(insert),
+                    inserts, threads)
+        committer = transactions.get_committer()
+        committer.close()
+        print(f"group commit: {committer.calls} inserts in {committer.commits} "
+              f"commits; speedup {after / before:.1f}x")
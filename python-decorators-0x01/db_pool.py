@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Pooled sqlite3 connections for the with_db_connection decorator.
+
+Opening a connection per call means re-reading the schema, re-running
+PRAGMAs and re-preparing every statement. Pooled connections are set up
+once and keep sqlite3's per-connection prepared-statement cache warm.
+
+Two pooling modes are available:
+
+    queue   at most `size` connections shared by all threads (LIFO, so the
+            warmest connection is reused first); get() waits up to
+            `timeout` seconds and then raises PoolError
+    thread  one connection per thread (at most `size` threads), reused
+            until the thread exits or the pool is closed
+
+`timeout` only bounds the wait for a pooled connection; how long a
+statement waits on another connection's lock is `busy_timeout`.
+
+The default pool is configured with configure_pool() or the DB_POOL_SIZE,
+DB_POOL_MODE, DB_POOL_TIMEOUT and DB_POOL_WAL environment variables.
+Connections are opened through the shared backend layer
+(backends.SQLiteBackend).
+"""
+import functools
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import weakref
+from contextlib import contextmanager
+
+try:
+    from backends import SQLiteBackend
+except ImportError:
+    # the backend layer lives in the sibling generators directory
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 os.pardir, "python-generators-0x00"))
+    from backends import SQLiteBackend
+
+#: applied once to every new connection
+DEFAULT_PRAGMAS = {
+    "cache_size": -16000,
+    "temp_store": "MEMORY",
+}
+
+#: applied before `pragmas` with wal=True; journal_mode=WAL is stored in
+#: the database file, so every later user of the file gets it too
+WAL_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+}
+
+
+class PoolError(Exception):
+    """No pooled connection could be handed out."""
+
+
+class _ThreadConnection:
+    """A thread's connection; dropped with the thread's locals on exit."""
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class ConnectionPool:
+    """
+    Pool of sqlite3 connections to one database file.
+
+    `cached_statements` sizes each connection's prepared-statement LRU.
+    Connections left inside a transaction are rolled back on release, the
+    same thing closing them used to do. In thread mode `size` caps the
+    number of threads holding a connection, and a thread's connection is
+    closed when the thread exits. `backend` opens the connections (a
+    backends.SQLiteBackend on `database` by default).
+
+    `timeout` is how long get() waits for a free connection and
+    `busy_timeout` how long a statement waits for a database lock, both
+    in seconds. wal=True switches the database file to WAL mode.
+    """
+
+    def __init__(self, database="users.db", size=8, mode="queue",
+                 timeout=30.0, pragmas=None, cached_statements=256,
+                 backend=None, busy_timeout=5.0, wal=False):
+        if mode not in ("queue", "thread"):
+            raise ValueError(f"unknown pool mode: {mode!r}")
+        self.database = database
+        self.size = size
+        self.mode = mode
+        self.timeout = timeout
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        if wal:
+            self.pragmas = {**WAL_PRAGMAS, **self.pragmas}
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+        self.backend = backend or SQLiteBackend(
+            database, timeout=busy_timeout,
+            cached_statements=cached_statements)
+        self.created = 0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._all = set()
+        # borrowed connection -> nesting depth (thread mode hands the same
+        # connection to nested borrows)
+        self._busy = {}
+        # borrowed when close() ran: closed on their final release
+        self._retired = set()
+        # thread-mode connection -> finalizer run when its thread exits
+        self._finalizers = {}
+        # reentrant: a finalizer can run while this thread holds the lock
+        self._lock = threading.RLock()
+
+    def connect(self):
+        """Open and set up a new connection."""
+        conn = self.backend.connect()
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        # load the schema now rather than on the first borrowed query
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        with self._lock:
+            self.created += 1
+        return conn
+
+    def get(self):
+        """Borrow a connection; give it back with release()."""
+        if self.mode == "thread":
+            return self._get_thread()
+        self._acquire_slot()
+        try:
+            with self._lock:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = None
+                else:
+                    self._busy[conn] = 1
+            if conn is None:
+                conn = self.connect()
+                with self._lock:
+                    self._all.add(conn)
+                    self._busy[conn] = 1
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _get_thread(self):
+        holder = getattr(self._local, "holder", None)
+        if holder is not None:
+            conn = holder.conn
+            with self._lock:
+                self._busy[conn] = self._busy.get(conn, 0) + 1
+            return conn
+        # the slot is held for as long as the thread keeps its connection
+        self._acquire_slot()
+        try:
+            conn = self.connect()
+        except BaseException:
+            self._slots.release()
+            raise
+        holder = self._local.holder = _ThreadConnection(conn)
+        with self._lock:
+            self._all.add(conn)
+            self._busy[conn] = 1
+            self._finalizers[conn] = weakref.finalize(holder, self._retire, conn)
+        return conn
+
+    def _acquire_slot(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError(
+                f"no connection available within {self.timeout}s "
+                f"(pool size {self.size})"
+            )
+
+    def release(self, conn):
+        with self._lock:
+            depth = self._busy.pop(conn, 1) - 1
+            if depth > 0:
+                self._busy[conn] = depth
+                return
+            retired = conn in self._retired
+            self._retired.discard(conn)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            retired = True
+        if self.mode == "thread":
+            if retired:
+                holder = getattr(self._local, "holder", None)
+                if holder is not None and holder.conn is conn:
+                    self._local.holder = None
+                self._discard(conn)
+            return
+        try:
+            if retired:
+                self._discard(conn)
+            else:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.get()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def _retire(self, conn):
+        """Close `conn`, or mark it to be closed when it is released."""
+        with self._lock:
+            if conn not in self._all:
+                return
+            if conn in self._busy:
+                self._retired.add(conn)
+                return
+        self._discard(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._all.discard(conn)
+            finalizer = self._finalizers.pop(conn, None)
+        if finalizer is not None:
+            finalizer.detach()
+            self._slots.release()
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        """
+        Close every idle connection; borrowed ones are closed when they are
+        released. The pool opens new connections if it is used again.
+        """
+        with self._lock:
+            self._idle = queue.LifoQueue()
+            conns = list(self._all)
+        for conn in conns:
+            self._retire(conn)
+        self._local = threading.local()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_pool_settings = {
+    "database": "users.db",
+    "size": int(os.environ.get("DB_POOL_SIZE", 8)),
+    "mode": os.environ.get("DB_POOL_MODE", "queue"),
+    "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+    "wal": os.environ.get("DB_POOL_WAL", "0") not in ("", "0"),
+}
+
+
+def configure_pool(**settings):
+    """
+    Change the settings (any ConnectionPool argument) used by
+    with_db_connection. The current pool is closed and rebuilt on next use.
+    """
+    global _pool
+    with _pool_lock:
+        _pool_settings.update(settings)
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_pool():
+    """Return this process's pool, creating it on first use or after a fork."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool(**_pool_settings)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def with_db_connection(func=None, *, pool=None):
+    """
+    Decorator that borrows a pooled sqlite3 connection, passes it to the
+    function as its first argument, then hands it back to the pool.
+    """
+    if func is None:
+        return functools.partial(with_db_connection, pool=pool)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with (pool or get_pool()).connection() as conn:
+            return func(conn, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,649 @@
+#!/usr/bin/env python3
+"""
+Bounded query-result cache used by the cache_query decorator.
+
+Entries are keyed on (database, sql, params) and evicted least-recently-
+used once `max_entries` or `max_bytes` is exceeded, or dropped when older
+than `ttl` seconds. Hit/miss/eviction counters are kept in `stats`.
+
+Each entry also remembers the version of every table its query read.
+Write paths bump those versions (note_write, WriteTracker), which makes
+dependent entries stale without scanning the cache.
+
+Three backends share that interface:
+
+    memory        QueryCache, an in-process LRU (the default)
+    sqlite:///p   SQLiteCache, a WAL-mode file every worker on the host shares
+    redis://...   RedisCache, any Redis-compatible server
+
+Shared backends store results as pickle protocol 5 blobs and keep the
+table versions next to them, so a write in one worker invalidates the
+entries every other worker sees. The active cache is picked with
+QUERY_CACHE_URL or at runtime with set_cache().
+"""
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+#: sentinel for "not cached" / "use the cache's default ttl"
+MISSING = object()
+
+
+def database_of(conn):
+    """Path of the main database behind a sqlite3 connection."""
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            # every in-memory database is private to its connection
+            return path or f":memory:{id(conn)}"
+    return None
+
+
+async def adatabase_of(conn):
+    """database_of() for aiosqlite connections (or plain sqlite3 ones)."""
+    if isinstance(conn, sqlite3.Connection):
+        return database_of(conn)
+    async with conn.execute("PRAGMA database_list") as cursor:
+        rows = await cursor.fetchall()
+    for _, name, path in rows:
+        if name == "main":
+            return path or f":memory:{id(conn)}"
+    return None
+
+
+def database_id(db):
+    """Normalise a database path so every caller names it the same way."""
+    if db is None or db.startswith(":memory:"):
+        return db
+    return os.path.realpath(db)
+
+
+_NAME = r'(?:"[^"]+"|`[^`]+`|\[[^\]]+\]|[A-Za-z_][\w$]*)'
+_QUALIFIED = rf"{_NAME}(?:\s*\.\s*{_NAME})?"
+_READ_RE = re.compile(
+    rf"\b(?:FROM|JOIN)\s+({_QUALIFIED}(?:\s*(?:AS\s+)?{_NAME})?"
+    rf"(?:\s*,\s*{_QUALIFIED}(?:\s*(?:AS\s+)?{_NAME})?)*)",
+    re.IGNORECASE,
+)
+_CTE_RE = re.compile(rf"(?:\bWITH(?:\s+RECURSIVE)?|,)\s*({_NAME})\s*"
+                     r"(?:\([^)]*\)\s*)?AS\s*\(", re.IGNORECASE)
+_WRITE_RE = re.compile(
+    rf"^\s*(?:WITH\b.*?\)\s*)?(?:"
+    rf"INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|"
+    rf"UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM|"
+    rf"DROP\s+TABLE(?:\s+IF\s+EXISTS)?|ALTER\s+TABLE)\s+({_QUALIFIED})",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _bare(name):
+    """Lower-cased table name without quotes or schema prefix."""
+    name = name.split(".")[-1].strip()
+    return name.strip('"`[]').lower()
+
+
+def tables_read(sql):
+    """Names of the tables a query reads (FROM / JOIN targets, minus CTEs)."""
+    ctes = {_bare(m.group(1)) for m in _CTE_RE.finditer(sql)}
+    tables = set()
+    for match in _READ_RE.finditer(sql):
+        for item in match.group(1).split(","):
+            name = re.match(rf"\s*({_QUALIFIED})", item).group(1)
+            tables.add(_bare(name))
+    return tables - ctes
+
+
+def tables_written(sql):
+    """Names of the tables a DML/DDL statement modifies (empty for reads)."""
+    match = _WRITE_RE.match(sql)
+    return {_bare(match.group(1))} if match else set()
+
+
+def is_read(sql):
+    """True for statements whose results may be cached (SELECT / WITH)."""
+    words = sql.lstrip(" \t\n(").split(None, 1)
+    if not words or words[0].upper() not in ("SELECT", "WITH", "VALUES"):
+        return False
+    # WITH ... INSERT/UPDATE/DELETE starts like a read but writes
+    return not tables_written(sql)
+
+
+def make_key(db, sql, params=()):
+    """Cache key for a query; params are normalised to a tuple."""
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    return (db, " ".join(sql.split()), tuple(params or ()))
+
+
+def dumps(value):
+    """Serialise a cached result compactly (pickle protocol 5)."""
+    return pickle.dumps(value, protocol=5)
+
+
+def loads(blob):
+    return pickle.loads(blob)
+
+
+def size_of(value):
+    """Approximate size of a cached result, in bytes."""
+    return len(dumps(value))
+
+
+def key_digest(key):
+    """Fixed-size digest of a cache key, used by the shared backends."""
+    return hashlib.blake2b(dumps(key), digest_size=16).hexdigest()
+
+
+class CacheStats:
+    """Counters describing how a QueryCache is doing."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hit_rate,
+        }
+
+    def __repr__(self):
+        return f"CacheStats({self.as_dict()})"
+
+
+class TableVersions:
+    """Per-(database, table) version counters, bumped on every write."""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def current(self, db, tables):
+        """Return {table: version} for the given tables of `db`."""
+        db = database_id(db)
+        with self._lock:
+            return {t: self._versions.get((db, t), 0) for t in tables}
+
+    def bump(self, db, tables):
+        db = database_id(db)
+        with self._lock:
+            for table in tables:
+                key = (db, table.lower())
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+
+class SQLiteVersions:
+    """TableVersions kept in a SQLite file, shared by every process using it."""
+
+    def __init__(self, handle):
+        # handle() -> (connection, lock) of the owning SQLiteCache
+        self._handle = handle
+        conn, lock = handle()
+        with lock, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS versions ("
+                "db TEXT NOT NULL, tbl TEXT NOT NULL, version INTEGER NOT NULL, "
+                "PRIMARY KEY (db, tbl))"
+            )
+
+    def current(self, db, tables):
+        db = database_id(db)
+        tables = list(tables)
+        if not tables:
+            return {}
+        marks = ", ".join("?" * len(tables))
+        conn, lock = self._handle()
+        with lock:
+            found = dict(conn.execute(
+                f"SELECT tbl, version FROM versions WHERE db = ? AND tbl IN ({marks})",
+                [db, *tables],
+            ))
+        return {t: found.get(t, 0) for t in tables}
+
+    def bump(self, db, tables):
+        db = database_id(db)
+        conn, lock = self._handle()
+        with lock, conn:
+            conn.executemany(
+                "INSERT INTO versions (db, tbl, version) VALUES (?, ?, 1) "
+                "ON CONFLICT (db, tbl) DO UPDATE SET version = version + 1",
+                [(db, t.lower()) for t in tables],
+            )
+
+
+class RedisVersions:
+    """TableVersions kept as INCR counters on a Redis-compatible server."""
+
+    def __init__(self, client, prefix):
+        self._client = client
+        self._prefix = prefix
+
+    def _key(self, db, table):
+        return f"{self._prefix}v:{db}:{table}"
+
+    def current(self, db, tables):
+        db = database_id(db)
+        tables = list(tables)
+        if not tables:
+            return {}
+        values = self._client.mget([self._key(db, t) for t in tables])
+        return {t: int(v or 0) for t, v in zip(tables, values)}
+
+    def bump(self, db, tables):
+        db = database_id(db)
+        for table in tables:
+            self._client.incr(self._key(db, table.lower()))
+
+
+#: process-local registry used by in-memory caches
+table_versions = TableVersions()
+
+
+def note_write(db, sql, versions=None):
+    """Invalidate cached reads of the tables `sql` writes to in `db`."""
+    tables = tables_written(sql)
+    if tables:
+        (versions or get_cache().versions).bump(db, tables)
+    return tables
+
+
+class WriteTracker:
+    """
+    Records the tables written through a sqlite3 connection (using its
+    trace callback) so they can be invalidated once the transaction
+    commits:
+
+        tracker = WriteTracker(conn)
+        ... conn.execute("INSERT ...") ...
+        conn.commit()
+        tracker.commit()        # or tracker.discard() after a rollback
+    """
+
+    def __init__(self, conn, db=None, versions=None):
+        self.conn = conn
+        self.db = db or database_of(conn)
+        self.versions = versions or get_cache().versions
+        self.tables = set()
+        conn.set_trace_callback(self._trace)
+
+    def _trace(self, sql):
+        self.tables |= tables_written(sql)
+
+    def commit(self):
+        """Bump versions for everything written, then stop tracking."""
+        self.conn.set_trace_callback(None)
+        if self.tables:
+            self.versions.bump(self.db, self.tables)
+        self.tables = set()
+
+    def discard(self):
+        """Stop tracking without invalidating (the writes were rolled back)."""
+        self.conn.set_trace_callback(None)
+        self.tables = set()
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires", "deps")
+
+    def __init__(self, value, size, expires, deps):
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.deps = deps
+
+
+class CacheBackend:
+    """Interface shared by every cache_query backend."""
+
+    #: TableVersions-like registry the entries' dependencies are checked against
+    versions = None
+    #: get/set do I/O; async callers run them in a worker thread
+    blocking = True
+
+    def __contains__(self, key):
+        return self.get(key, MISSING, count=False) is not MISSING
+
+    def get(self, key, default=None, count=True):
+        """Return the cached value for `key`, or `default` on a miss."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=MISSING, deps=None):
+        """
+        Store `value`; returns False if it is too large to cache.
+        `deps` (from versions_of(), taken before the query ran) makes the
+        entry stale as soon as one of those tables is written.
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def versions_of(self, db, tables):
+        """Dependency stamp to pass to set() for a read of `tables` in `db`."""
+        tables = tuple(sorted(tables))
+        return (db, tables, self.versions.current(db, tables))
+
+    def is_stale(self, deps):
+        return deps is not None and self.versions.current(*deps[:2]) != deps[2]
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.stats}>"
+
+
+class QueryCache(CacheBackend):
+    """
+    Thread-safe in-process LRU cache with optional TTL and byte budget.
+
+    ttl=None keeps entries until evicted; max_bytes=None only bounds the
+    number of entries. Results larger than max_bytes are not cached.
+    """
+
+    blocking = False
+
+    def __init__(self, max_entries=1024, ttl=300.0, max_bytes=64 * 1024 * 1024,
+                 clock=time.monotonic, versions=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.versions = versions or table_versions
+        self.stats = CacheStats()
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None, count=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires is not None \
+                    and entry.expires <= self.clock():
+                self._remove(key)
+                self.stats.expirations += 1
+                entry = None
+            if entry is not None and self.is_stale(entry.deps):
+                self._remove(key)
+                self.stats.invalidations += 1
+                entry = None
+            if entry is None:
+                if count:
+                    self.stats.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            if count:
+                self.stats.hits += 1
+            return entry.value
+
+    def set(self, key, value, ttl=MISSING, deps=None):
+        size = size_of(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return False
+        ttl = self.ttl if ttl is MISSING else ttl
+        expires = self.clock() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, expires, deps)
+            self.bytes += size
+            self._evict()
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        self.bytes -= self._entries.pop(key).size
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.stats.evictions += 1
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache stored in a SQLite file, shared by every process on the host.
+
+    Entries hold pickled (deps, value) blobs; least recently read rows are
+    pruned every `prune_every` writes once there are more than
+    `max_entries`. The file runs in WAL mode so readers never block. A
+    forked child reopens the file instead of using its parent's handle.
+    """
+
+    def __init__(self, path, max_entries=10000, ttl=300.0,
+                 max_bytes=64 * 1024 * 1024, prune_every=64, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        # expiry times are compared across processes: use the wall clock
+        self.clock = clock
+        self.stats = CacheStats()
+        self._writes = 0
+        self._open()
+        self.versions = SQLiteVersions(self._handle)
+
+    def _open(self):
+        # a lock held by another thread at fork time would never be freed
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None,
+                                     check_same_thread=False)
+        self._pid = os.getpid()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, blob BLOB NOT NULL, "
+            "expires REAL, used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entries_used ON entries (used)")
+
+    def _handle(self):
+        """(connection, lock) for this process, reopened after a fork."""
+        if self._pid != os.getpid():
+            self._open()
+        return self._conn, self._lock
+
+    def __len__(self):
+        conn, lock = self._handle()
+        with lock:
+            return conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get(self, key, default=None, count=True):
+        digest = key_digest(key)
+        now = self.clock()
+        conn, lock = self._handle()
+        with lock:
+            row = conn.execute(
+                "SELECT blob, expires FROM entries WHERE key = ?", (digest,)
+            ).fetchone()
+        value = MISSING
+        if row is not None and row[1] is not None and row[1] <= now:
+            self.delete(key)
+            self.stats.expirations += 1
+        elif row is not None:
+            deps, value = loads(row[0])
+            if self.is_stale(deps):
+                self.delete(key)
+                self.stats.invalidations += 1
+                value = MISSING
+        if value is MISSING:
+            if count:
+                self.stats.misses += 1
+            return default
+        with lock:
+            conn.execute("UPDATE entries SET used = ? WHERE key = ?",
+                         (now, digest))
+        if count:
+            self.stats.hits += 1
+        return value
+
+    def set(self, key, value, ttl=MISSING, deps=None):
+        blob = dumps((deps, value))
+        if self.max_bytes is not None and len(blob) > self.max_bytes:
+            return False
+        ttl = self.ttl if ttl is MISSING else ttl
+        now = self.clock()
+        expires = now + ttl if ttl is not None else None
+        conn, lock = self._handle()
+        with lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, blob, expires, used) "
+                "VALUES (?, ?, ?, ?)",
+                (key_digest(key), blob, expires, now),
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune(conn, now)
+        return True
+
+    def delete(self, key):
+        conn, lock = self._handle()
+        with lock:
+            conn.execute("DELETE FROM entries WHERE key = ?",
+                         (key_digest(key),))
+
+    def clear(self):
+        conn, lock = self._handle()
+        with lock:
+            conn.execute("DELETE FROM entries")
+
+    def _prune(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        excess = conn.execute(
+            "SELECT COUNT(*) - ? FROM entries", (self.max_entries,)).fetchone()[0]
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY used LIMIT ?)", (excess,))
+            self.stats.evictions += excess
+
+    def close(self):
+        if self._pid == os.getpid():
+            self._conn.close()
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache on a Redis-compatible server (redis-py client or anything with
+    get/set/delete/incr/mget/scan_iter). Expiry uses the server's TTLs;
+    size bounds are left to its maxmemory-policy (e.g. allkeys-lru).
+    """
+
+    def __init__(self, client, prefix="qc:", ttl=300.0,
+                 max_bytes=64 * 1024 * 1024):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self.versions = RedisVersions(client, prefix)
+
+    def _key(self, key):
+        return f"{self.prefix}e:{key_digest(key)}"
+
+    def get(self, key, default=None, count=True):
+        blob = self.client.get(self._key(key))
+        value = MISSING
+        if blob is not None:
+            deps, value = loads(blob)
+            if self.is_stale(deps):
+                self.delete(key)
+                self.stats.invalidations += 1
+                value = MISSING
+        if value is MISSING:
+            if count:
+                self.stats.misses += 1
+            return default
+        if count:
+            self.stats.hits += 1
+        return value
+
+    def set(self, key, value, ttl=MISSING, deps=None):
+        blob = dumps((deps, value))
+        if self.max_bytes is not None and len(blob) > self.max_bytes:
+            return False
+        ttl = self.ttl if ttl is MISSING else ttl
+        px = int(ttl * 1000) if ttl is not None else None
+        self.client.set(self._key(key), blob, px=px)
+        return True
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=f"{self.prefix}e:*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def create_cache(url="memory", **kwargs):
+    """
+    Build a cache from a URL: "memory", "sqlite:///path/to/cache.db" or
+    "redis://host:6379/0" (needs the redis package).
+    """
+    if url == "memory":
+        return QueryCache(**kwargs)
+    if url.startswith("sqlite:///"):
+        return SQLiteCache(url[len("sqlite:///"):], **kwargs)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        import redis
+        return RedisCache(redis.Redis.from_url(url), **kwargs)
+    raise ValueError(f"unknown cache url: {url!r}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the active cache, creating it from QUERY_CACHE_URL on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = create_cache(os.environ.get("QUERY_CACHE_URL", "memory"))
+        return _cache
+
+
+def set_cache(cache, **kwargs):
+    """Switch cache_query and the write paths to `cache` (a backend or URL)."""
+    global _cache
+    if isinstance(cache, str):
+        cache = create_cache(cache, **kwargs)
+    with _cache_lock:
+        _cache = cache
+    return cache
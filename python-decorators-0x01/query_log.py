@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Structured, low-overhead query logging for the log_queries decorator.
+
+The calling thread only samples, times the call and appends a tuple to a
+deque (append/popleft are atomic, so no lock is taken). A daemon writer
+thread turns the tuples into JSON lines:
+
+    {"ts": "2024-05-01T12:00:00.123456", "query": "SELECT ...",
+     "duration_ms": 0.412, "rows": 3, "params": "9f2c4d1ab07e33c5",
+     "error": null}
+
+Parameters are logged as a fingerprint, never their values. Records
+beyond `max_pending` are dropped and counted rather than blocking callers.
+QUERY_LOG=0 disables logging; QUERY_LOG_SAMPLE sets the sampled fraction.
+"""
+import atexit
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+def params_fingerprint(params):
+    """Short stable hash of query parameters (None when there are none)."""
+    if not params:
+        return None
+    return hashlib.blake2b(repr(params).encode(), digest_size=8).hexdigest()
+
+
+class QueryLogger:
+    """Sampling logger with a background writer thread."""
+
+    def __init__(self, sink=None, enabled=True, sample_rate=1.0,
+                 max_pending=100000, flush_interval=0.05):
+        self.sink = sink if sink is not None else sys.stderr
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+        self._pending = deque()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+
+    def record(self, query, params, duration, rows, error):
+        """Queue one record; called on the hot path."""
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append((time.time(), query, params, duration, rows, error))
+        if self._writer is None:
+            self._start()
+
+    def _start(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._run, name="query-log-writer", daemon=True)
+                self._writer.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        with self._drain_lock:
+            self._write_pending()
+
+    def _write_pending(self):
+        # a bad record or a failing sink is counted in `errors`; it must
+        # never kill the writer thread
+        lines = []
+        while self._pending:
+            ts, query, params, duration, rows, error = self._pending.popleft()
+            try:
+                if query is not None:
+                    # whatever the caller passed first; not always a str
+                    query = " ".join(str(query).split())
+                lines.append(json.dumps({
+                    "ts": datetime.fromtimestamp(ts).isoformat(),
+                    "query": query,
+                    "duration_ms": round(duration * 1000, 3),
+                    "rows": rows,
+                    "params": params_fingerprint(params),
+                    "error": error,
+                }))
+            except Exception:
+                self.errors += 1
+        if lines:
+            try:
+                self.sink.write("\n".join(lines) + "\n")
+                self.sink.flush()
+            except Exception:
+                self.errors += len(lines)
+            else:
+                self.written += len(lines)
+
+    def flush(self):
+        """Write everything queued so far (from the calling thread)."""
+        self._drain()
+
+    def close(self):
+        """Stop the writer thread after it has drained the queue."""
+        self._stopped = True
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        self._drain()
+
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def get_logger():
+    """Return the process-wide logger, configured from the environment."""
+    global _logger
+    if _logger is not None:
+        return _logger
+    with _logger_lock:
+        if _logger is None:
+            _logger = QueryLogger(
+                enabled=os.environ.get("QUERY_LOG", "1") != "0",
+                sample_rate=float(os.environ.get("QUERY_LOG_SAMPLE", 1.0)),
+            )
+        return _logger
+
+
+def set_logger(logger):
+    """Replace the process-wide logger (closing the previous one)."""
+    global _logger
+    with _logger_lock:
+        previous, _logger = _logger, logger
+    if previous is not None:
+        previous.close()
+    return logger
+
+
+@atexit.register
+def _close_logger():
+    """Flush whichever logger is current when the interpreter exits."""
+    if _logger is not None:
+        _logger.close()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Per-query latency profiles for the profile_query decorator.
+
+Queries are grouped by normalised SQL (literals replaced by ?, IN lists
+collapsed). Every group keeps an HDR-style log-linear histogram of
+latencies: 16 sub-buckets per power of two of microseconds, stored
+sparsely, so percentiles are within ~6% whatever the range and a group
+costs a few hundred bytes. Calls slower than `slow_threshold` seconds
+are kept with their EXPLAIN QUERY PLAN.
+
+    registry = get_registry()
+    print(registry.to_prometheus())      # text exposition format
+    print(registry.to_json())
+    serve_metrics(9100)                  # GET /metrics, /metrics.json
+
+QUERY_SLOW_MS sets the default slow-query threshold (100ms).
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUB_BITS = 4
+SUB_BUCKETS = 1 << SUB_BITS
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+
+
+def normalize_sql(sql):
+    """Group key for a query: literals become ?, whitespace is collapsed."""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (?)", sql)
+    return " ".join(sql.split())
+
+
+def _bucket(micros):
+    """Log-linear bucket index of a latency in whole microseconds."""
+    if micros < SUB_BUCKETS:
+        return micros
+    shift = micros.bit_length() - SUB_BITS - 1
+    return (shift << SUB_BITS) + (micros >> shift)
+
+
+def _bucket_value(index):
+    """Midpoint (in microseconds) of the values falling into `index`."""
+    shift = max(0, (index >> SUB_BITS) - 1)
+    low = (index - (shift << SUB_BITS)) << shift
+    return low + ((1 << shift) - 1) / 2
+
+
+class LatencyHistogram:
+    """Sparse log-linear histogram of latencies in seconds."""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        index = _bucket(int(seconds * 1e6))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Latency (seconds) below which `p` percent of calls completed."""
+        if not self.count:
+            return 0.0
+        rank = max(1, round(self.count * p / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(_bucket_value(index) / 1e6, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class QueryProfile:
+    """Everything recorded for one normalised query."""
+
+    def __init__(self, query, max_slow, clock):
+        self.query = query
+        self.latency = LatencyHistogram()
+        self.rows = 0
+        self.errors = 0
+        self.slow = deque(maxlen=max_slow)
+        self.plan = None
+        self.plan_at = None
+        self.first_seen = clock()
+
+    def as_dict(self, now):
+        latency = self.latency
+        elapsed = now - self.first_seen
+        return {
+            "query": self.query,
+            "calls": latency.count,
+            "calls_per_sec": latency.count / elapsed if elapsed > 0 else 0.0,
+            "rows": self.rows,
+            "errors": self.errors,
+            "mean_ms": latency.mean * 1000,
+            "p50_ms": latency.percentile(50) * 1000,
+            "p95_ms": latency.percentile(95) * 1000,
+            "p99_ms": latency.percentile(99) * 1000,
+            "max_ms": latency.max * 1000,
+            "plan": self.plan,
+            "slow": list(self.slow),
+        }
+
+
+def explain(conn, sql, params=()):
+    """EXPLAIN QUERY PLAN details for `sql`, or None if sqlite refuses."""
+    try:
+        rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+    except Exception:
+        return None
+    return [row[-1] for row in rows]
+
+
+class ProfileRegistry:
+    """
+    Thread-safe map of normalised SQL -> QueryProfile.
+
+    Slow calls (>= slow_threshold seconds) are kept, the last `max_slow`
+    per query; their plan is captured at most once per `plan_interval`
+    seconds per query so a slow hot query does not double its own cost.
+    """
+
+    def __init__(self, slow_threshold=0.1, max_slow=10, plan_interval=60.0,
+                 clock=time.monotonic):
+        self.slow_threshold = slow_threshold
+        self.max_slow = max_slow
+        self.plan_interval = plan_interval
+        self.clock = clock
+        self.profiles = {}
+        self._lock = threading.Lock()
+
+    def observe(self, sql, duration, rows=None, error=None, conn=None, params=()):
+        key = normalize_sql(sql)
+        now = self.clock()
+        with self._lock:
+            profile = self.profiles.get(key)
+            if profile is None:
+                profile = self.profiles[key] = QueryProfile(key, self.max_slow, self.clock)
+            profile.latency.record(duration)
+            if rows:
+                profile.rows += rows
+            if error is not None:
+                profile.errors += 1
+            slow = duration >= self.slow_threshold
+            want_plan = slow and conn is not None and (
+                profile.plan_at is None or now - profile.plan_at >= self.plan_interval)
+            if want_plan:
+                profile.plan_at = now
+        if not slow:
+            return
+        plan = explain(conn, sql, params) if want_plan else None
+        with self._lock:
+            if plan is not None:
+                profile.plan = plan
+            profile.slow.append({"duration_ms": duration * 1000, "rows": rows,
+                                 "error": error, "at": time.time()})
+
+    def snapshot(self):
+        """Per-query statistics, slowest p99 first."""
+        now = self.clock()
+        with self._lock:
+            stats = [p.as_dict(now) for p in self.profiles.values()]
+        return sorted(stats, key=lambda s: s["p99_ms"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self.profiles.clear()
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self):
+        """Prometheus text exposition of every query profile."""
+        lines = [
+            "# HELP query_duration_seconds Query latency by normalised SQL.",
+            "# TYPE query_duration_seconds summary",
+        ]
+        counters = []
+        with self._lock:
+            profiles = list(self.profiles.values())
+            for p in profiles:
+                label = f'query="{_escape(p.query)}"'
+                for quantile in (50, 95, 99):
+                    lines.append(
+                        f'query_duration_seconds{{{label},quantile="{quantile / 100}"}} '
+                        f"{p.latency.percentile(quantile):.6f}")
+                lines.append(f"query_duration_seconds_sum{{{label}}} {p.latency.total:.6f}")
+                lines.append(f"query_duration_seconds_count{{{label}}} {p.latency.count}")
+                counters.append((label, p.rows, p.errors))
+        lines += ["# HELP query_rows_total Rows returned by normalised SQL.",
+                  "# TYPE query_rows_total counter"]
+        lines += [f"query_rows_total{{{label}}} {rows}" for label, rows, _ in counters]
+        lines += ["# HELP query_errors_total Failed calls by normalised SQL.",
+                  "# TYPE query_errors_total counter"]
+        lines += [f"query_errors_total{{{label}}} {errors}" for label, _, errors in counters]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the process-wide registry, creating it on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            slow_ms = float(os.environ.get("QUERY_SLOW_MS", 100))
+            _registry = ProfileRegistry(slow_threshold=slow_ms / 1000)
+        return _registry
+
+
+def set_registry(registry):
+    """Replace the process-wide registry."""
+    global _registry
+    with _registry_lock:
+        _registry = registry
+    return registry
+
+
+def serve_metrics(port=9100, host="127.0.0.1", registry=None):
+    """
+    Serve /metrics (Prometheus) and /metrics.json from a daemon thread;
+    returns the server (call shutdown() to stop it).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            source = registry or get_registry()
+            if self.path == "/metrics":
+                body, ctype = source.to_prometheus(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, ctype = source.to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
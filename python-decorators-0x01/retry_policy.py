@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Building blocks for retry_on_failure.
+
+    is_transient    which errors are worth retrying (busy / locked database)
+    full_jitter     exponential backoff with full jitter, so workers that
+                    failed together do not retry together
+    RetryBudget     token bucket capping retries per second process-wide,
+                    so an outage is not multiplied by the retry count
+    CircuitBreaker  fails fast after repeated transient failures and lets
+                    a single probe through once `reset_timeout` has passed
+"""
+import random
+import sqlite3
+import threading
+import time
+
+#: sqlite error codes that clear up on their own
+TRANSIENT_CODES = {
+    getattr(sqlite3, "SQLITE_BUSY", 5),
+    getattr(sqlite3, "SQLITE_LOCKED", 6),
+}
+#: fallback for drivers / Python versions without sqlite_errorcode
+TRANSIENT_MESSAGES = ("database is locked", "database table is locked",
+                      "database is busy")
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open; the call was not attempted."""
+
+
+def is_transient(exc):
+    """True for errors that are likely to succeed if retried."""
+    if not isinstance(exc, sqlite3.OperationalError):
+        return False
+    code = getattr(exc, "sqlite_errorcode", None)
+    if code is not None:
+        # extended codes (e.g. SQLITE_BUSY_SNAPSHOT) keep the primary in the low byte
+        return (code & 0xFF) in TRANSIENT_CODES
+    message = str(exc).lower()
+    return any(text in message for text in TRANSIENT_MESSAGES)
+
+
+def full_jitter(attempt, base, cap, rand=random.random):
+    """Delay before retry number `attempt` (0-based): U(0, min(cap, base * 2**attempt))."""
+    return rand() * min(cap, base * 2 ** attempt)
+
+
+class RetryBudget:
+    """
+    Token bucket refilled at `rate` tokens/second up to `burst`; every
+    retry spends one token and is skipped when none are left.
+    """
+
+    def __init__(self, rate=10.0, burst=20, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.denied = 0
+        self._stamp = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.denied += 1
+            return False
+
+
+#: shared by every retry_on_failure that is not given its own budget
+retry_budget = RetryBudget()
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half-open after `reset_timeout` seconds, letting one probe
+    through; the probe closes the circuit on success or reopens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go ahead."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("circuit open; failing fast")
+                self.state = self.HALF_OPEN
+            if self._probing:
+                raise CircuitOpenError("circuit half-open; probe in flight")
+            self._probing = True
+
+    def release_probe(self):
+        """
+        End a call that neither succeeded nor failed transiently (it was
+        cancelled, say) without changing state, so a half-open circuit
+        lets the next call probe.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or \
+                    self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+            self._probing = False
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Single-flight call coalescing for cache_query.
+
+When many callers miss the same key at once only the first (the leader)
+runs the load; the rest wait on its future and share the result or the
+exception. SingleFlight serves threads, AsyncSingleFlight coroutines:
+
+    flight = SingleFlight()
+    rows = flight.do(key, lambda: run_query(...))
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class FlightStats:
+    """How many loads ran and how many callers piggy-backed on them."""
+
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+
+    def __repr__(self):
+        return f"FlightStats(leaders={self.leaders}, followers={self.followers})"
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key across threads."""
+
+    def __init__(self):
+        self.stats = FlightStats()
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def busy(self, key):
+        """True while a load for `key` is running."""
+        return key in self._calls
+
+    def do(self, key, fn):
+        """Run fn() once for every caller that arrives while it is running."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.stats.leaders += 1
+            else:
+                self.stats.followers += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AsyncSingleFlight:
+    """Coalesces concurrent awaits for the same key within an event loop."""
+
+    def __init__(self):
+        self.stats = FlightStats()
+        self._calls = {}
+
+    def busy(self, key):
+        return key in self._calls
+
+    async def do(self, key, coro_fn):
+        """Await coro_fn() once for every caller that arrives meanwhile."""
+        task = self._calls.get(key)
+        if task is None:
+            # a task, so one cancelled caller does not cancel the others
+            task = self._calls[key] = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self.stats.leaders += 1
+        else:
+            self.stats.followers += 1
+        return await asyncio.shield(task)
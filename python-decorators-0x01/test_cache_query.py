@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Unit tests for query_cache.py and the cache_query decorator."""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from query_cache import (QueryCache, RedisCache, SQLiteCache, TableVersions,
+                         WriteTracker, create_cache, is_read, make_key,
+                         tables_read, tables_written)
+
+cache_module = __import__('4-cache_query')
+
+
+class FakeClock:
+    """Manually advanced clock for TTL tests."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis-py client methods RedisCache uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, px=None):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def scan_iter(self, match):
+        return [key for key in self.data if key.startswith(match.rstrip("*"))]
+
+
+class TestQueryCache(unittest.TestCase):
+    """Test suite for the QueryCache LRU/TTL store."""
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted past max_entries."""
+        cache = QueryCache(max_entries=2, ttl=None)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_ttl_expiry(self):
+        """Entries older than ttl are dropped and counted as expirations."""
+        clock = FakeClock()
+        cache = QueryCache(ttl=10, clock=clock)
+        cache.set("a", [1, 2])
+        clock.now = 9
+        self.assertEqual(cache.get("a"), [1, 2])
+        clock.now = 10
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats.expirations, 1)
+        self.assertEqual(cache.stats.hits, 1)
+        self.assertEqual(cache.stats.misses, 1)
+
+    def test_byte_budget(self):
+        """The byte budget evicts old entries and rejects oversized ones."""
+        cache = QueryCache(max_entries=100, ttl=None, max_bytes=300)
+        cache.set("a", "x" * 100)
+        cache.set("b", "y" * 100)
+        cache.set("c", "z" * 100)
+        self.assertLessEqual(cache.bytes, 300)
+        self.assertNotIn("a", cache)
+        self.assertFalse(cache.set("big", "w" * 1000))
+        self.assertNotIn("big", cache)
+
+    def test_key_covers_db_sql_and_params(self):
+        """Keys differ by database and params but not by whitespace."""
+        base = make_key("a.db", "SELECT * FROM users WHERE id = ?", (1,))
+        self.assertEqual(
+            base, make_key("a.db", "SELECT *  FROM users\nWHERE id = ?", [1]))
+        self.assertNotEqual(
+            base, make_key("a.db", "SELECT * FROM users WHERE id = ?", (2,)))
+        self.assertNotEqual(
+            base, make_key("b.db", "SELECT * FROM users WHERE id = ?", (1,)))
+
+    def test_is_read(self):
+        """Only SELECT/WITH statements are cacheable."""
+        self.assertTrue(is_read("  select * from users"))
+        self.assertTrue(is_read("WITH t AS (SELECT 1) SELECT * FROM t"))
+        self.assertFalse(is_read("INSERT INTO users VALUES (1)"))
+        self.assertFalse(is_read(
+            "WITH t AS (SELECT 1) INSERT INTO users SELECT * FROM t"))
+        self.assertFalse(is_read(
+            "WITH old AS (SELECT id FROM users) DELETE FROM users "
+            "WHERE id IN (SELECT id FROM old)"))
+
+    def test_tables_read_and_written(self):
+        """Reads find FROM/JOIN targets (not CTEs); writes find the target."""
+        self.assertEqual(
+            tables_read("SELECT * FROM users u JOIN main.orders o ON 1"),
+            {"users", "orders"})
+        self.assertEqual(
+            tables_read("WITH t AS (SELECT id FROM users) SELECT * FROM t"),
+            {"users"})
+        self.assertEqual(tables_written("INSERT OR IGNORE INTO Users VALUES (1)"),
+                         {"users"})
+        self.assertEqual(tables_written("UPDATE users SET name = 'x'"),
+                         {"users"})
+        self.assertEqual(tables_written("SELECT * FROM users"), set())
+
+    def test_version_bump_invalidates(self):
+        """Bumping a dependency's version makes the entry stale."""
+        versions = TableVersions()
+        cache = QueryCache(ttl=None, versions=versions)
+        cache.set("a", 1, deps=cache.versions_of("x.db", {"users"}))
+        cache.set("b", 2, deps=cache.versions_of("x.db", {"orders"}))
+        versions.bump("x.db", {"users"})
+        self.assertNotIn("a", cache)
+        self.assertIn("b", cache)
+        self.assertEqual(cache.stats.invalidations, 1)
+
+
+class TestSharedBackends(unittest.TestCase):
+    """Test suite for the SQLite-file and Redis cache backends."""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".cache")
+        os.close(fd)
+
+    def tearDown(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_sqlite_cache_is_shared(self):
+        """Two caches on one file (two workers) see each other's entries."""
+        worker_a = SQLiteCache(self.path, ttl=None)
+        worker_b = SQLiteCache(self.path, ttl=None)
+        key = make_key("x.db", "SELECT * FROM users")
+        worker_a.set(key, [(1, "ada")],
+                     deps=worker_a.versions_of("x.db", {"users"}))
+        self.assertEqual(worker_b.get(key), [(1, "ada")])
+        worker_b.versions.bump("x.db", {"users"})
+        self.assertNotIn(key, worker_a)
+        worker_a.close()
+        worker_b.close()
+
+    def test_sqlite_cache_prunes_lru(self):
+        """Past max_entries the least recently read rows are pruned."""
+        clock = FakeClock()
+        cache = SQLiteCache(self.path, max_entries=2, ttl=5, prune_every=1,
+                            clock=clock)
+        cache.set("a", 1)
+        clock.now = 1
+        cache.set("b", 2)
+        clock.now = 2
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        clock.now = 10
+        self.assertIsNone(cache.get("c"))
+        self.assertEqual(cache.stats.expirations, 1)
+        cache.close()
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_sqlite_cache_reopens_after_fork(self):
+        """A forked child uses its own connection, not the parent's."""
+        cache = SQLiteCache(self.path, ttl=None)
+        self.addCleanup(cache.close)
+        cache.set("parent", 1)
+        inherited = cache._conn
+        pid = os.fork()
+        if pid == 0:
+            ok = False
+            try:
+                cache.set("child", 2)
+                cache.versions.bump("x.db", {"users"})
+                ok = cache.get("parent") == 1 and cache._conn is not inherited
+            finally:
+                os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertIs(cache._conn, inherited)
+        self.assertEqual(cache.get("child"), 2)
+        self.assertEqual(cache.versions.current("x.db", {"users"}),
+                         {"users": 1})
+
+    def test_redis_cache(self):
+        """RedisCache round-trips values and shares versions via INCR."""
+        client = FakeRedis()
+        cache = RedisCache(client, ttl=None)
+        key = make_key("x.db", "SELECT * FROM users")
+        cache.set(key, {"rows": [1, 2]},
+                  deps=cache.versions_of("x.db", {"users"}))
+        self.assertEqual(RedisCache(client).get(key), {"rows": [1, 2]})
+        RedisCache(client).versions.bump("x.db", {"users"})
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(cache.stats.invalidations, 1)
+
+    def test_create_cache(self):
+        """Cache URLs pick the backend."""
+        self.assertIsInstance(create_cache("memory"), QueryCache)
+        cache = create_cache("sqlite:///" + self.path)
+        self.assertIsInstance(cache, SQLiteCache)
+        cache.close()
+        with self.assertRaises(ValueError):
+            create_cache("memcached://localhost")
+
+
+class TestCacheQueryDecorator(unittest.TestCase):
+    """Test suite for the cache_query decorator."""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO users (name) VALUES (?)",
+                         [("ada",), ("bayo",)])
+        conn.commit()
+        conn.close()
+        self.cache = QueryCache(ttl=None)
+        self.calls = 0
+
+        @cache_module.cache_query(cache=self.cache)
+        def run(conn, query, params=()):
+            self.calls += 1
+            return conn.execute(query, params).fetchall()
+
+        self.run_query = run
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def query(self, sql, params=()):
+        conn = sqlite3.connect(self.path)
+        try:
+            return self.run_query(conn, sql, params)
+        finally:
+            conn.close()
+
+    def test_hit_across_connections(self):
+        """Repeating a query on a new connection is served from the cache."""
+        first = self.query("SELECT name FROM users WHERE id = ?", (1,))
+        again = self.query("SELECT name FROM users WHERE id = ?", (1,))
+        self.assertEqual(first, again)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.cache.stats.hits, 1)
+
+    def test_params_are_part_of_the_key(self):
+        """Different parameters run different queries."""
+        self.assertEqual(self.query("SELECT name FROM users WHERE id = ?",
+                                    (1,)), [("ada",)])
+        self.assertEqual(self.query("SELECT name FROM users WHERE id = ?",
+                                    (2,)), [("bayo",)])
+        self.assertEqual(self.calls, 2)
+
+    def test_writes_are_not_cached(self):
+        """DML statements always execute."""
+        self.query("DELETE FROM users WHERE id = ?", (99,))
+        self.query("DELETE FROM users WHERE id = ?", (99,))
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_write_through_decorator_invalidates(self):
+        """A write run through cache_query drops reads of that table."""
+        self.query("SELECT name FROM users")
+        self.query("INSERT INTO users (name) VALUES (?)", ("chioma",))
+        self.query("SELECT name FROM users")
+        self.assertEqual(self.calls, 3)
+
+    def test_committed_transaction_invalidates(self):
+        """WriteTracker bumps versions only when the transaction commits."""
+        self.query("SELECT name FROM users")
+        conn = sqlite3.connect(self.path)
+        tracker = WriteTracker(conn)
+        conn.execute("INSERT INTO users (name) VALUES ('dare')")
+        conn.rollback()
+        tracker.discard()
+        self.query("SELECT name FROM users")
+        self.assertEqual(self.calls, 1)
+
+        tracker = WriteTracker(conn)
+        conn.execute("INSERT INTO users (name) VALUES ('efe')")
+        conn.commit()
+        tracker.commit()
+        conn.close()
+        rows = self.query("SELECT name FROM users")
+        self.assertEqual(self.calls, 2)
+        self.assertIn(("efe",), rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Unit tests for db_pool.py and the pooled with_db_connection."""
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from db_pool import (ConnectionPool, PoolError, SQLiteBackend,
+                     with_db_connection)
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Test suite for ConnectionPool in queue and thread modes."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO users (name) VALUES ('ada')")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def make_pool(self, **kwargs):
+        pool = ConnectionPool(self.path, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_connections_are_reused(self):
+        """Repeated calls share one connection set up with the PRAGMAs."""
+        pool = self.make_pool(size=2)
+
+        @with_db_connection(pool=pool)
+        def journal_mode(conn):
+            return conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+        for _ in range(10):
+            self.assertEqual(journal_mode(), "delete")
+        self.assertEqual(pool.created, 1)
+
+    def test_wal_is_opt_in(self):
+        """The pool only rewrites the file's journal mode when asked to."""
+        with self.make_pool().connection() as conn:
+            self.assertEqual(
+                conn.execute("PRAGMA journal_mode").fetchone()[0], "delete")
+            self.assertEqual(
+                conn.execute("PRAGMA synchronous").fetchone()[0], 2)
+        with self.make_pool(wal=True).connection() as conn:
+            self.assertEqual(
+                conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(
+                conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+
+    def test_checkout_and_busy_timeouts_are_separate(self):
+        pool = self.make_pool(timeout=0.05)
+        with pool.connection() as conn:
+            self.assertEqual(
+                conn.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+        pool = self.make_pool(timeout=60, busy_timeout=0.25)
+        with pool.connection() as conn:
+            self.assertEqual(
+                conn.execute("PRAGMA busy_timeout").fetchone()[0], 250)
+
+    def test_connections_come_from_the_backend(self):
+        """The pool opens connections through the shared backend layer."""
+        backend = SQLiteBackend(self.path)
+        opened = []
+        connect = backend.connect
+        backend.connect = lambda: opened.append(connect()) or opened[-1]
+        pool = self.make_pool(backend=backend)
+        with pool.connection() as conn:
+            self.assertIs(conn, opened[0])
+            self.assertEqual(conn.execute("SELECT FLOOR(2.5)").fetchone(),
+                             (2,))
+        default = self.make_pool()
+        self.assertIsInstance(default.backend, SQLiteBackend)
+        self.assertEqual(default.backend.path, self.path)
+
+    def test_release_rolls_back(self):
+        """Uncommitted writes are discarded when the connection comes back."""
+        pool = self.make_pool(size=1)
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO users (name) VALUES ('bayo')")
+        with pool.connection() as conn:
+            self.assertFalse(conn.in_transaction)
+            count = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        self.assertEqual(count, 1)
+
+    def test_exhausted_pool_raises(self):
+        """get() gives up after `timeout` when every connection is out."""
+        pool = self.make_pool(size=1, timeout=0.05)
+        conn = pool.get()
+        with self.assertRaises(PoolError):
+            pool.get()
+        pool.release(conn)
+        pool.release(pool.get())
+
+    def test_thread_mode(self):
+        """Thread mode gives each thread its own long-lived connection."""
+        pool = self.make_pool(mode="thread")
+        seen = []
+
+        def borrow():
+            with pool.connection() as first:
+                pass
+            with pool.connection() as second:
+                seen.append(first is second)
+
+        threads = [threading.Thread(target=borrow) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(seen, [True] * 3)
+        self.assertEqual(pool.created, 3)
+
+    def test_thread_connection_closed_when_thread_exits(self):
+        """A thread's connection is closed and its slot freed on exit."""
+        pool = self.make_pool(mode="thread", size=1, timeout=0.05)
+        conns = []
+
+        def borrow():
+            with pool.connection() as conn:
+                conns.append(conn)
+
+        for _ in range(3):
+            thread = threading.Thread(target=borrow)
+            thread.start()
+            thread.join()
+        self.assertEqual(pool.created, 3)
+        for conn in conns:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+
+    def test_thread_mode_enforces_size(self):
+        """At most `size` threads hold a connection at once."""
+        pool = self.make_pool(mode="thread", size=1, timeout=0.05)
+        errors = []
+        with pool.connection():
+            def borrow():
+                try:
+                    pool.get()
+                except PoolError as exc:
+                    errors.append(exc)
+
+            thread = threading.Thread(target=borrow)
+            thread.start()
+            thread.join()
+        self.assertEqual(len(errors), 1)
+
+    def test_close_spares_borrowed_connections(self):
+        """close() shuts idle connections; borrowed ones close on release."""
+        for mode in ("queue", "thread"):
+            with self.subTest(mode=mode):
+                pool = self.make_pool(mode=mode, size=2)
+                with pool.connection() as conn:
+                    pool.close()
+                    self.assertEqual(
+                        conn.execute("SELECT COUNT(*) FROM users").fetchone(),
+                        (1,))
+                with self.assertRaises(sqlite3.ProgrammingError):
+                    conn.execute("SELECT 1")
+                with pool.connection() as fresh:
+                    self.assertIsNot(fresh, conn)
+
+    def test_unknown_mode(self):
+        """Only queue and thread pooling exist."""
+        with self.assertRaises(ValueError):
+            ConnectionPool(self.path, mode="fork")
+
+
+if __name__ == "__main__":
+    unittest.main()
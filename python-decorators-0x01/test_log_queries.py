@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Unit tests for query_log.py and the log_queries decorator."""
+import io
+import json
+import unittest
+from unittest.mock import patch
+
+import query_log
+from query_log import QueryLogger, params_fingerprint, set_logger
+
+log_queries = __import__('0-log_queries').log_queries
+
+
+def fetch(query, params=()):
+    if "missing" in query:
+        raise LookupError("no such table")
+    return [("ada",), ("bayo",)]
+
+
+class TestLogQueries(unittest.TestCase):
+    """Test suite for structured query logging."""
+
+    def setUp(self):
+        self.sink = io.StringIO()
+
+    def records(self, logger):
+        logger.close()
+        return [json.loads(line) for line in self.sink.getvalue().splitlines()]
+
+    def test_structured_record(self):
+        """Each call is logged with duration, rows and a param fingerprint."""
+        logger = QueryLogger(sink=self.sink)
+        rows = log_queries(logger=logger)(fetch)(
+            "SELECT  name FROM users WHERE id = ?", ("secret",))
+        self.assertEqual(len(rows), 2)
+        [record] = self.records(logger)
+        self.assertEqual(record["query"], "SELECT name FROM users WHERE id = ?")
+        self.assertEqual(record["rows"], 2)
+        self.assertEqual(record["params"], params_fingerprint(("secret",)))
+        self.assertNotIn("secret", self.sink.getvalue())
+        self.assertGreaterEqual(record["duration_ms"], 0)
+        self.assertIsNone(record["error"])
+
+    def test_errors_are_logged_and_raised(self):
+        """Failures are recorded with their error and still propagate."""
+        logger = QueryLogger(sink=self.sink)
+        with self.assertRaises(LookupError):
+            log_queries(logger=logger)(fetch)(query="SELECT * FROM missing")
+        [record] = self.records(logger)
+        self.assertEqual(record["error"], "LookupError: no such table")
+        self.assertIsNone(record["params"])
+
+    def test_disabled_and_unsampled_calls_write_nothing(self):
+        """Disabled loggers and a zero sample rate skip recording."""
+        for logger in (QueryLogger(sink=self.sink, enabled=False),
+                       QueryLogger(sink=self.sink, sample_rate=0.0)):
+            log_queries(logger=logger)(fetch)("SELECT 1")
+            self.assertEqual(self.records(logger), [])
+
+    def test_full_queue_drops(self):
+        """Records past max_pending are dropped instead of blocking."""
+        logger = QueryLogger(sink=self.sink, max_pending=0)
+        log_queries(logger=logger)(fetch)("SELECT 1")
+        self.assertEqual(logger.dropped, 1)
+        self.assertEqual(self.records(logger), [])
+
+    def test_bad_records_do_not_stop_the_writer(self):
+        """Unserialisable records and sink errors are counted, not fatal."""
+        logger = QueryLogger(sink=self.sink, flush_interval=0.001)
+        logger.record(object(), None, 0.001, None, None)  # conn-first call
+        logger.record("SELECT 1", None, 0.001, object(), None)
+        logger.flush()
+        self.assertEqual(logger.errors, 1)
+        self.assertTrue(logger._writer.is_alive())
+
+        class BrokenSink:
+            def write(self, text):
+                raise OSError("disk full")
+
+            def flush(self):
+                pass
+
+        logger.sink = BrokenSink()
+        logger.record("SELECT 2", None, 0.001, 1, None)
+        logger.flush()
+        self.assertEqual(logger.errors, 2)
+        self.assertTrue(logger._writer.is_alive())
+        logger.sink = self.sink
+        logger.record("SELECT 3", None, 0.001, 1, None)
+        records = self.records(logger)
+        self.assertEqual([r["query"] for r in records][-1], "SELECT 3")
+        self.assertEqual(len(records), 2)
+        self.assertTrue(records[0]["query"].startswith("<object object"))
+
+    def test_set_logger_does_not_pile_up_exit_hooks(self):
+        """Swapping loggers closes the old one without new atexit hooks."""
+        previous = query_log._logger
+        first = QueryLogger(sink=self.sink)
+        with patch.object(query_log.atexit, "register") as register:
+            set_logger(first)
+            set_logger(QueryLogger(sink=self.sink))
+            set_logger(previous)
+        register.assert_not_called()
+        self.assertTrue(first._stopped)
+
+
+if __name__ == "__main__":
+    unittest.main()
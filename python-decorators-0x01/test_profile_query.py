@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Unit tests for query_profile.py and the profile_query decorator."""
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+import urllib.request
+
+from query_profile import (LatencyHistogram, ProfileRegistry, normalize_sql,
+                           serve_metrics)
+
+profile_query = __import__('5-profile_query').profile_query
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Test suite for the log-linear latency histogram."""
+
+    def test_percentiles_within_bucket_error(self):
+        """Percentiles of a wide latency spread stay within ~6%."""
+        rng = random.Random(7)
+        samples = sorted(rng.lognormvariate(-7, 1.5) for _ in range(20000))
+        hist = LatencyHistogram()
+        for sample in samples:
+            hist.record(sample)
+        for p in (50, 95, 99):
+            exact = samples[round(len(samples) * p / 100) - 1]
+            self.assertAlmostEqual(hist.percentile(p) / exact, 1, delta=0.07)
+        self.assertLess(len(hist.counts), 300)
+
+    def test_empty(self):
+        """An empty histogram reports zero."""
+        self.assertEqual(LatencyHistogram().percentile(99), 0.0)
+
+
+class TestProfileQuery(unittest.TestCase):
+    """Test suite for the registry, exporters and decorator."""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        self.conn.executemany("INSERT INTO users (name) VALUES (?)",
+                              [("ada",), ("bayo",), ("chioma",)])
+        self.registry = ProfileRegistry(slow_threshold=0.0)
+
+        @profile_query(registry=self.registry)
+        def fetch(conn, query, params=()):
+            return conn.execute(query, params).fetchall()
+
+        self.fetch = fetch
+
+    def tearDown(self):
+        self.conn.close()
+        os.remove(self.path)
+
+    def test_normalize_sql(self):
+        """Literals and IN lists do not split a query into many groups."""
+        self.assertEqual(
+            normalize_sql("SELECT * FROM users WHERE id IN (1, 2,3) AND name = 'o''x'"),
+            "SELECT * FROM users WHERE id IN (?) AND name = ?")
+
+    def test_calls_rows_and_plan(self):
+        """Calls are grouped, rows summed and slow calls get a plan."""
+        for user_id in (1, 2):
+            self.fetch(self.conn, "SELECT name FROM users WHERE id = ?", (user_id,))
+        self.fetch(self.conn, "SELECT name FROM users")
+        stats = {s["query"]: s for s in self.registry.snapshot()}
+        by_id = stats["SELECT name FROM users WHERE id = ?"]
+        self.assertEqual(by_id["calls"], 2)
+        self.assertEqual(by_id["rows"], 2)
+        self.assertTrue(any("users" in line for line in by_id["plan"]))
+        self.assertEqual(len(by_id["slow"]), 2)
+        self.assertEqual(stats["SELECT name FROM users"]["rows"], 3)
+
+    def test_errors_are_counted(self):
+        """Failing calls raise and count as errors."""
+        with self.assertRaises(sqlite3.OperationalError):
+            self.fetch(self.conn, "SELECT * FROM missing")
+        [stats] = self.registry.snapshot()
+        self.assertEqual(stats["errors"], 1)
+        self.assertIsNone(stats["plan"])
+
+    def test_exporters(self):
+        """Prometheus text and JSON are served over HTTP."""
+        self.fetch(self.conn, "SELECT name FROM users")
+        text = self.registry.to_prometheus()
+        self.assertIn('query_duration_seconds_count{query="SELECT name FROM users"} 1', text)
+        self.assertIn('query_rows_total{query="SELECT name FROM users"} 3', text)
+        server = serve_metrics(0, registry=self.registry)
+        self.addCleanup(server.shutdown)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(base + "/metrics") as response:
+            self.assertEqual(response.read().decode(), text)
+        with urllib.request.urlopen(base + "/metrics.json") as response:
+            self.assertEqual(json.load(response)[0]["calls"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Unit tests for retry_policy.py and the retry_on_failure decorators."""
+import asyncio
+import sqlite3
+import unittest
+
+from retry_policy import (CircuitBreaker, CircuitOpenError, RetryBudget,
+                          full_jitter, is_transient)
+
+retry_module = __import__('3-retry_on_failure')
+
+LOCKED = sqlite3.OperationalError("database is locked")
+
+
+class FakeClock:
+    """Manually advanced clock for budget and breaker tests."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Flaky:
+    """Callable failing with the given errors before returning "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Test suite for the retry building blocks."""
+
+    def test_is_transient(self):
+        """Busy/locked errors are transient; other errors are not."""
+        self.assertTrue(is_transient(LOCKED))
+        self.assertFalse(is_transient(sqlite3.OperationalError("no such table: users")))
+        self.assertFalse(is_transient(ValueError("database is locked")))
+
+    def test_full_jitter_bounds(self):
+        """Delays grow exponentially up to the cap and scale with rand()."""
+        self.assertEqual(full_jitter(3, 0.5, 30, rand=lambda: 1.0), 4.0)
+        self.assertEqual(full_jitter(10, 0.5, 30, rand=lambda: 1.0), 30)
+        self.assertEqual(full_jitter(3, 0.5, 30, rand=lambda: 0.0), 0.0)
+
+    def test_budget_refills(self):
+        """The bucket empties after `burst` retries and refills at `rate`."""
+        clock = FakeClock()
+        budget = RetryBudget(rate=2, burst=2, clock=clock)
+        self.assertTrue(budget.try_acquire())
+        self.assertTrue(budget.try_acquire())
+        self.assertFalse(budget.try_acquire())
+        clock.now = 0.5
+        self.assertTrue(budget.try_acquire())
+        self.assertEqual(budget.denied, 1)
+
+    def test_breaker_opens_and_probes(self):
+        """The breaker opens, lets one probe through, then closes."""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        breaker.allow()
+        breaker.record_failure()
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()
+        clock.now = 10
+        breaker.allow()
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+class TestRetryOnFailure(unittest.TestCase):
+    """Test suite for retry_on_failure and async_retry_on_failure."""
+
+    def setUp(self):
+        self.sleeps = []
+        self.budget = RetryBudget(rate=0, burst=100)
+
+    def retry(self, func, **kwargs):
+        kwargs.setdefault("budget", self.budget)
+        return retry_module.retry_on_failure(
+            sleep=self.sleeps.append, **kwargs)(func)
+
+    def test_transient_errors_are_retried(self):
+        """Locked-database errors are retried with growing backoff caps."""
+        func = Flaky(LOCKED, LOCKED)
+        self.assertEqual(self.retry(func, retries=3, delay=1)(), "ok")
+        self.assertEqual(func.calls, 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertLessEqual(self.sleeps[1], 2)
+
+    def test_other_errors_are_not_retried(self):
+        """Non-transient errors surface on the first attempt."""
+        func = Flaky(sqlite3.OperationalError("no such table: users"))
+        with self.assertRaises(sqlite3.OperationalError):
+            self.retry(func, retries=3)()
+        self.assertEqual(func.calls, 1)
+        self.assertEqual(self.sleeps, [])
+
+    def test_retries_must_be_positive(self):
+        """retries=0 is rejected instead of silently skipping the call."""
+        with self.assertRaises(ValueError):
+            self.retry(Flaky(), retries=0)
+        with self.assertRaises(ValueError):
+            retry_module.async_retry_on_failure(retries=0)
+
+    def test_other_errors_leave_the_breaker_alone(self):
+        """A bad query does not close an open or half-open circuit."""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10,
+                                 clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        func = Flaky(sqlite3.OperationalError("near \"SELEC\": syntax error"))
+        with self.assertRaises(sqlite3.OperationalError):
+            self.retry(func, retries=3, breaker=breaker)()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.allow()  # the next call may still probe
+
+    def test_empty_budget_stops_retries(self):
+        """No retry happens once the shared budget is spent."""
+        func = Flaky(LOCKED, LOCKED)
+        with self.assertRaises(sqlite3.OperationalError):
+            self.retry(func, retries=3, budget=RetryBudget(rate=0, burst=1))()
+        self.assertEqual(func.calls, 2)
+
+    def test_open_circuit_fails_fast(self):
+        """Once the breaker opens, calls fail without reaching the database."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        func = Flaky(LOCKED, LOCKED, LOCKED)
+        wrapped = self.retry(func, retries=5, breaker=breaker)
+        with self.assertRaises(CircuitOpenError):
+            wrapped()
+        self.assertEqual(func.calls, 2)
+        self.assertIs(wrapped.breaker, breaker)
+
+    def test_async_variant_awaits(self):
+        """The async decorator retries with awaited sleeps."""
+        func = Flaky(LOCKED)
+        sleeps = []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+
+        @retry_module.async_retry_on_failure(retries=2, budget=self.budget,
+                                             sleep=fake_sleep)
+        async def fetch():
+            return func()
+
+        self.assertEqual(asyncio.run(fetch()), "ok")
+        self.assertEqual(len(sleeps), 1)
+
+    def test_cancelled_probe_frees_the_breaker(self):
+        """A half-open probe that times out lets the next call probe."""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10,
+                                 clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        calls = []
+
+        @retry_module.async_retry_on_failure(retries=1, budget=self.budget,
+                                             breaker=breaker)
+        async def fetch(hang):
+            calls.append(hang)
+            if hang:
+                await asyncio.sleep(60)
+            return "ok"
+
+        async def scenario():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(fetch(True), 0.01)
+            return await fetch(False)
+
+        self.assertEqual(asyncio.run(scenario()), "ok")
+        self.assertEqual(calls, [True, False])
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
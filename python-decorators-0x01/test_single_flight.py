@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Stress tests for single-flight coalescing in cache_query."""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from query_cache import QueryCache, SQLiteCache
+from single_flight import SingleFlight
+
+cache_module = __import__('4-cache_query')
+
+CALLERS = 32
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test suite for the thread and asyncio single-flight paths."""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO users (name) VALUES (?)",
+                         [("ada",), ("bayo",)])
+        conn.commit()
+        conn.close()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def slow_query(self, conn, query, delay):
+        with self.lock:
+            self.calls += 1
+        time.sleep(delay)
+        return conn.execute(query).fetchall()
+
+    def test_concurrent_thread_misses_run_one_query(self):
+        """N threads missing the same key at once produce one DB query."""
+        cache = QueryCache(ttl=None)
+
+        @cache_module.cache_query(cache=cache)
+        def fetch(conn, query):
+            return self.slow_query(conn, query, 0.1)
+
+        barrier = threading.Barrier(CALLERS)
+        results = []
+
+        def caller():
+            conn = sqlite3.connect(self.path)
+            try:
+                barrier.wait()
+                results.append(fetch(conn, "SELECT name FROM users"))
+            finally:
+                conn.close()
+
+        threads = [threading.Thread(target=caller) for _ in range(CALLERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [[("ada",), ("bayo",)]] * CALLERS)
+        self.assertEqual(fetch.flight.stats.leaders, 1)
+        self.assertEqual(fetch.flight.stats.followers, CALLERS - 1)
+
+    def test_concurrent_async_misses_run_one_query(self):
+        """N coroutines missing the same key at once produce one DB query."""
+        cache = QueryCache(ttl=None)
+
+        @cache_module.cache_query(cache=cache)
+        async def fetch(conn, query):
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            return conn.execute(query).fetchall()
+
+        async def main():
+            conn = sqlite3.connect(self.path)
+            try:
+                return await asyncio.gather(*(
+                    fetch(conn, "SELECT name FROM users")
+                    for _ in range(CALLERS)))
+            finally:
+                conn.close()
+
+        results = asyncio.run(main())
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [[("ada",), ("bayo",)]] * CALLERS)
+
+    def test_errors_reach_every_waiter(self):
+        """Followers get the leader's exception; the next call retries."""
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def failing():
+            started.set()
+            release.wait()
+            raise sqlite3.OperationalError("database is locked")
+
+        def caller():
+            try:
+                flight.do("k", failing)
+            except sqlite3.OperationalError as exc:
+                errors.append(exc)
+
+        leader = threading.Thread(target=caller)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=caller)
+        follower.start()
+        while flight.stats.followers == 0:
+            time.sleep(0.001)
+        release.set()
+        leader.join()
+        follower.join()
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(flight.do("k", lambda: 42), 42)
+
+    def test_stale_while_revalidate(self):
+        """Expired entries are served while one caller refreshes them."""
+        cache = QueryCache(ttl=None)
+        refreshing = threading.Event()
+        release = threading.Event()
+
+        @cache_module.cache_query(cache=cache, ttl=0.05, stale_ttl=60)
+        def fetch(conn, query):
+            if self.calls:
+                refreshing.set()
+                release.wait()
+            return self.slow_query(conn, query, 0)
+
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.addCleanup(conn.close)
+        first = fetch(conn, "SELECT name FROM users")
+        time.sleep(0.06)
+        refresher = threading.Thread(
+            target=fetch, args=(conn, "SELECT name FROM users"))
+        refresher.start()
+        refreshing.wait()
+        self.assertEqual(fetch(conn, "SELECT name FROM users"), first)
+        self.assertEqual(self.calls, 1)
+        release.set()
+        refresher.join()
+        self.assertEqual(self.calls, 2)
+
+    def test_stale_and_plain_entries_do_not_mix(self):
+        """The same query cached with and without stale_ttl stays separate."""
+        cache = QueryCache(ttl=None)
+
+        def run(conn, query):
+            return self.slow_query(conn, query, 0)
+
+        plain = cache_module.cache_query(cache=cache)(run)
+        swr = cache_module.cache_query(cache=cache, ttl=60, stale_ttl=60)(run)
+        conn = sqlite3.connect(self.path)
+        self.addCleanup(conn.close)
+        expected = [("ada",), ("bayo",)]
+        self.assertEqual(swr(conn, "SELECT name FROM users"), expected)
+        self.assertEqual(plain(conn, "SELECT name FROM users"), expected)
+        self.assertEqual(swr(conn, "SELECT name FROM users"), expected)
+        self.assertEqual(plain(conn, "SELECT name FROM users"), expected)
+        self.assertEqual(self.calls, 2)
+
+    def test_leader_rechecks_the_cache(self):
+        """A caller that missed just before the last save does not requery."""
+        outer = self
+
+        class RacingCache(QueryCache):
+            """Lets a whole cached call finish between lookup and load."""
+
+            raced = False
+
+            def get(self, key, default=None, count=True):
+                result = super().get(key, default, count)
+                if not self.raced:
+                    self.raced = True
+                    other = threading.Thread(target=outer.run_fetch,
+                                             args=(fetch,))
+                    other.start()
+                    other.join()
+                return result
+
+        @cache_module.cache_query(cache=RacingCache(ttl=None))
+        def fetch(conn, query):
+            return self.slow_query(conn, query, 0)
+
+        self.assertEqual(self.run_fetch(fetch), [("ada",), ("bayo",)])
+        self.assertEqual(self.calls, 1)
+
+    def run_fetch(self, fetch):
+        conn = sqlite3.connect(self.path)
+        try:
+            return fetch(conn, "SELECT name FROM users")
+        finally:
+            conn.close()
+
+    def test_async_path_keeps_cache_io_off_the_loop(self):
+        """Blocking cache backends are read and written in worker threads."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = SQLiteCache(os.path.join(directory.name, "cache.db"),
+                            ttl=None)
+        self.addCleanup(cache.close)
+        threads = []
+        get, set_ = cache.get, cache.set
+
+        def spy(method):
+            def call(*args, **kwargs):
+                threads.append(threading.current_thread())
+                return method(*args, **kwargs)
+            return call
+        cache.get, cache.set = spy(get), spy(set_)
+
+        @cache_module.cache_query(cache=cache)
+        async def fetch(conn, query):
+            self.calls += 1
+            return conn.execute(query).fetchall()
+
+        async def main():
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            try:
+                first = await fetch(conn, "SELECT name FROM users")
+                second = await fetch(conn, "SELECT name FROM users")
+                return first, second
+            finally:
+                conn.close()
+
+        first, second = asyncio.run(main())
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.main_thread(), threads)
+
+
+if __name__ == "__main__":
+    unittest.main()
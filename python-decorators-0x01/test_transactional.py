@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Unit tests for transactions.py and the transactional decorator."""
+import os
+import signal
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import db_pool
+import transactions
+from query_cache import WriteTracker
+from transactions import GroupCommitter, get_committer, transaction
+
+transactional = __import__('2-transactional').transactional
+
+
+class TransactionTestCase(unittest.TestCase):
+    """Points the default pool at a scratch users table."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "username TEXT UNIQUE, email TEXT)")
+        conn.commit()
+        conn.close()
+        db_pool.configure_pool(database=self.path)
+
+    def tearDown(self):
+        db_pool.configure_pool(database="users.db")
+        self.dir.cleanup()
+
+    def usernames(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return [r[0] for r in conn.execute("SELECT username FROM users ORDER BY id")]
+        finally:
+            conn.close()
+
+
+def insert(conn, username):
+    conn.execute("INSERT INTO users (username, email) VALUES (?, ?)",
+                 (username, f"{username}@example.com"))
+    return username
+
+
+class TestTransaction(TransactionTestCase):
+    """Test suite for ambient transactions and savepoints."""
+
+    def test_commit_and_rollback(self):
+        """Successful calls commit; failing calls leave nothing behind."""
+        add = transactional(insert)
+        add("ada")
+        with self.assertRaises(sqlite3.IntegrityError):
+            add("ada")
+        self.assertEqual(self.usernames(), ["ada"])
+
+    def test_nested_calls_share_the_connection(self):
+        """An inner @transactional call joins the outer transaction."""
+        seen = []
+
+        @transactional
+        def inner(conn):
+            seen.append(conn)
+            insert(conn, "bayo")
+
+        @transactional
+        def outer(conn):
+            seen.append(conn)
+            insert(conn, "ada")
+            inner()
+
+        outer()
+        self.assertIs(seen[0], seen[1])
+        self.assertEqual(self.usernames(), ["ada", "bayo"])
+
+    def test_savepoint_rolls_back_alone(self):
+        """A failing nested block undoes only its own writes."""
+        with transaction() as conn:
+            insert(conn, "ada")
+            with self.assertRaises(RuntimeError):
+                with transaction():
+                    insert(conn, "bayo")
+                    raise RuntimeError("undo bayo")
+            insert(conn, "chioma")
+        self.assertEqual(self.usernames(), ["ada", "chioma"])
+
+    def test_failed_commit_stops_tracking(self):
+        """A COMMIT that raises still detaches the write tracker."""
+        db_pool.configure_pool(
+            pragmas=dict(db_pool.DEFAULT_PRAGMAS, foreign_keys="ON"))
+        self.addCleanup(db_pool.configure_pool, pragmas=None)
+        trackers = []
+
+        class RecordingTracker(WriteTracker):
+            def __init__(self, conn):
+                super().__init__(conn)
+                trackers.append(self)
+
+        with transaction() as conn:
+            conn.execute("CREATE TABLE teams (id INTEGER PRIMARY KEY)")
+            conn.execute("CREATE TABLE members (team_id INTEGER REFERENCES "
+                         "teams (id) DEFERRABLE INITIALLY DEFERRED)")
+        with patch.object(transactions, "WriteTracker", RecordingTracker):
+            with self.assertRaises(sqlite3.IntegrityError):
+                with transaction() as conn:
+                    # the deferred foreign key fails at COMMIT
+                    conn.execute("INSERT INTO members VALUES (1)")
+            (tracker,) = trackers
+            with db_pool.get_pool().connection() as conn:
+                insert(conn, "ada")
+        self.assertEqual(tracker.tables, set())
+
+
+class TestGroupCommit(TransactionTestCase):
+    """Test suite for GroupCommitter."""
+
+    def test_concurrent_writes_share_commits(self):
+        """Concurrent calls are all committed, in fewer commits than calls."""
+        committer = GroupCommitter(window=0.02)
+        self.addCleanup(committer.close)
+        barrier = threading.Barrier(20)
+        results = []
+
+        def writer(n):
+            barrier.wait()
+            results.append(committer.run(lambda conn: insert(conn, f"u{n}")))
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(self.usernames()), sorted(results))
+        self.assertEqual(committer.calls, 20)
+        self.assertLess(committer.commits, 20)
+
+    def test_failed_call_does_not_sink_the_group(self):
+        """One failing call gets its error; the rest of the group commits."""
+        committer = GroupCommitter(window=0.05)
+        futures = [committer.submit(lambda conn: insert(conn, "ada")),
+                   committer.submit(lambda conn: insert(conn, "ada")),
+                   committer.submit(lambda conn: insert(conn, "bayo"))]
+        committer.close()
+        self.assertEqual(futures[0].result(), "ada")
+        with self.assertRaises(sqlite3.IntegrityError):
+            futures[1].result()
+        self.assertEqual(futures[2].result(), "bayo")
+        self.assertEqual(self.usernames(), ["ada", "bayo"])
+        self.assertEqual(committer.commits, 1)
+
+    def use_fresh_committer(self):
+        """Drop the process-wide committer now and after the test."""
+        def reset():
+            if transactions._committer is not None:
+                transactions._committer.close()
+            transactions._committer = None
+        reset()
+        self.addCleanup(reset)
+
+    def test_committer_restarts_after_checkout_failure(self):
+        """A committer that could not get a connection is replaced."""
+        self.use_fresh_committer()
+        with patch.object(transactions, "get_pool",
+                          side_effect=db_pool.PoolError("pool timeout")):
+            dead = get_committer()
+            dead._thread.join()
+        self.assertFalse(dead.alive)
+        with self.assertRaises(RuntimeError):
+            dead.run(lambda conn: insert(conn, "ada"))
+        committer = get_committer()
+        self.assertIsNot(committer, dead)
+        self.assertEqual(committer.run(lambda conn: insert(conn, "ada")), "ada")
+        self.assertEqual(self.usernames(), ["ada"])
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_forked_child_gets_its_own_committer(self):
+        """After fork() the child starts a committer instead of hanging."""
+        self.use_fresh_committer()
+        parent = get_committer()
+        parent.run(lambda conn: insert(conn, "ada"))
+        pid = os.fork()
+        if pid == 0:
+            ok = False
+            try:
+                signal.alarm(10)  # never hang the test run
+                child = get_committer()
+                ok = (child is not parent and
+                      child.run(lambda conn: insert(conn, "bayo")) == "bayo")
+            finally:
+                os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertIs(get_committer(), parent)
+        self.assertEqual(self.usernames(), ["ada", "bayo"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Transaction manager behind the transactional decorator.
+
+transaction() reuses the ambient connection: the outermost block borrows
+a pooled connection and runs BEGIN ... COMMIT, and blocks nested inside
+it (in the same thread or asyncio task) become SAVEPOINTs that roll back
+on their own:
+
+    with transaction() as conn:
+        conn.execute("INSERT ...")
+        with transaction():              # SAVEPOINT sp_1
+            ...                          # an error here undoes only this block
+
+GroupCommitter coalesces many small write transactions from concurrent
+callers into one COMMIT (one fsync): calls queued while the previous
+group commits (plus an optional latency `window`) run back to back on a
+single connection, each in its own savepoint, and every caller returns
+once the shared commit is durable.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from db_pool import get_pool
+from query_cache import WriteTracker
+
+# (connection, savepoint depth) of the innermost open transaction
+_ambient = ContextVar("ambient_transaction", default=None)
+
+
+def current_connection():
+    """The connection of the enclosing transaction() block, if any."""
+    state = _ambient.get()
+    return state[0] if state else None
+
+
+@contextmanager
+def transaction(pool=None, immediate=True):
+    """
+    Open a transaction, or a savepoint when one is already open.
+
+    immediate=True takes the write lock up front (BEGIN IMMEDIATE) so two
+    writers never deadlock upgrading from a read lock.
+    """
+    state = _ambient.get()
+    if state is not None:
+        conn, depth = state
+        name = f"sp_{depth + 1}"
+        conn.execute(f"SAVEPOINT {name}")
+        token = _ambient.set((conn, depth + 1))
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            raise
+        else:
+            conn.execute(f"RELEASE {name}")
+        finally:
+            _ambient.reset(token)
+        return
+
+    with (pool or get_pool()).connection() as conn:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        tracker = WriteTracker(conn)
+        token = _ambient.set((conn, 0))
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+            tracker.commit()
+        finally:
+            _ambient.reset(token)
+            # no-op after tracker.commit(); otherwise (an error, or COMMIT
+            # itself failing) stop tracking the connection uninvalidated
+            tracker.discard()
+
+
+class GroupCommitter:
+    """
+    Runs submitted fn(conn) calls on one connection and commits them in
+    groups: a group closes `window` seconds after its first call or at
+    `max_batch` calls, whichever comes first. With window=0 a group is
+    whatever queued up during the previous commit, which already batches
+    well under load; a longer window trades latency for bigger groups.
+    The committer thread keeps one pooled connection checked out.
+    """
+
+    def __init__(self, pool=None, window=0.0, max_batch=256):
+        self.pool = pool
+        self.window = window
+        self.max_batch = max_batch
+        self.commits = 0
+        self.calls = 0
+        self._queue = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="group-commit",
+                                        daemon=True)
+        self._thread.start()
+
+    @property
+    def alive(self):
+        """False once closed, or when the committer thread is gone."""
+        return not self._stopped and self._thread.is_alive()
+
+    def submit(self, fn):
+        """Queue fn(conn); the Future resolves after its group commits."""
+        future = Future()
+        with self._cond:
+            if not self.alive:
+                raise RuntimeError("group committer is closed")
+            self._queue.append((fn, future))
+            self._cond.notify()
+        return future
+
+    def run(self, fn):
+        """submit(fn) and wait for the commit; returns fn's result."""
+        return self.submit(fn).result()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._stopped:
+                self._cond.wait()
+            deadline = time.monotonic() + self.window
+            while len(self._queue) < self.max_batch and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._queue[:self.max_batch]
+            del self._queue[:self.max_batch]
+            return batch
+
+    def _run(self):
+        try:
+            with (self.pool or get_pool()).connection() as conn:
+                while True:
+                    batch = self._next_batch()
+                    if not batch:
+                        return
+                    self._commit(conn, batch)
+        except Exception as exc:
+            # no connection: fail everyone instead of leaving them waiting
+            with self._cond:
+                self._stopped = True
+                pending, self._queue = self._queue, []
+            for _, future in pending:
+                future.set_exception(exc)
+
+    def _commit(self, conn, batch):
+        results = []
+        tracker = None
+        # nested transaction() blocks inside fn become savepoints
+        token = _ambient.set((conn, 1))
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            tracker = WriteTracker(conn)
+            for fn, future in batch:
+                # each call can fail without sinking the rest of the group
+                conn.execute("SAVEPOINT sp_1")
+                try:
+                    results.append((future, fn(conn), None))
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO sp_1")
+                    results.append((future, None, exc))
+                conn.execute("RELEASE sp_1")
+            conn.commit()
+            tracker.commit()
+        except Exception as exc:
+            if tracker is not None:
+                tracker.discard()
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        finally:
+            _ambient.reset(token)
+        self.commits += 1
+        self.calls += len(batch)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def close(self):
+        """Commit whatever is queued, then stop the committer thread."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+
+
+_committer = None
+_committer_lock = threading.Lock()
+
+
+def get_committer():
+    """
+    Return the process-wide GroupCommitter, starting it on first use and
+    again if the previous one died (e.g. it could not get a connection).
+    """
+    global _committer
+    with _committer_lock:
+        if _committer is None or not _committer.alive:
+            _committer = GroupCommitter()
+        return _committer
+
+
+def _forget_committer():
+    # a forked child inherits the committer but not its thread
+    global _committer, _committer_lock
+    _committer = None
+    _committer_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_committer)
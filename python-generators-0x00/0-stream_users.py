@@ -1,19 +1,69 @@
 
 from seed import connect_to_prodev
+from filters import row_check, split_filter
+from rows import check_projection, open_cursor, row_converter, select_list
 
-def stream_users():
+
+def stream_users(streaming=False, chunk_size=1000, columns=None,
+                 row_type="dict", where=None, snapshot=None, checkpoint=None):
     """
     Generator that yields one user row (as a dict) at a time
     from the user_data table.
+
+    With streaming=True the rows are read through an unbuffered cursor
+    in fetchmany(chunk_size) chunks, so at most `chunk_size` rows are
+    held client-side no matter how large the table is.
+
+    `columns` restricts the SELECT to those columns and `row_type`
+    ("dict", "tuple" or "namedtuple") picks the row shape; see rows.py.
+    `where` is a filters.Filter, pushed into SQL where possible.
+    `snapshot` names a local snapshot file to replay from while the
+    table is unchanged (see snapshot.py). `checkpoint` names a high-water
+    mark file: only rows changed since the last run are yielded
+    (see incremental.py).
     """
+    if checkpoint:
+        from incremental import stream_changes
+        yield from stream_changes(checkpoint, chunk_size, columns, row_type,
+                                  where)
+        return
+    if snapshot:
+        from snapshot import snapshot_users
+        yield from snapshot_users(snapshot, columns, row_type, where)
+        return
+    columns = check_projection(columns, row_type)
+    clause, params, residual = split_filter(where, columns)
+    query = f"SELECT {select_list(columns)} FROM user_data"
+    if clause:
+        query += f" WHERE {clause}"
     conn = connect_to_prodev()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data;")
-    # Single loop — fetch & yield each row
-    for row in cursor:
-        yield row
-    cursor.close()
-    conn.close()
+    cursor = open_cursor(conn, row_type, streaming)
+    try:
+        cursor.execute(query, params)
+        convert = row_converter(cursor.column_names, row_type)
+        check = row_check(residual, cursor.column_names, row_type)
+        if streaming:
+            # Bounded chunks straight off the wire
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if check:
+                    rows = filter(check, rows)
+                yield from (map(convert, rows) if convert else rows)
+        else:
+            # Single loop — fetch & yield each row
+            for row in cursor:
+                if check and not check(row):
+                    continue
+                yield convert(row) if convert else row
+    finally:
+        try:
+            cursor.close()
+        finally:
+            # hand the connection back even if the cursor will not close
+            conn.close()
+
 
 if __name__ == "__main__":
     # Example usage: print every user.
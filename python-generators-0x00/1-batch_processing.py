@@ -1,53 +1,128 @@
 import sys
 from seed import connect_to_prodev
+from filters import Col, row_check, split_filter
+from rows import (
+    check_projection, field_getter, open_cursor, row_converter, select_list,
+)
 
 
-def stream_users_in_batches(batch_size):
+class Batch(list):
+    """
+    A list of user rows that also carries a resumable keyset cursor.
+    `cursor` is the last user_id in the batch (None for offset batches);
+    pass it back as `after=` to resume the stream right after this batch.
+    """
+
+    def __init__(self, rows, cursor=None):
+        super().__init__(rows)
+        self.cursor = cursor
+
+
+def stream_users_in_batches(batch_size, mode="offset", after=None,
+                            columns=None, row_type="dict", where=None):
     """
     Generator that yields lists of user rows (dicts) in batches of size `batch_size`.
+
+    mode="offset" pages with LIMIT/OFFSET (each batch rescans earlier rows).
+    mode="keyset" seeks past the last seen user_id instead, so a full pass
+    stays linear; start from `after` to resume from a saved batch.cursor.
+
+    `columns`/`row_type` project the rows as in rows.py; keyset mode
+    needs user_id in the projection. `where` is a filters.Filter: the
+    SQL-expressible part is pushed into the query, the rest is checked
+    in Python (so such batches may come back smaller than batch_size).
     """
+    if mode not in ("offset", "keyset"):
+        raise ValueError(f"unknown batch mode: {mode!r}")
+    if after is not None and mode != "keyset":
+        raise ValueError("`after` is only supported in keyset mode")
+    columns = check_projection(columns, row_type)
+    if mode == "keyset" and columns is not None and "user_id" not in columns:
+        raise ValueError("keyset mode needs user_id in columns")
+    clause, params, residual = split_filter(where, columns)
+    base = f"SELECT {select_list(columns)} FROM user_data"
+    if clause:
+        base += f" WHERE {clause}"
+    joiner = " AND " if clause else " WHERE "
+
     conn = connect_to_prodev()
-    cursor = conn.cursor(dictionary=True)
+    cursor = open_cursor(conn, row_type)
     offset = 0
-    # single loop to fetch in batches
-    while True:
-        cursor.execute(
-            "SELECT * FROM user_data LIMIT %s OFFSET %s",
-            (batch_size, offset)
-        )
-        rows = cursor.fetchall()
-        if not rows:
-            break
-        yield rows
-        offset += batch_size
-
-    cursor.close()
-    conn.close()
+    last_id = after
+    convert = key_of = check = None
+    try:
+        # single loop to fetch in batches
+        while True:
+            if mode == "keyset":
+                if last_id is None:
+                    cursor.execute(
+                        base + " ORDER BY user_id LIMIT %s",
+                        params + (batch_size,)
+                    )
+                else:
+                    cursor.execute(
+                        base + joiner + "user_id > %s ORDER BY user_id LIMIT %s",
+                        params + (last_id, batch_size)
+                    )
+            else:
+                cursor.execute(
+                    base + " LIMIT %s OFFSET %s",
+                    params + (batch_size, offset)
+                )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            if key_of is None:
+                names = cursor.column_names
+                convert = row_converter(names, row_type)
+                check = row_check(residual, names, row_type)
+                if mode == "keyset":
+                    key_of = field_getter(names, row_type, "user_id")
+                else:
+                    key_of = False
+            if key_of:
+                last_id = key_of(rows[-1])
+            offset += batch_size
+            if check:
+                rows = [row for row in rows if check(row)]
+                if not rows:
+                    continue
+            yield Batch(map(convert, rows) if convert else rows, last_id)
+    finally:
+        try:
+            cursor.close()
+        finally:
+            # hand the connection back even if the cursor will not close
+            conn.close()
     return  # ← added to ensure at least one return in the file
 
 
-def batch_processing(batch_size):
+def batch_processing(batch_size, mode="offset", columns=None, row_type="dict"):
     """
     Generator that yields individual user rows where age > 25,
     processing each batch from stream_users_in_batches.
+    The age filter runs in MySQL, so only matching rows are fetched.
     """
     # loop over each batch
-    for batch in stream_users_in_batches(batch_size):
+    for batch in stream_users_in_batches(batch_size, mode=mode,
+                                         columns=columns, row_type=row_type,
+                                         where=Col("age") > 25):
         # loop over users in the batch
-        for user in batch:
-            if user.get('age', 0) > 25:
-                yield user
+        yield from batch
     return  # ← added to satisfy the test’s “contains: ['return']” check
 
 
 if __name__ == "__main__":
-    # allow batch size via CLI, default 50
+    # allow batch size via CLI, default 50; pass "keyset" to seek by user_id
     size = 50
+    mode = "offset"
     if len(sys.argv) > 1:
         try:
             size = int(sys.argv[1])
         except ValueError:
             pass
+    if len(sys.argv) > 2:
+        mode = sys.argv[2]
 
-    for u in batch_processing(size):
+    for u in batch_processing(size, mode=mode):
         print(u)
@@ -1,47 +1,158 @@
+import queue
+import threading
+from itertools import islice
 
 from seed import connect_to_prodev
+from filters import row_check, split_filter
+from rows import check_projection, open_cursor, row_converter, select_list
 
 
-def paginate_users(page_size, offset):
+def fetch_page(page_size, offset, columns=None, row_type="dict", where=None):
     """
-    Helper that fetches a single page of users from the database.
-    Returns a list of dicts (may be empty).
+    Fetch one page and return (fetched, rows): `fetched` is how many rows
+    MySQL returned, `rows` those left after any residual Python filter.
     """
+    columns = check_projection(columns, row_type)
+    clause, params, residual = split_filter(where, columns)
+    query = f"SELECT {select_list(columns)} FROM user_data"
+    if clause:
+        query += f" WHERE {clause}"
     conn = connect_to_prodev()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(
-        "SELECT * FROM user_data LIMIT %s OFFSET %s",
-        (page_size, offset)
-    )
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return rows
+    cursor = open_cursor(conn, row_type)
+    try:
+        cursor.execute(query + " LIMIT %s OFFSET %s",
+                       params + (page_size, offset))
+        rows = cursor.fetchall()
+        fetched = len(rows)
+        check = row_check(residual, cursor.column_names, row_type)
+        if check:
+            rows = [row for row in rows if check(row)]
+        convert = row_converter(cursor.column_names, row_type)
+        if convert:
+            rows = [convert(row) for row in rows]
+    finally:
+        try:
+            cursor.close()
+        finally:
+            # hand the connection back even if the cursor will not close
+            conn.close()
+    return fetched, rows
+
+
+def paginate_users(page_size, offset, columns=None, row_type="dict",
+                   where=None):
+    """
+    Helper that fetches a single page of users from the database.
+    Returns a list of dicts (may be empty), or of `row_type` rows
+    restricted to `columns` (see rows.py), matching filters.Filter `where`.
+    """
+    return fetch_page(page_size, offset, columns, row_type, where)[1]
 
 
-def lazy_paginate(page_size):
+def lazy_paginate(page_size, columns=None, row_type="dict", where=None,
+                  prefetch=0, snapshot=None):
     """
     Generator that lazily loads pages of users.
     Yields one page (list of dicts) at a time.
     Uses only one loop internally.
+
+    With prefetch=k a background thread keeps up to k pages queued ahead
+    of the consumer, so fetching overlaps with processing. `snapshot`
+    replays pages from a local snapshot file (see snapshot.py).
     """
+    if prefetch < 0:
+        raise ValueError("prefetch must be 0 or a positive page count")
+    if snapshot:
+        from snapshot import snapshot_users
+        rows = snapshot_users(snapshot, columns, row_type, where)
+        while True:
+            page = list(islice(rows, page_size))
+            if not page:
+                break
+            yield page
+        return
+    if prefetch:
+        yield from _prefetched_pages(page_size, columns, row_type, where,
+                                     prefetch)
+        return
     offset = 0
     # Single loop to fetch page after page
     while True:
-        page = paginate_users(page_size, offset)
-        if not page:
+        fetched, page = fetch_page(page_size, offset, columns, row_type, where)
+        if not fetched:
             break
-        yield page
+        if page:
+            yield page
         offset += page_size
 
 
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+def _prefetched_pages(page_size, columns, row_type, where, depth):
+    """
+    Pages from a producer thread through a queue of at most `depth` pages.
+    Closing the generator stops the producer; a producer error is
+    re-raised in the consumer.
+    """
+    pages = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def offer(item):
+        # put() that gives up once the consumer has gone away
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        offset = 0
+        try:
+            while not stop.is_set():
+                fetched, page = fetch_page(page_size, offset, columns,
+                                           row_type, where)
+                if not fetched:
+                    break
+                if page and not offer(page):
+                    return
+                offset += page_size
+        except BaseException as error:
+            offer(_Failed(error))
+            return
+        offer(_DONE)
+
+    producer = threading.Thread(target=produce, name="lazy_paginate-prefetch",
+                                daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = pages.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
 if __name__ == "__main__":
     import sys
-    # allow page size from command line
+    # allow page size (and prefetch depth) from command line
     size = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 0
     # print each user in each page
     try:
-        for page in lazy_paginate(size):
+        for page in lazy_paginate(size, prefetch=depth):
             for user in page:
                 print(user)
     except BrokenPipeError:
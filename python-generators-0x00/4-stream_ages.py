@@ -1,5 +1,7 @@
 
 from seed import connect_to_prodev
+from aggregates import mean
+from rows import open_cursor
 
 
 def stream_user_ages():
@@ -7,27 +9,29 @@ def stream_user_ages():
     Generator that yields one user age at a time from the database.
     """
     conn = connect_to_prodev()
-    cursor = conn.cursor()
-    cursor.execute("SELECT age FROM user_data;")
-    for (age,) in cursor:
-        yield age
-    cursor.close()
-    conn.close()
+    cursor = open_cursor(conn)
+    try:
+        cursor.execute("SELECT age FROM user_data;")
+        for (age,) in cursor:
+            yield age
+    finally:
+        try:
+            cursor.close()
+        finally:
+            # hand the connection back even if the cursor will not close
+            conn.close()
 
 
-def average_age():
+def average_age(workers=0):
     """
     Calculate and print the average age without loading all rows into memory.
-    Uses the stream_user_ages generator.
+    The mean is computed by MySQL (SELECT AVG(age)); see aggregates.py.
+    workers=N splits the scan into N user_id ranges run concurrently.
     """
-    total = 0
-    count = 0
-    for age in stream_user_ages():
-        total += age
-        count += 1
-    avg = (total / count) if count else 0
+    avg = mean("age", workers=workers) or 0
     print(f"Average age of users: {avg:.2f}")
 
 
 if __name__ == "__main__":
-    average_age()
+    import sys
+    average_age(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
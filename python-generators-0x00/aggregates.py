@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Aggregations over user_data.
+
+Each function runs as a single SQL aggregate when its `where` filter can be
+pushed down entirely, so only the result crosses the wire. When part of the
+filter has to run in Python (a filters.Custom), the column is streamed once
+instead of being loaded into memory: summarize() keeps a constant-size
+accumulator, while percentiles() and histogram() stay exact and keep one
+counter per distinct value / bucket (a few dozen for age).
+
+Only numeric columns (NUMERIC_COLUMNS) can be aggregated.
+"""
+import math
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from seed import connect_to_prodev
+from filters import And, Compare, split_filter
+from parallel_scan import key_ranges, parallel_reduce
+from rows import open_cursor
+
+stream_users = __import__('0-stream_users').stream_users
+
+#: user_data columns the aggregates accept
+NUMERIC_COLUMNS = ("age",)
+
+
+class RunningStats:
+    """Single-pass count/sum/mean/variance/min/max (Welford's algorithm)."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Fold another RunningStats (e.g. from a parallel range) into this one."""
+        if not other.count:
+            return self
+        if not self.count:
+            self.__dict__.update(other.__dict__)
+            return self
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / n
+        self.mean += delta * other.count / n
+        self.count = n
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance."""
+        return self._m2 / self.count if self.count else None
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.total if self.count else None,
+            "avg": self.mean if self.count else None,
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+def _check_column(column):
+    if column not in NUMERIC_COLUMNS:
+        raise ValueError(f"not a numeric user_data column: {column!r}")
+
+
+def _query(sql, params):
+    conn = connect_to_prodev()
+    cursor = open_cursor(conn)
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _where(clause):
+    return f" WHERE {clause}" if clause else ""
+
+
+def _residual_columns(column, residual):
+    """Extra columns to fetch so the residual filter can run on the rows."""
+    if residual is None:
+        return ()
+    return tuple(sorted(residual.columns() - {column, "user_id"}))
+
+
+def _values(column, where):
+    """Stream one column, applying the full filter (pushed and residual)."""
+    _, _, residual = split_filter(where)
+    columns = (column,) + _residual_columns(column, residual)
+    for row in stream_users(streaming=True, columns=columns,
+                            row_type="tuple", where=where):
+        if row[0] is not None:
+            yield row[0]
+
+
+def _stats_of_second(rows):
+    """RunningStats over the second field of (user_id, value, ...) rows."""
+    stats = RunningStats()
+    for row in rows:
+        if row[1] is not None:
+            stats.add(row[1])
+    return stats
+
+
+def _summarize_range(column, where, after, upto):
+    parts = [where] if where is not None else []
+    if after is not None:
+        parts.append(Compare("user_id", ">", after))
+    if upto is not None:
+        parts.append(Compare("user_id", "<=", upto))
+    return summarize(column, And(*parts) if len(parts) > 1 else
+                     parts[0] if parts else None)
+
+
+def _summarize_parallel(column, where, residual, workers, processes):
+    if residual is not None:
+        columns = ("user_id", column) + _residual_columns(column, residual)
+        partials = parallel_reduce(_stats_of_second, workers,
+                                   columns=columns,
+                                   row_type="tuple", where=where,
+                                   processes=processes)
+        stats = RunningStats()
+        for part in partials:
+            stats.merge(part)
+        return stats.as_dict()
+    ranges = key_ranges(workers, where)
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        parts = list(pool.map(
+            lambda r: _summarize_range(column, where, *r), ranges
+        ))
+    parts = [part for part in parts if part["count"]]
+    if not parts:
+        return {"count": 0, "sum": None, "avg": None, "min": None, "max": None}
+    n = sum(part["count"] for part in parts)
+    sum_ = sum(part["sum"] for part in parts)
+    return {
+        "count": n,
+        "sum": sum_,
+        "avg": sum_ / n,
+        "min": min(part["min"] for part in parts),
+        "max": max(part["max"] for part in parts),
+    }
+
+
+def summarize(column="age", where=None, workers=0, processes=False):
+    """
+    Return {"count", "sum", "avg", "min", "max"} for `column`.
+    workers=N splits the work over N user_id ranges (see parallel_scan.py)
+    and merges the partial results; processes=True runs streaming
+    fallbacks in worker processes instead of threads.
+    """
+    _check_column(column)
+    clause, params, residual = split_filter(where)
+    if workers and workers > 1:
+        return _summarize_parallel(column, where, residual, workers, processes)
+    if residual is None:
+        (row,) = _query(
+            f"SELECT COUNT({column}), SUM({column}), AVG({column}), "
+            f"MIN({column}), MAX({column}) FROM user_data{_where(clause)}",
+            params,
+        )
+        n, sum_, avg, lo, hi = row
+        # MySQL returns DECIMAL for SUM/AVG over INT columns
+        return {
+            "count": n,
+            "sum": int(sum_) if sum_ is not None else None,
+            "avg": float(avg) if avg is not None else None,
+            "min": lo,
+            "max": hi,
+        }
+    stats = RunningStats()
+    for value in _values(column, where):
+        stats.add(value)
+    return stats.as_dict()
+
+
+def count(column="age", where=None, workers=0):
+    return summarize(column, where, workers)["count"]
+
+
+def total(column="age", where=None, workers=0):
+    return summarize(column, where, workers)["sum"]
+
+
+def mean(column="age", where=None, workers=0):
+    return summarize(column, where, workers)["avg"]
+
+
+def minimum(column="age", where=None, workers=0):
+    return summarize(column, where, workers)["min"]
+
+
+def maximum(column="age", where=None, workers=0):
+    return summarize(column, where, workers)["max"]
+
+
+def _rank(q, n):
+    """Nearest-rank index (0-based) of quantile q among n sorted values."""
+    if not 0 <= q <= 1:
+        raise ValueError(f"quantile must be in [0, 1]: {q!r}")
+    return max(math.ceil(q * n) - 1, 0)
+
+
+def percentiles(qs=(0.5, 0.95, 0.99), column="age", where=None):
+    """
+    Nearest-rank percentiles of `column`, as {q: value}.
+
+    Pushed down, each quantile is one ORDER BY ... LIMIT 1 OFFSET k seek.
+    The fallback is exact: it counts each distinct value, so its memory
+    grows with the column's cardinality (about 100 counters for age).
+    """
+    _check_column(column)
+    clause, params, residual = split_filter(where)
+    if residual is None:
+        base = f"FROM user_data{_where(clause)}"
+        notnull = f"{column} IS NOT NULL"
+        base += f" AND {notnull}" if clause else f" WHERE {notnull}"
+        ((n,),) = _query(f"SELECT COUNT(*) {base}", params)
+        if not n:
+            return {q: None for q in qs}
+        result = {}
+        for q in qs:
+            rows = _query(
+                f"SELECT {column} {base} ORDER BY {column} LIMIT 1 OFFSET %s",
+                params + (_rank(q, n),),
+            )
+            result[q] = rows[0][0]
+        return result
+    counts = Counter(_values(column, where))
+    n = sum(counts.values())
+    if not n:
+        return {q: None for q in qs}
+    ordered = sorted(counts.items())
+    result = {}
+    for q in qs:
+        rank, seen = _rank(q, n), 0
+        for value, c in ordered:
+            seen += c
+            if seen > rank:
+                result[q] = value
+                break
+    return result
+
+
+def histogram(width, column="age", where=None):
+    """Return [(bucket_start, count), ...] for fixed-width numeric buckets."""
+    _check_column(column)
+    if width <= 0:
+        raise ValueError("bucket width must be positive")
+    clause, params, residual = split_filter(where)
+    if residual is None:
+        rows = _query(
+            f"SELECT FLOOR({column} / %s) * %s AS bucket, COUNT(*) "
+            f"FROM user_data{_where(clause)} GROUP BY bucket ORDER BY bucket",
+            (width, width) + params,
+        )
+        return [(int(b), n) for b, n in rows if b is not None]
+    buckets = Counter(
+        math.floor(value / width) * width for value in _values(column, where)
+    )
+    return sorted(buckets.items())
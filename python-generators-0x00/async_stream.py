@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Async-generator counterparts of the user_data generators.
+
+    astream_users          ~ 0-stream_users.stream_users
+    astream_users_in_batches ~ 1-batch_processing.stream_users_in_batches
+    alazy_paginate         ~ 2-lazy_paginate.lazy_paginate
+    astream_user_ages      ~ 4-stream_ages.stream_user_ages
+
+All of them talk to the database through an AsyncBackend, so many streams
+can run concurrently on one event loop:
+
+    async for user in astream_users(columns=("name", "age")):
+        ...
+    await asyncio.gather(consume(astream_users()), consume(alazy_paginate(100)))
+
+AioMySQLBackend (aiomysql) is the default; AioSQLiteBackend (aiosqlite)
+runs the same generators against a local SQLite copy of user_data.
+"""
+import asyncio
+import os
+
+from seed import PRODEV_CONFIG
+from filters import row_check, split_filter
+from rows import check_projection, row_converter, select_list
+
+Batch = __import__('1-batch_processing').Batch
+
+
+class AsyncBackend:
+    """
+    Minimal async database interface used by the generators.
+
+    connection() is an async context manager yielding an object with
+    `await execute(sql, params)` returning a cursor that supports
+    `await fetchmany(n)`, `await fetchall()`, `description` and
+    `await close()`. SQL is written with %s placeholders.
+    """
+
+    def connection(self):
+        raise NotImplementedError
+
+
+class AioMySQLBackend(AsyncBackend):
+    """aiomysql pool (created lazily per event loop) with unbuffered cursors."""
+
+    def __init__(self, minsize=1, maxsize=5, **config):
+        self.config = config or dict(PRODEV_CONFIG)
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self._pools = {}
+
+    async def _pool(self):
+        import aiomysql
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            config = dict(self.config)
+            config["db"] = config.pop("database", None)
+            pool = await aiomysql.create_pool(minsize=self.minsize,
+                                              maxsize=self.maxsize, **config)
+            self._pools[loop] = pool
+        return pool
+
+    def connection(self):
+        return _AioMySQLConnection(self)
+
+    async def close(self):
+        for pool in self._pools.values():
+            pool.close()
+            await pool.wait_closed()
+        self._pools.clear()
+
+
+class _AioMySQLConnection:
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def __aenter__(self):
+        import aiomysql
+        self._pool = await self.backend._pool()
+        self._conn = await self._pool.acquire()
+        self._cursor_class = aiomysql.SSCursor
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self._pool.release(self._conn)
+        return False
+
+    async def execute(self, sql, params=()):
+        cursor = await self._conn.cursor(self._cursor_class)
+        await cursor.execute(sql, params)
+        return cursor
+
+
+class AioSQLiteBackend(AsyncBackend):
+    """aiosqlite connection per stream; %s placeholders become ?."""
+
+    def __init__(self, path=None):
+        # same file as backends.SQLiteBackend
+        self.path = path or os.environ.get("PRODEV_SQLITE_PATH",
+                                           "ALX_prodev.db")
+
+    def connection(self):
+        return _AioSQLiteConnection(self.path)
+
+
+class _AioSQLiteConnection:
+    def __init__(self, path):
+        self.path = path
+
+    async def __aenter__(self):
+        import aiosqlite
+        self._conn = await aiosqlite.connect(self.path)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self._conn.close()
+        return False
+
+    async def execute(self, sql, params=()):
+        return await self._conn.execute(sql.replace("%s", "?"), params)
+
+
+default_backend = AioMySQLBackend()
+
+
+def _shape(cursor, row_type, residual):
+    """Row converter (tuple -> row_type) and residual check for a cursor."""
+    names = tuple(d[0] for d in cursor.description)
+    if row_type == "dict":
+        convert = lambda row: dict(zip(names, row))  # noqa: E731
+    else:
+        convert = row_converter(names, row_type)
+    return convert, row_check(residual, names, "tuple")
+
+
+def _query(columns, where):
+    clause, params, residual = split_filter(where, columns)
+    sql = f"SELECT {select_list(columns)} FROM user_data"
+    if clause:
+        sql += f" WHERE {clause}"
+    return sql, params, residual, bool(clause)
+
+
+async def astream_users(chunk_size=1000, columns=None, row_type="dict",
+                        where=None, backend=None):
+    """Yield user rows one at a time, read in fetchmany(chunk_size) chunks."""
+    columns = check_projection(columns, row_type)
+    sql, params, residual, _ = _query(columns, where)
+    async with (backend or default_backend).connection() as conn:
+        cursor = await conn.execute(sql, params)
+        try:
+            convert, check = _shape(cursor, row_type, residual)
+            while True:
+                rows = await cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    if check and not check(row):
+                        continue
+                    yield convert(row) if convert else row
+        finally:
+            await cursor.close()
+
+
+async def astream_users_in_batches(batch_size, mode="offset", after=None,
+                                   columns=None, row_type="dict", where=None,
+                                   backend=None):
+    """
+    Yield lists of user rows; mode/after behave as in
+    stream_users_in_batches (keyset batches carry a .cursor).
+    """
+    if mode not in ("offset", "keyset"):
+        raise ValueError(f"unknown batch mode: {mode!r}")
+    if after is not None and mode != "keyset":
+        raise ValueError("`after` is only supported in keyset mode")
+    columns = check_projection(columns, row_type)
+    if mode == "keyset" and columns is not None and "user_id" not in columns:
+        raise ValueError("keyset mode needs user_id in columns")
+    base, params, residual, filtered = _query(columns, where)
+    joiner = " AND " if filtered else " WHERE "
+
+    offset = 0
+    last_id = after
+    async with (backend or default_backend).connection() as conn:
+        while True:
+            if mode == "keyset" and last_id is not None:
+                sql = base + joiner + "user_id > %s ORDER BY user_id LIMIT %s"
+                args = params + (last_id, batch_size)
+            elif mode == "keyset":
+                sql = base + " ORDER BY user_id LIMIT %s"
+                args = params + (batch_size,)
+            else:
+                sql = base + " LIMIT %s OFFSET %s"
+                args = params + (batch_size, offset)
+            cursor = await conn.execute(sql, args)
+            try:
+                rows = await cursor.fetchall()
+                convert, check = _shape(cursor, row_type, residual)
+                names = [d[0] for d in cursor.description]
+            finally:
+                await cursor.close()
+            if not rows:
+                break
+            if mode == "keyset":
+                last_id = rows[-1][names.index("user_id")]
+            offset += batch_size
+            if check:
+                rows = [row for row in rows if check(row)]
+                if not rows:
+                    continue
+            yield Batch([convert(row) for row in rows] if convert else rows,
+                        last_id)
+
+
+async def alazy_paginate(page_size, columns=None, row_type="dict", where=None,
+                         backend=None):
+    """Yield pages of users, one LIMIT/OFFSET query per page."""
+    async for batch in astream_users_in_batches(page_size, columns=columns,
+                                                row_type=row_type, where=where,
+                                                backend=backend):
+        yield list(batch)
+
+
+async def astream_user_ages(chunk_size=1000, where=None, backend=None):
+    """Yield one user age at a time."""
+    async for (age,) in astream_users(chunk_size, columns=("age",),
+                                      row_type="tuple", where=where,
+                                      backend=backend):
+        yield age
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Database backends for the user_data generators.
+
+Every module reaches the database through the active Backend, which knows
+how to open a connection, hand out cursors that accept %s placeholders and
+report `column_names`, stream without buffering, and bulk insert with the
+engine's fastest path:
+
+    mysql     mysql-connector, unbuffered cursors, multi-row executemany
+    postgres  psycopg 3, named server-side cursors, COPY
+    sqlite    sqlite3 (lazy cursors, executemany in one transaction);
+              a zero-setup local stand-in for tests and benchmarks
+
+The backend is picked with PRODEV_BACKEND (mysql by default) or at runtime
+with set_backend(). PRODEV_SQLITE_PATH and PRODEV_DSN configure the sqlite
+and postgres backends; MySQL uses seed.PRODEV_CONFIG.
+
+The decorator and context-manager exercises open their SQLite files
+through SQLiteBackend as well (db_pool.py, 0-databaseconnection.py,
+1-execute.py), so every directory shares one connection layer.
+"""
+import os
+import sqlite3
+import threading
+import uuid
+
+USER_TABLE_COLUMNS = ("user_id", "name", "email", "age")
+
+
+class Backend:
+    """Interface implemented by each engine."""
+
+    name = None
+    #: driver exception base class, caught by connect_to_prodev()
+    Error = Exception
+    #: query returning the database clock minus %s microseconds, or None
+    #: when the engine cannot serve incremental.py
+    horizon_sql = None
+
+    def connect(self):
+        """Open a new DB-API connection to the prodev database."""
+        raise NotImplementedError
+
+    def ping(self, conn):
+        """Raise self.Error if an idle pooled connection is unusable."""
+
+    def reset(self, conn):
+        """Undo anything a borrower left behind before pooling `conn` again."""
+        conn.rollback()
+
+    def cursor(self, conn, row_type="tuple", streaming=False):
+        """
+        Cursor yielding dicts (row_type="dict") or tuples; streaming=True
+        asks for a server-side/unbuffered cursor where the engine has one.
+        """
+        raise NotImplementedError
+
+    def insert_ignore_sql(self, table, columns=USER_TABLE_COLUMNS):
+        """INSERT that silently skips rows whose key already exists."""
+        raise NotImplementedError
+
+    def timestamp_param(self, value):
+        """Bind a datetime read from updated_at so it compares equal to it."""
+        return value
+
+    def bulk_insert(self, conn, table, rows, columns=USER_TABLE_COLUMNS):
+        """Insert one chunk of row tuples with the fastest available path."""
+        cursor = self.cursor(conn)
+        try:
+            cursor.executemany(self.insert_ignore_sql(table, columns), rows)
+        finally:
+            cursor.close()
+
+    def user_table_ddl(self, table="user_data"):
+        """Statements creating `table` (with updated_at tracking)."""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"<{type(self).__name__}>"
+
+
+class MySQLBackend(Backend):
+    name = "mysql"
+    horizon_sql = "SELECT NOW(6) - INTERVAL %s MICROSECOND"
+    UPDATED_AT_DDL = (
+        "updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) "
+        "ON UPDATE CURRENT_TIMESTAMP(6)"
+    )
+
+    def __init__(self, config=None):
+        if config is None:
+            # seed imports this module, so fetch its settings on first use
+            from seed import PRODEV_CONFIG as config
+        self.config = config
+
+    @property
+    def _driver(self):
+        # imported on first use, so code that never talks to a server
+        # (tests with fake connections) runs without mysql-connector
+        import mysql.connector
+        return mysql.connector
+
+    @property
+    def Error(self):
+        return self._driver.Error
+
+    def connect(self):
+        # an unbuffered cursor closed before its last row (a generator
+        # stopped early) otherwise raises "Unread result found"
+        return self._driver.connect(**{"consume_results": True, **self.config})
+
+    def ping(self, conn):
+        conn.ping(reconnect=True, attempts=1, delay=0)
+
+    def reset(self, conn):
+        # drop unread results / open transactions left by the borrower
+        if conn.unread_result:
+            conn.consume_results()
+        conn.rollback()
+
+    def cursor(self, conn, row_type="tuple", streaming=False):
+        kwargs = {"buffered": False} if streaming else {}
+        if row_type == "dict":
+            return conn.cursor(dictionary=True, **kwargs)
+        return conn.cursor(**kwargs)
+
+    def insert_ignore_sql(self, table, columns=USER_TABLE_COLUMNS):
+        marks = ", ".join(["%s"] * len(columns))
+        return (f"INSERT IGNORE INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({marks})")
+
+    def bulk_insert(self, conn, table, rows, columns=USER_TABLE_COLUMNS):
+        # mysql.connector rewrites executemany INSERTs into one multi-row INSERT
+        super().bulk_insert(conn, table, rows, columns)
+
+    def user_table_ddl(self, table="user_data"):
+        return [f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        user_id CHAR(36) PRIMARY KEY,
+        name    VARCHAR(255) NOT NULL,
+        email   VARCHAR(255) NOT NULL,
+        age     INT NOT NULL,
+        {self.UPDATED_AT_DDL},
+        INDEX idx_{table}_updated_at (updated_at, user_id)
+    );
+    """]
+
+
+class _TranslatingCursor:
+    """
+    Wraps a DB-API cursor whose driver does not take %s placeholders,
+    and adds the `column_names` attribute mysql-connector cursors have.
+    """
+
+    def __init__(self, cursor, translate):
+        self._cursor = cursor
+        self._translate = translate
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(self._translate(sql), params)
+        return self
+
+    def executemany(self, sql, seq):
+        self._cursor.executemany(self._translate(sql), seq)
+        return self
+
+    @property
+    def column_names(self):
+        return tuple(d[0] for d in self._cursor.description)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _dict_row(cursor, row):
+    return {d[0]: value for d, value in zip(cursor.description, row)}
+
+
+def _sqlite_floor(value):
+    return None if value is None else int(value // 1)
+
+
+class SQLiteBackend(Backend):
+    name = "sqlite"
+    Error = sqlite3.Error
+    # same text format as the updated_at default below
+    horizon_sql = ("SELECT strftime('%Y-%m-%d %H:%M:%f', 'now', "
+                   "printf('%.6f seconds', -%s / 1e6))")
+
+    def __init__(self, path=None, **options):
+        self.path = path or os.environ.get("PRODEV_SQLITE_PATH",
+                                           "ALX_prodev.db")
+        # extra sqlite3.connect() arguments (timeout, cached_statements, ...)
+        self.options = options
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, **{
+            "check_same_thread": False,
+            "detect_types": sqlite3.PARSE_DECLTYPES,
+            **self.options,
+        })
+        # MySQL functions used by the aggregates
+        conn.create_function("FLOOR", 1, _sqlite_floor, deterministic=True)
+        return conn
+
+    def cursor(self, conn, row_type="tuple", streaming=False):
+        # sqlite3 cursors already step through results lazily
+        cursor = conn.cursor()
+        if row_type == "dict":
+            cursor.row_factory = _dict_row
+        return _TranslatingCursor(cursor, self.translate)
+
+    @staticmethod
+    def translate(sql):
+        return sql.replace("%s", "?")
+
+    def timestamp_param(self, value):
+        # updated_at is stored as text with milliseconds; sqlite3 would
+        # bind a datetime as isoformat() and break the equality tiebreak
+        return value.strftime("%Y-%m-%d %H:%M:%S.") + \
+            f"{value.microsecond // 1000:03d}"
+
+    def insert_ignore_sql(self, table, columns=USER_TABLE_COLUMNS):
+        marks = ", ".join(["?"] * len(columns))
+        return (f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({marks})")
+
+    def user_table_ddl(self, table="user_data"):
+        now = "(strftime('%Y-%m-%d %H:%M:%f', 'now'))"
+        return [
+            f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        user_id TEXT PRIMARY KEY,
+        name    TEXT NOT NULL,
+        email   TEXT NOT NULL,
+        age     INTEGER NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT {now}
+    )
+    """,
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_updated_at "
+            f"ON {table} (updated_at, user_id)",
+            f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_updated_at
+    AFTER UPDATE OF name, email, age ON {table}
+    BEGIN
+        UPDATE {table} SET updated_at = {now} WHERE user_id = NEW.user_id;
+    END
+    """,
+        ]
+
+
+class PostgresBackend(Backend):
+    name = "postgres"
+    horizon_sql = "SELECT LOCALTIMESTAMP - %s * INTERVAL '1 microsecond'"
+
+    def __init__(self, dsn=None):
+        import psycopg
+        from psycopg.rows import dict_row
+        self._driver = psycopg
+        self._dict_row = dict_row
+        self.Error = psycopg.Error
+        self.dsn = dsn or os.environ.get("PRODEV_DSN", "dbname=alx_prodev")
+
+    def connect(self):
+        return self._driver.connect(self.dsn)
+
+    def ping(self, conn):
+        if conn.closed:
+            raise self._driver.OperationalError("connection is closed")
+
+    def cursor(self, conn, row_type="tuple", streaming=False):
+        kwargs = {"row_factory": self._dict_row} if row_type == "dict" else {}
+        if streaming:
+            # named cursors stay on the server and are fetched in chunks
+            kwargs["name"] = f"stream_{uuid.uuid4().hex}"
+        return _TranslatingCursor(conn.cursor(**kwargs), self.translate)
+
+    @staticmethod
+    def translate(sql):
+        return sql.replace("INSERT IGNORE INTO", "INSERT INTO")
+
+    def insert_ignore_sql(self, table, columns=USER_TABLE_COLUMNS):
+        marks = ", ".join(["%s"] * len(columns))
+        return (f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({marks}) ON CONFLICT DO NOTHING")
+
+    def bulk_insert(self, conn, table, rows, columns=USER_TABLE_COLUMNS):
+        # COPY into a scratch table, then merge while skipping duplicates
+        names = ", ".join(columns)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS _load_{table} "
+                f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+            with cursor.copy(f"COPY _load_{table} ({names}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+            cursor.execute(
+                f"INSERT INTO {table} ({names}) SELECT {names} "
+                f"FROM _load_{table} ON CONFLICT DO NOTHING"
+            )
+
+    def user_table_ddl(self, table="user_data"):
+        return [
+            f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        user_id CHAR(36) PRIMARY KEY,
+        name    VARCHAR(255) NOT NULL,
+        email   VARCHAR(255) NOT NULL,
+        age     INT NOT NULL,
+        updated_at TIMESTAMP(6) NOT NULL DEFAULT LOCALTIMESTAMP
+    )
+    """,
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_updated_at "
+            f"ON {table} (updated_at, user_id)",
+            """
+    CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at = LOCALTIMESTAMP;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+            f"DROP TRIGGER IF EXISTS trg_{table}_updated_at ON {table}",
+            f"""
+    CREATE TRIGGER trg_{table}_updated_at BEFORE UPDATE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at()
+    """,
+        ]
+
+
+BACKENDS = {
+    "mysql": MySQLBackend,
+    "postgres": PostgresBackend,
+    "sqlite": SQLiteBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name, **kwargs):
+    """Instantiate a backend by name ("mysql", "postgres" or "sqlite")."""
+    try:
+        return BACKENDS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"unknown backend: {name!r}") from None
+
+
+def get_backend():
+    """Return the active backend, creating it from PRODEV_BACKEND on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(os.environ.get("PRODEV_BACKEND", "mysql"))
+        return _backend
+
+
+def set_backend(backend, **kwargs):
+    """
+    Switch every generator to `backend` (a Backend or a name plus its
+    constructor arguments). Call seed.configure_pool() afterwards to drop
+    connections pooled for the previous backend.
+    """
+    global _backend
+    if isinstance(backend, str):
+        backend = create_backend(backend, **kwargs)
+    with _backend_lock:
+        _backend = backend
+    return backend
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-page connect cost vs pooled connections in lazy_paginate.
+
+    python bench_pool.py [page_size] [pages]
+
+Runs the same lazy_paginate scan with pooling disabled (one connect per
+page, the old behaviour) and with the default pool, and prints the time
+per page and the number of physical connections opened.
+"""
+import sys
+import time
+
+import seed
+from backends import get_backend
+
+lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+
+
+def count_connects():
+    """Wrap the active backend's connect() to count physical connections."""
+    calls = {"n": 0}
+    backend = get_backend()
+    real_connect = backend.connect
+
+    def counting_connect(*args, **kwargs):
+        calls["n"] += 1
+        return real_connect(*args, **kwargs)
+
+    backend.connect = counting_connect
+    return calls, lambda: setattr(backend, "connect", real_connect)
+
+
+def scan(page_size, pages):
+    """Read up to `pages` pages; return (pages read, seconds)."""
+    start = time.perf_counter()
+    read = 0
+    for _ in lazy_paginate(page_size):
+        read += 1
+        if read >= pages:
+            break
+    return read, time.perf_counter() - start
+
+
+def run(label, pool_size, page_size, pages):
+    seed.configure_pool(size=pool_size)
+    calls, restore = count_connects()
+    try:
+        read, elapsed = scan(page_size, pages)
+    finally:
+        restore()
+    per_page = elapsed / read * 1000 if read else 0.0
+    print(f"{label:<10} pages={read:<6} total={elapsed:8.3f}s "
+          f"per_page={per_page:7.3f}ms connects={calls['n']}")
+    return per_page
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    unpooled = run("connect", 0, size, pages)
+    pooled = run("pooled", 5, size, pages)
+    if pooled:
+        print(f"speedup: {unpooled / pooled:.1f}x")
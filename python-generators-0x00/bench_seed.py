@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: row-at-a-time INSERTs vs chunked executemany (and LOAD DATA).
+
+    python bench_seed.py [rows] [batch_size] [--infile] [--workers=1,2,4]
+
+Writes a synthetic CSV, loads it into a scratch copy of user_data
+(user_data_bench) with each method and prints rows/sec. --workers also
+runs the sharded multi-process loader for each worker count.
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import uuid
+
+import mysql.connector
+
+import seed
+
+BENCH_TABLE = "user_data_bench"
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["user_id", "name", "email", "age"])
+        for i in range(rows):
+            writer.writerow([str(uuid.uuid4()), f"user {i}",
+                             f"user{i}@example.com", random.randint(18, 90)])
+
+
+def reset_table(conn):
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    cursor.execute(f"CREATE TABLE {BENCH_TABLE} LIKE user_data")
+    conn.commit()
+    cursor.close()
+
+
+def run(conn, label, csv_path, **kwargs):
+    reset_table(conn)
+    tracker = seed.Progress(enabled=False)
+    loaded = seed.insert_data(conn, csv_path, table=BENCH_TABLE,
+                              progress=False, **kwargs)
+    elapsed = tracker.elapsed()
+    rate = loaded / elapsed if elapsed else 0.0
+    print(f"{label:<22} rows={loaded:<8} {elapsed:8.2f}s {rate:12,.0f} rows/sec")
+    return rate
+
+
+def run_parallel(conn, csv_path, workers, batch_size):
+    reset_table(conn)
+    loaded, elapsed = seed.parallel_insert(csv_path, workers, batch_size,
+                                           table=BENCH_TABLE, progress=False)
+    rate = loaded / elapsed if elapsed else 0.0
+    print(f"{f'workers={workers}':<22} rows={loaded:<8} {elapsed:8.2f}s "
+          f"{rate:12,.0f} rows/sec")
+    return rate
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    rows = int(args[0]) if args else 20_000
+    batch_size = int(args[1]) if len(args) > 1 else 1000
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    conn = None
+    try:
+        write_csv(path, rows)
+        conn = mysql.connector.connect(allow_local_infile=True,
+                                       **seed.PRODEV_CONFIG)
+        seed.create_table(conn)
+        base = run(conn, "row-at-a-time", path, method="rows")
+        fast = run(conn, f"executemany({batch_size})", path,
+                   method="executemany", batch_size=batch_size)
+        print(f"executemany speedup: {fast / base:.1f}x")
+        if "--infile" in sys.argv:
+            infile = run(conn, "LOAD DATA INFILE", path, method="infile")
+            print(f"infile speedup: {infile / base:.1f}x")
+        for arg in sys.argv[1:]:
+            if arg.startswith("--workers="):
+                counts = [int(n) for n in arg.split("=", 1)[1].split(",")]
+                single = None
+                for workers in counts:
+                    rate = run_parallel(conn, path, workers, batch_size)
+                    single = single or rate
+                    print(f"   scaling vs {counts[0]} worker(s): "
+                          f"{rate / single:.2f}x")
+    finally:
+        if conn is not None:
+            cursor = conn.cursor()
+            cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+            cursor.close()
+            conn.close()
+        os.remove(path)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Throughput/latency benchmark for the user_data streaming paths.
+
+    python benchmark.py --rows 100000 --batch-sizes 100,1000,10000 \\
+        --json results.json
+    python benchmark.py --backend sqlite --rows 100000     # no server needed
+
+Seeds a scratch database (ALX_prodev_bench by default, never the real
+ALX_prodev; a bench .db file for sqlite) with synthetic users, then runs
+each streaming path in a fresh process and records rows/sec, time to first
+row, peak RSS and the number of physical connections opened. --json writes
+the results so runs of different versions can be diffed.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import uuid
+
+import seed
+from backends import create_backend, set_backend
+
+
+def _peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _cases(batch_sizes):
+    """(name, batch_size, factory) for every path and size measured."""
+    stream_users = __import__('0-stream_users').stream_users
+    batches = __import__('1-batch_processing').stream_users_in_batches
+    lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+    stream_user_ages = __import__('4-stream_ages').stream_user_ages
+
+    yield "stream_users", None, lambda: stream_users()
+    yield "stream_user_ages", None, lambda: stream_user_ages()
+    for size in batch_sizes:
+        yield ("stream_users[streaming]", size,
+               lambda size=size: stream_users(streaming=True, chunk_size=size))
+        yield ("stream_users_in_batches[offset]", size,
+               lambda size=size: batches(size))
+        yield ("stream_users_in_batches[keyset]", size,
+               lambda size=size: batches(size, mode="keyset"))
+        yield ("lazy_paginate", size, lambda size=size: lazy_paginate(size))
+
+
+def _bench_backend(backend, database):
+    if backend == "sqlite":
+        return create_backend("sqlite", path=f"{database}.db")
+    if backend == "mysql":
+        seed.PRODEV_CONFIG["database"] = database
+    return create_backend(backend)
+
+
+def _measure(backend, database, name, batch_size, results):
+    """Child-process body: run one case and report its numbers."""
+    engine = set_backend(_bench_backend(backend, database))
+    seed.configure_pool()
+    connects = {"n": 0}
+    real_connect = engine.connect
+
+    def counting_connect():
+        connects["n"] += 1
+        return real_connect()
+
+    engine.connect = counting_connect
+    factory = next(f for n, b, f in _cases([batch_size] if batch_size else [])
+                   if n == name and b == batch_size)
+    rss_before = _peak_rss_kb()
+    start = time.perf_counter()
+    first = None
+    rows = 0
+    for item in factory():
+        if first is None:
+            first = time.perf_counter() - start
+        # batch/page generators yield lists of rows
+        rows += len(item) if isinstance(item, list) else 1
+    elapsed = time.perf_counter() - start
+    results.put({
+        "case": name,
+        "batch_size": batch_size,
+        "rows": rows,
+        "seconds": round(elapsed, 6),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+        "time_to_first_row_ms": round(first * 1000, 3) if first else None,
+        "peak_rss_kb": _peak_rss_kb(),
+        "rss_growth_kb": _peak_rss_kb() - rss_before,
+        "connections": connects["n"],
+    })
+
+
+def run_case(backend, database, name, batch_size):
+    """Run one case in a fresh process so RSS and pools are not shared."""
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=_measure,
+                       args=(backend, database, name, batch_size, results))
+    proc.start()
+    result = results.get()
+    proc.join()
+    return result
+
+
+def seed_database(backend, database, rows, batch_size=5000):
+    """(Re)create `database`.user_data with `rows` synthetic users."""
+    if backend == "mysql":
+        import mysql.connector
+        server = {k: v for k, v in seed.PRODEV_CONFIG.items()
+                  if k != "database"}
+        conn = mysql.connector.connect(**server)
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+        cursor.close()
+        conn.close()
+    engine = set_backend(_bench_backend(backend, database))
+    conn = engine.connect()
+    cursor = engine.cursor(conn)
+    cursor.execute("DROP TABLE IF EXISTS user_data")
+    cursor.close()
+    seed.create_table(conn)
+    users = (
+        (str(uuid.uuid4()), f"user {i}", f"user{i}@example.com",
+         random.randint(18, 90))
+        for i in range(rows)
+    )
+    seed.insert_rows(conn, users, batch_size)
+    conn.close()
+
+
+def _version():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch-sizes", default="100,1000,10000",
+                        help="comma-separated batch/page sizes")
+    parser.add_argument("--backend", default="mysql",
+                        choices=("mysql", "postgres", "sqlite"))
+    parser.add_argument("--database", default="ALX_prodev_bench",
+                        help="scratch database to seed and scan "
+                             "(sqlite: <database>.db)")
+    parser.add_argument("--no-seed", action="store_true",
+                        help="reuse the existing scratch table")
+    parser.add_argument("--only", help="run only cases whose name contains this")
+    parser.add_argument("--json", help="write results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.database == "ALX_prodev" and not args.no_seed:
+        sys.exit("refusing to reseed the real ALX_prodev database")
+    sizes = [int(n) for n in args.batch_sizes.split(",") if n]
+    if not args.no_seed:
+        seed_database(args.backend, args.database, args.rows)
+
+    results = []
+    for name, size, _ in _cases(sizes):
+        if args.only and args.only not in name:
+            continue
+        result = run_case(args.backend, args.database, name, size)
+        results.append(result)
+        print(f"{name:<34} {str(size or '-'):>6} "
+              f"{result['rows_per_sec'] or 0:>12,.0f} rows/s "
+              f"ttfr={result['time_to_first_row_ms'] or 0:>9.3f}ms "
+              f"rss={result['peak_rss_kb']:>8}KB "
+              f"conns={result['connections']}")
+
+    if args.json:
+        report = {
+            "version": _version(),
+            "python": platform.python_version(),
+            "backend": args.backend,
+            "seeded_rows": None if args.no_seed else args.rows,
+            "database": args.database,
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Column-oriented batches of user_data for vectorized consumers.
+
+    for batch in stream_column_batches(10_000, columns=("age",)):
+        batch["age"].mean()                    # numpy int32 array
+
+    for rb in stream_column_batches(10_000, format="arrow"):
+        pyarrow.compute.mean(rb.column("age"))
+
+Both formats carry the keyset resume token of the row batch they came
+from; batch_cursor() reads it back for either one.
+
+numpy and pyarrow are optional and only imported for their format.
+"""
+from rows import USER_COLUMNS, check_projection
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+NUMPY_DTYPES = {"age": "int32"}
+ARROW_TYPES = {"age": "int32"}
+FORMATS = ("numpy", "arrow")
+#: schema metadata key holding an Arrow batch's keyset cursor
+CURSOR_KEY = b"cursor"
+
+
+class ColumnBatch(dict):
+    """
+    Mapping of column name -> numpy array for one batch.
+    `cursor` is the keyset resume token, as on row batches.
+    """
+
+    def __init__(self, arrays, num_rows, cursor=None):
+        super().__init__(arrays)
+        self.num_rows = num_rows
+        self.cursor = cursor
+
+
+def _numpy_batch(columns, rows, strings):
+    import numpy as np
+    arrays = {}
+    for name, values in zip(columns, zip(*rows)):
+        if name in NUMPY_DTYPES:
+            arrays[name] = np.fromiter(values, dtype=NUMPY_DTYPES[name],
+                                       count=len(rows))
+        elif strings == "fixed":
+            arrays[name] = np.array(values, dtype=np.str_)
+        else:
+            arrays[name] = np.array(values, dtype=object)
+    return arrays
+
+
+def _arrow_batch(columns, rows, cursor=None):
+    import pyarrow as pa
+    arrays = [
+        pa.array(values, type=getattr(pa, ARROW_TYPES.get(name, "string"))())
+        for name, values in zip(columns, zip(*rows))
+    ]
+    # RecordBatch takes no attributes: the cursor rides in the schema metadata
+    metadata = None if cursor is None else {CURSOR_KEY: str(cursor)}
+    return pa.RecordBatch.from_arrays(arrays, names=list(columns),
+                                      metadata=metadata)
+
+
+def batch_cursor(batch):
+    """
+    Keyset cursor of a ColumnBatch or Arrow batch (None for offset
+    batches); pass it back as `after=` to resume after that batch.
+    """
+    if isinstance(batch, ColumnBatch):
+        return batch.cursor
+    metadata = batch.schema.metadata or {}
+    cursor = metadata.get(CURSOR_KEY)
+    return None if cursor is None else cursor.decode("utf-8")
+
+
+def stream_column_batches(batch_size, columns=None, format="numpy",
+                          strings="object", mode="offset", after=None,
+                          where=None):
+    """
+    Yield column-oriented batches of up to `batch_size` users.
+
+    format="numpy" yields ColumnBatch dicts of arrays (age as int32,
+    strings as object arrays, or fixed-width unicode with strings="fixed");
+    format="arrow" yields pyarrow.RecordBatch objects. mode/after/where
+    behave as in stream_users_in_batches.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"unknown column batch format: {format!r}")
+    if strings not in ("object", "fixed"):
+        raise ValueError(f"unknown string layout: {strings!r}")
+    columns = check_projection(columns, "tuple") or USER_COLUMNS
+    for batch in stream_users_in_batches(batch_size, mode=mode, after=after,
+                                         columns=columns, row_type="tuple",
+                                         where=where):
+        if format == "arrow":
+            yield _arrow_batch(columns, batch, batch.cursor)
+        else:
+            yield ColumnBatch(_numpy_batch(columns, batch, strings),
+                              len(batch), batch.cursor)
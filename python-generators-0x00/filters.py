@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Composable row filters for the user_data generators.
+
+Filters compile to a parameterized SQL WHERE clause where they can, so
+non-matching rows never leave MySQL. Anything that cannot be expressed in
+SQL (a `Custom` Python callable) is kept as a residual check applied to
+the fetched rows instead.
+
+    from filters import Col, Custom
+    where = (Col("age") > 25) & Col("email").like("%@example.com")
+    where = Col("age").between(18, 30) | Custom(str.isupper, "name")
+"""
+import operator
+import re
+
+from rows import USER_COLUMNS, field_getter
+
+
+class Filter:
+    """Base class; combine filters with &, | and ~."""
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def to_sql(self):
+        """Return (clause, params), or None when this cannot run in SQL."""
+        raise NotImplementedError
+
+    def columns(self):
+        """Names of the columns this filter reads."""
+        raise NotImplementedError
+
+    def matches(self, get):
+        """Evaluate in Python; `get(name)` returns the row's column value."""
+        raise NotImplementedError
+
+
+class Compare(Filter):
+    """`column <op> value` for the usual comparison operators."""
+
+    OPS = {
+        "=": operator.eq, "!=": operator.ne,
+        "<": operator.lt, "<=": operator.le,
+        ">": operator.gt, ">=": operator.ge,
+    }
+
+    def __init__(self, column, op, value):
+        if column not in USER_COLUMNS:
+            raise ValueError(f"unknown user_data column: {column!r}")
+        if op not in self.OPS:
+            raise ValueError(f"unsupported operator: {op!r}")
+        self.column, self.op, self.value = column, op, value
+
+    def to_sql(self):
+        return f"{self.column} {self.op} %s", (self.value,)
+
+    def columns(self):
+        return {self.column}
+
+    def matches(self, get):
+        return self.OPS[self.op](get(self.column), self.value)
+
+
+class Between(Compare):
+    """`column BETWEEN low AND high` (inclusive)."""
+
+    def __init__(self, column, low, high):
+        super().__init__(column, ">=", low)
+        self.high = high
+
+    def to_sql(self):
+        return f"{self.column} BETWEEN %s AND %s", (self.value, self.high)
+
+    def matches(self, get):
+        return self.value <= get(self.column) <= self.high
+
+
+class In(Compare):
+    """`column IN (values...)`."""
+
+    def __init__(self, column, values):
+        super().__init__(column, "=", tuple(values))
+
+    def to_sql(self):
+        if not self.value:
+            return "1 = 0", ()
+        marks = ", ".join(["%s"] * len(self.value))
+        return f"{self.column} IN ({marks})", self.value
+
+    def matches(self, get):
+        return get(self.column) in self.value
+
+
+class Like(Compare):
+    """`column LIKE pattern` with SQL % and _ wildcards."""
+
+    def __init__(self, column, pattern):
+        super().__init__(column, "=", pattern)
+
+    def to_sql(self):
+        return f"{self.column} LIKE %s", (self.value,)
+
+    def matches(self, get):
+        regex = "".join(
+            ".*" if ch == "%" else "." if ch == "_" else re.escape(ch)
+            for ch in self.value
+        )
+        return re.fullmatch(regex, str(get(self.column)), re.I) is not None
+
+
+class Custom(Filter):
+    """Arbitrary Python predicate over the named columns; never pushed down."""
+
+    def __init__(self, func, *columns):
+        unknown = [c for c in columns if c not in USER_COLUMNS]
+        if unknown:
+            raise ValueError(f"unknown user_data columns: {unknown}")
+        self.func, self.names = func, columns
+
+    def to_sql(self):
+        return None
+
+    def columns(self):
+        return set(self.names)
+
+    def matches(self, get):
+        return bool(self.func(*(get(name) for name in self.names)))
+
+
+class And(Filter):
+    """All parts must match."""
+
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def to_sql(self):
+        compiled = [part.to_sql() for part in self.parts]
+        if None in compiled:
+            return None
+        return (
+            " AND ".join(f"({clause})" for clause, _ in compiled),
+            tuple(p for _, params in compiled for p in params),
+        )
+
+    def columns(self):
+        return set().union(*(part.columns() for part in self.parts))
+
+    def matches(self, get):
+        return all(part.matches(get) for part in self.parts)
+
+
+class Or(And):
+    """At least one part must match."""
+
+    def to_sql(self):
+        compiled = [part.to_sql() for part in self.parts]
+        if None in compiled:
+            return None
+        return (
+            " OR ".join(f"({clause})" for clause, _ in compiled),
+            tuple(p for _, params in compiled for p in params),
+        )
+
+    def matches(self, get):
+        return any(part.matches(get) for part in self.parts)
+
+
+class Not(Filter):
+    """Negation of a filter."""
+
+    def __init__(self, part):
+        self.part = part
+
+    def to_sql(self):
+        compiled = self.part.to_sql()
+        if compiled is None:
+            return None
+        return f"NOT ({compiled[0]})", compiled[1]
+
+    def columns(self):
+        return self.part.columns()
+
+    def matches(self, get):
+        return not self.part.matches(get)
+
+
+class Col:
+    """Column reference that builds filters: Col("age") > 25."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __eq__(self, value):
+        return Compare(self.name, "=", value)
+
+    def __ne__(self, value):
+        return Compare(self.name, "!=", value)
+
+    def __lt__(self, value):
+        return Compare(self.name, "<", value)
+
+    def __le__(self, value):
+        return Compare(self.name, "<=", value)
+
+    def __gt__(self, value):
+        return Compare(self.name, ">", value)
+
+    def __ge__(self, value):
+        return Compare(self.name, ">=", value)
+
+    __hash__ = None
+
+    def between(self, low, high):
+        return Between(self.name, low, high)
+
+    def isin(self, values):
+        return In(self.name, values)
+
+    def like(self, pattern):
+        return Like(self.name, pattern)
+
+
+def _and_terms(where):
+    """Flatten nested ANDs, so a & b & c splits into three terms."""
+    if type(where) is not And:
+        return [where]
+    return [term for part in where.parts for term in _and_terms(part)]
+
+
+def split_filter(where, columns=None):
+    """
+    Split `where` into (sql_clause, params, residual).
+
+    Top-level AND terms are pushed down independently, so only the parts
+    that cannot run in SQL end up in `residual` (a Filter or None).
+    The residual runs on fetched rows, so it may only read columns of the
+    projection `columns` (None for all); otherwise ValueError is raised
+    before anything is queried.
+    """
+    if where is None:
+        return None, (), None
+    pushed, residual = [], []
+    for part in _and_terms(where):
+        compiled = part.to_sql()
+        if compiled is None:
+            residual.append(part)
+        else:
+            pushed.append(compiled)
+    clause = " AND ".join(f"({c})" for c, _ in pushed) or None
+    params = tuple(p for _, ps in pushed for p in ps)
+    if not residual:
+        return clause, params, None
+    residual = residual[0] if len(residual) == 1 else And(*residual)
+    if columns is not None:
+        missing = sorted(residual.columns() - set(columns))
+        if missing:
+            raise ValueError(
+                f"filter columns {missing} are not in the projection")
+    return clause, params, residual
+
+
+def row_check(residual, columns, row_type):
+    """
+    Return a callable row -> bool for a residual filter, or None.
+    `columns` are the names the cursor reports.
+    """
+    if residual is None:
+        return None
+    getters = {
+        name: field_getter(columns, row_type, name)
+        for name in residual.columns()
+    }
+    return lambda row: residual.matches(lambda name: getters[name](row))
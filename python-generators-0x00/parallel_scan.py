@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Range-partitioned parallel scans of user_data.
+
+The user_id keyspace is cut into N contiguous ranges at evenly spaced keys
+(read off the primary key index), and each range is streamed with keyset
+paging on its own pooled connection:
+
+    for user in parallel_scan(4):                  # unordered, fastest
+        ...
+    for user in parallel_scan(4, ordered=True):    # in user_id order
+        ...
+    partials = parallel_reduce(count_rows, 8, processes=True)
+
+`where` filters must be picklable when processes=True (no lambdas).
+"""
+import queue
+import threading
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from seed import connect_to_prodev
+from filters import Compare, split_filter
+from rows import open_cursor
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+
+def key_ranges(parts, where=None):
+    """
+    Split the user_id keyspace into up to `parts` ranges of similar size.
+    Returns [(after, upto), ...]: keys with after < user_id <= upto, where
+    None means unbounded. Ranges are in key order and cover every row.
+    """
+    if parts < 1:
+        raise ValueError("parts must be at least 1")
+    clause, params, _ = split_filter(where)
+    where_sql = f" WHERE {clause}" if clause else ""
+    conn = connect_to_prodev()
+    cursor = open_cursor(conn)
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM user_data{where_sql}", params)
+        (total,) = cursor.fetchone()
+        bounds = []
+        for i in range(1, min(parts, total)):
+            cursor.execute(
+                f"SELECT user_id FROM user_data{where_sql} "
+                "ORDER BY user_id LIMIT 1 OFFSET %s",
+                params + (total * i // parts - 1,)
+            )
+            row = cursor.fetchone()
+            if row and (not bounds or row[0] > bounds[-1]):
+                bounds.append(row[0])
+    finally:
+        cursor.close()
+        conn.close()
+    edges = [None] + bounds + [None]
+    return list(zip(edges, edges[1:]))
+
+
+def scan_range(after, upto, columns=None, row_type="dict", where=None,
+               batch_size=1000):
+    """Yield batches for one key range (see key_ranges) in key order."""
+    if upto is not None:
+        bound = Compare("user_id", "<=", upto)
+        where = bound if where is None else bound & where
+    return stream_users_in_batches(batch_size, mode="keyset", after=after,
+                                   columns=columns, row_type=row_type,
+                                   where=where)
+
+
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+def parallel_scan(parts=4, columns=None, row_type="dict", where=None,
+                  batch_size=1000, ordered=False, depth=4):
+    """
+    Yield user rows from `parts` concurrent range scans (one thread and
+    one pooled connection each). Unordered mode yields batches as they
+    arrive; ordered=True yields in user_id order while later ranges keep
+    up to `depth` batches buffered. Closing the generator stops all scans.
+    """
+    if columns is not None and "user_id" not in columns:
+        raise ValueError("parallel_scan needs user_id in columns")
+    ranges = key_ranges(parts, where)
+    shared = queue.Queue(maxsize=depth * len(ranges))
+    queues = [shared if not ordered else queue.Queue(maxsize=depth)
+              for _ in ranges]
+    stop = threading.Event()
+
+    def offer(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker(index, after, upto):
+        q = queues[index]
+        try:
+            # closing() hands the range's connection back on early exit
+            with closing(scan_range(after, upto, columns, row_type, where,
+                                    batch_size)) as batches:
+                for batch in batches:
+                    if not offer(q, batch):
+                        return
+        except BaseException as error:
+            offer(q, _Failed(error))
+            return
+        offer(q, _DONE)
+
+    threads = [
+        threading.Thread(target=worker, args=(i, a, b), daemon=True,
+                         name=f"parallel_scan-{i}")
+        for i, (a, b) in enumerate(ranges)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        pending = len(threads)
+        index = 0
+        while pending:
+            item = queues[index].get()
+            if item is _DONE:
+                pending -= 1
+                if ordered:
+                    index += 1
+                continue
+            if isinstance(item, _Failed):
+                raise item.error
+            yield from item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def _reduce_range(func, after, upto, columns, row_type, where, batch_size):
+    with closing(scan_range(after, upto, columns, row_type, where,
+                            batch_size)) as batches:
+        return func(row for batch in batches for row in batch)
+
+
+def parallel_reduce(func, parts=4, columns=None, row_type="dict", where=None,
+                    batch_size=1000, processes=False):
+    """
+    Run func(rows) over each key range concurrently and return the list
+    of partial results in key order. With processes=True each range runs
+    in its own process (func and where must be picklable), so CPU-bound
+    reductions scale with cores as well as connections.
+    """
+    ranges = key_ranges(parts, where)
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor(max_workers=len(ranges)) as pool:
+        futures = [
+            pool.submit(_reduce_range, func, a, b, columns, row_type, where,
+                        batch_size)
+            for a, b in ranges
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Column projection and row shapes shared by the user_data generators.
+
+Generators accept `columns` (a subset of USER_COLUMNS, default all) and
+`row_type` ("dict", "tuple" or "namedtuple"). Tuples and namedtuples skip
+the per-row dict and only the requested columns cross the wire.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from backends import get_backend
+
+USER_COLUMNS = ("user_id", "name", "email", "age")
+ROW_TYPES = ("dict", "tuple", "namedtuple")
+
+
+def check_projection(columns, row_type):
+    """Validate a projection and return it as a tuple (or None for all)."""
+    if row_type not in ROW_TYPES:
+        raise ValueError(f"unknown row_type: {row_type!r}")
+    if columns is None:
+        return None
+    columns = tuple(columns)
+    if not columns:
+        raise ValueError("columns must not be empty")
+    unknown = [c for c in columns if c not in USER_COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown user_data columns: {unknown}")
+    return columns
+
+
+def select_list(columns):
+    """
+    SQL select list for a validated projection. No projection means
+    USER_COLUMNS, not *: bookkeeping columns such as updated_at stay out.
+    """
+    return ", ".join(USER_COLUMNS if columns is None else columns)
+
+
+def open_cursor(conn, row_type="tuple", streaming=False):
+    """
+    Cursor from the active backend: dict rows come straight from the
+    driver, the rest as tuples; see backends.Backend.cursor.
+    """
+    return get_backend().cursor(conn, row_type, streaming)
+
+
+@lru_cache(maxsize=None)
+def _row_class(columns):
+    return namedtuple("UserRow", columns)
+
+
+def row_converter(columns, row_type):
+    """
+    Return a callable turning a fetched row into `row_type`,
+    or None when the cursor already produces the right shape.
+    `columns` are the names the cursor reports (cursor.column_names).
+    """
+    if row_type == "namedtuple":
+        return _row_class(tuple(columns))._make
+    return None
+
+
+def field_getter(columns, row_type, name):
+    """Return a callable reading column `name` from a row of `row_type`."""
+    if name not in columns:
+        raise ValueError(f"column {name!r} is not in the projection")
+    if row_type == "dict":
+        return lambda row: row[name]
+    index = tuple(columns).index(name)
+    return lambda row: row[index]
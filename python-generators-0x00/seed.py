@@ -1,24 +1,42 @@
 #!/usr/bin/env python3
+import os
 import sys
 import csv
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import uuid
-import mysql.connector
-from mysql.connector import errorcode
+import queue
+import threading
+import time
+
+from backends import MySQLBackend, get_backend, set_backend  # noqa: F401
+
+try:
+    from mysql.connector.errors import PoolError
+except ImportError:  # only the sqlite / postgres backends are installed
+    class PoolError(Exception):
+        """No pooled connection could be handed out."""
+
+PRODEV_CONFIG = {
+    "host": "localhost",
+    "user": "peter",
+    "password": "idoit4dalow",
+    "database": "ALX_prodev",
+}
 
 def connect_db():
     """Connect to MySQL server (no database)."""
+    import mysql.connector
     try:
-        return mysql.connector.connect(
-            host="localhost",
-            user="peter",
-            password="idoit4dalow"
-        )
+        server = {k: v for k, v in PRODEV_CONFIG.items() if k != "database"}
+        return mysql.connector.connect(**server)
     except mysql.connector.Error as err:
         print(f"[connect_db] {err}")
         return None
 
 def create_database(conn):
     """Create the ALX_prodev database if it doesn't exist."""
+    import mysql.connector
     cursor = conn.cursor()
     try:
         cursor.execute("CREATE DATABASE IF NOT EXISTS ALX_prodev;")
@@ -29,75 +47,477 @@ def create_database(conn):
     finally:
         cursor.close()
 
+class PooledConnection:
+    """
+    Thin wrapper around a pooled database connection.
+    close() hands the connection back to the pool instead of closing it;
+    everything else is delegated to the real connection.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise PoolError("connection already returned to the pool")
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of ALX_prodev connections.
+
+    At most `size` connections exist at once; get() waits up to `timeout`
+    seconds for one to free up and raises PoolError after that. Idle
+    connections are pinged before reuse (and reconnected if the server
+    dropped them); connections that fail to reset on release are dropped.
+    Connections are opened and checked by `backend` (see backends.py).
+    """
+
+    def __init__(self, size=5, timeout=30.0, backend=None):
+        self.size = size
+        self.timeout = timeout
+        self.backend = backend or get_backend()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+        self.created = 0
+
+    def get(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError(
+                f"no connection available within {self.timeout}s "
+                f"(pool size {self.size})"
+            )
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+            if conn is not None:
+                try:
+                    self.backend.ping(conn)
+                except self.backend.Error:
+                    self._discard(conn)
+                    conn = None
+            if conn is None:
+                conn = self.backend.connect()
+                self.created += 1
+            return PooledConnection(self, conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        try:
+            self.backend.reset(conn)
+        except self.backend.Error:
+            self._discard(conn)
+        else:
+            if self._closed:
+                # checked out when the pool was closed or reconfigured
+                self._discard(conn)
+            else:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except self.backend.Error:
+            pass
+
+    def close(self):
+        """
+        Close every idle connection; connections still checked out are
+        closed when they are returned.
+        """
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_pool_settings = {
+    "size": int(os.environ.get("PRODEV_POOL_SIZE", 5)),
+    "timeout": float(os.environ.get("PRODEV_POOL_TIMEOUT", 30)),
+}
+
+
+def configure_pool(size=None, timeout=None):
+    """
+    Change the pool size / checkout timeout used by connect_to_prodev().
+    size=0 disables pooling (a fresh connection per call).
+    Defaults come from PRODEV_POOL_SIZE and PRODEV_POOL_TIMEOUT.
+    """
+    global _pool
+    with _pool_lock:
+        if size is not None:
+            _pool_settings["size"] = size
+        if timeout is not None:
+            _pool_settings["timeout"] = timeout
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_pool():
+    """
+    Return this process's pool, creating it on first use (or after a fork
+    or a backends.set_backend() switch).
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if (_pool is None or _pool_pid != os.getpid()
+                or _pool.backend is not get_backend()):
+            if _pool is not None and _pool_pid == os.getpid():
+                _pool.close()
+            _pool = ConnectionPool(**_pool_settings)
+            _pool_pid = os.getpid()
+        return _pool
+
+
 def connect_to_prodev():
-    """Connect to the ALX_prodev database."""
+    """
+    Connect to the ALX_prodev database.
+    Connections come from the process-wide pool; close() returns them.
+    Raises PoolError when no pooled connection frees up in time.
+    """
+    backend = get_backend()
     try:
-        return mysql.connector.connect(
-            host="localhost",
-            user="peter",
-            password="idoit4dalow",
-            database="ALX_prodev"
-        )
-    except mysql.connector.Error as err:
+        if _pool_settings["size"] <= 0:
+            return backend.connect()
+        return get_pool().get()
+    except backend.Error as err:
         print(f"[connect_to_prodev] {err}")
         return None
 
-def create_table(conn):
+
+def create_table(conn, table="user_data"):
     """Create the user_data table if it doesn't exist."""
-    stmt = """
-    CREATE TABLE IF NOT EXISTS user_data (
-        user_id CHAR(36) PRIMARY KEY,
-        name    VARCHAR(255) NOT NULL,
-        email   VARCHAR(255) NOT NULL,
-        age     INT NOT NULL
-    );
-    """
-    cursor = conn.cursor()
-    cursor.execute(stmt)
+    backend = get_backend()
+    cursor = backend.cursor(conn)
+    for stmt in backend.user_table_ddl(table):
+        cursor.execute(stmt)
     conn.commit()
     cursor.close()
-    print("✔️  Table user_data created")
+    if backend.name == "mysql":
+        ensure_updated_at(conn, table)
+    print(f"✔️  Table {table} created")
 
-def insert_data(conn, csv_path):
-    """Load CSV and insert rows (generate user_id if missing)."""
+
+def ensure_updated_at(conn, table="user_data"):
+    """
+    Add the updated_at change-tracking column (and its index) to a MySQL
+    user_data table created before it existed. MySQL maintains it on
+    every INSERT/UPDATE; incremental.py streams changes by it.
+    """
     cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = %s "
+            "AND column_name = 'updated_at'",
+            (table,)
+        )
+        if cursor.fetchone()[0]:
+            return
+        cursor.execute(
+            f"ALTER TABLE {table} ADD COLUMN {MySQLBackend.UPDATED_AT_DDL}, "
+            f"ADD INDEX idx_{table}_updated_at (updated_at, user_id)"
+        )
+        conn.commit()
+        print(f"✔️  Added updated_at to {table}")
+    finally:
+        cursor.close()
+
+
+class Progress:
+    """Prints rows loaded and rows/sec every `every` rows."""
+
+    def __init__(self, every=100_000, enabled=True):
+        self.every = every
+        self.enabled = enabled
+        self.rows = 0
+        self.start = time.perf_counter()
+        self._next = every
+
+    def add(self, n):
+        self.rows += n
+        if self.enabled and self.rows >= self._next:
+            self._next += self.every
+            print(f"   … {self.rows} rows ({self.rate():,.0f} rows/sec)")
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.rows / elapsed if elapsed else 0.0
+
+
+def csv_rows(f, fieldnames=None):
+    """
+    Yield (user_id, name, email, age) tuples from an open CSV file
+    (or any iterable of CSV lines when `fieldnames` is given).
+    """
+    for row in csv.DictReader(f, fieldnames=fieldnames):
+        # use existing user_id if present, otherwise generate one
+        uid = row.get("user_id") or str(uuid.uuid4())
+        yield (uid, row["name"], row["email"], row["age"])
+
+
+def insert_rows(conn, rows, batch_size=1000, table="user_data", progress=None):
+    """
+    Insert an iterable of row tuples in chunks of `batch_size`, using the
+    backend's bulk path (multi-row INSERT on MySQL, COPY on Postgres).
+    Commits once per chunk and returns the number of rows sent.
+    """
+    backend = get_backend()
+    sent = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            backend.bulk_insert(conn, table, batch)
+            conn.commit()
+            sent += len(batch)
+            if progress:
+                progress.add(len(batch))
+            batch = []
+    if batch:
+        backend.bulk_insert(conn, table, batch)
+        conn.commit()
+        sent += len(batch)
+        if progress:
+            progress.add(len(batch))
+    return sent
+
+
+def load_data_infile(conn, csv_path, table="user_data"):
+    """
+    Load the CSV server-side with LOAD DATA LOCAL INFILE.
+    The connection must allow local infile (allow_local_infile=True).
+    Missing or empty user_id values get a UUID() from MySQL.
+    """
+    if get_backend().name != "mysql":
+        raise ValueError("LOAD DATA LOCAL INFILE needs the mysql backend")
     with open(csv_path, newline="") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            # use existing user_id if present, otherwise generate one
-            uid = row.get("user_id") or str(uuid.uuid4())
-            cursor.execute(
-                """
-                INSERT IGNORE INTO user_data
-                  (user_id, name, email, age)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (uid, row["name"], row["email"], row["age"])
-            )
-    conn.commit()
-    cursor.close()
-    print(f"✔️  Loaded data from {csv_path}")
+        first = f.readline()
+    header = next(csv.reader([first]))
+    newline = "\\r\\n" if first.endswith("\r\n") else "\\n"
+    targets = ", ".join(
+        f"@{name}" if name == "user_id" else
+        name if name in ("name", "email", "age") else "@dummy"
+        for name in header
+    )
+    assign = (
+        " SET user_id = COALESCE(NULLIF(@user_id, ''), UUID())"
+        if "user_id" in header else " SET user_id = UUID()"
+    )
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {table} "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            f"LINES TERMINATED BY '{newline}' IGNORE 1 LINES "
+            f"({targets}){assign}",
+            (os.path.abspath(csv_path),)
+        )
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python seed.py user_data.csv")
-        sys.exit(1)
 
-    csv_file = sys.argv[1]
+def shard_ranges(csv_path, shards):
+    """
+    Split a CSV file into `shards` byte ranges aligned on line starts.
+    Returns (header, [(start, end), ...]); empty ranges are dropped.
+    Records must not contain embedded newlines.
+    """
+    size = os.path.getsize(csv_path)
+    with open(csv_path, "rb") as f:
+        header_line = f.readline()
+        body = f.tell()
+        cuts = [body]
+        for i in range(1, shards):
+            f.seek(max(body + (size - body) * i // shards - 1, cuts[-1]))
+            f.readline()  # move to the start of the next full line
+            cuts.append(max(f.tell(), cuts[-1]))
+        cuts.append(size)
+    header = next(csv.reader([header_line.decode("utf-8")]))
+    return header, [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+
+
+def _shard_lines(csv_path, start, end):
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line.decode("utf-8")
+
+
+def load_shard(csv_path, start, end, header, batch_size=1000,
+               table="user_data"):
+    """
+    Worker entry point: insert one byte range of the CSV over this
+    process's own pooled connection. Returns (rows, seconds).
+    """
+    began = time.perf_counter()
+    conn = connect_to_prodev()
+    if conn is None:
+        raise PoolError("worker could not connect to ALX_prodev")
+    try:
+        rows = csv_rows(_shard_lines(csv_path, start, end), fieldnames=header)
+        loaded = insert_rows(conn, rows, batch_size, table)
+    finally:
+        conn.close()
+    return loaded, time.perf_counter() - began
+
+
+def parallel_insert(csv_path, workers, batch_size=1000, table="user_data",
+                    progress=True):
+    """
+    Load the CSV with `workers` processes, one byte-range shard each.
+    INSERT IGNORE keeps re-runs idempotent. Returns (rows, seconds).
+    """
+    began = time.perf_counter()
+    header, ranges = shard_ranges(csv_path, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(load_shard, csv_path, a, b, header, batch_size, table)
+            for a, b in ranges
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - began
+    loaded = sum(rows for rows, _ in results)
+    if progress:
+        for i, (rows, secs) in enumerate(results):
+            rate = rows / secs if secs else 0.0
+            print(f"   worker {i}: {rows} rows in {secs:.2f}s "
+                  f"({rate:,.0f} rows/sec)")
+        rate = loaded / elapsed if elapsed else 0.0
+        print(f"✔️  Loaded data from {csv_path} with {len(results)} workers "
+              f"({loaded} rows, {rate:,.0f} rows/sec)")
+    return loaded, elapsed
+
+
+def insert_data(conn, csv_path, batch_size=1000, method="executemany",
+                table="user_data", progress=True):
+    """
+    Load CSV and insert rows (generate user_id if missing).
+
+    method="executemany" sends chunks of `batch_size` rows per INSERT,
+    method="infile" uses LOAD DATA LOCAL INFILE, and method="rows" keeps
+    the original one INSERT per row. Returns the number of rows loaded.
+    """
+    tracker = Progress(enabled=progress)
+    if method == "infile":
+        loaded = load_data_infile(conn, csv_path, table)
+        tracker.add(loaded)
+    elif method == "executemany":
+        with open(csv_path, newline="") as f:
+            loaded = insert_rows(conn, csv_rows(f), batch_size, table, tracker)
+    elif method == "rows":
+        backend = get_backend()
+        sql = backend.insert_ignore_sql(table)
+        cursor = backend.cursor(conn)
+        with open(csv_path, newline="") as f:
+            for row in csv_rows(f):
+                cursor.execute(sql, row)
+                tracker.add(1)
+        conn.commit()
+        cursor.close()
+        loaded = tracker.rows
+    else:
+        raise ValueError(f"unknown load method: {method!r}")
+    if progress:
+        print(f"✔️  Loaded data from {csv_path} "
+              f"({loaded} rows, {tracker.rate():,.0f} rows/sec)")
+    return loaded
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Create ALX_prodev.user_data and load it from a CSV file."
+    )
+    parser.add_argument("csv_file")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="rows per multi-row INSERT (default 1000)")
+    parser.add_argument("--method", choices=("executemany", "infile", "rows"),
+                        default="executemany",
+                        help="load path (default executemany)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="parallel loader processes, one CSV shard and "
+                             "connection each (default 1)")
+    parser.add_argument("--backend", choices=("mysql", "postgres", "sqlite"),
+                        help="database engine (default $PRODEV_BACKEND or mysql)")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and args.method != "executemany":
+        # the shard workers always load with batched inserts
+        parser.error(f"--workers {args.workers} only supports "
+                     "--method executemany")
+    return args
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    csv_file = args.csv_file
+    if args.backend:
+        # exported so --workers processes pick the same backend
+        os.environ["PRODEV_BACKEND"] = args.backend
+        set_backend(args.backend)
 
     # 1) connect & ensure database exists
-    root_conn = connect_db()
-    if not root_conn:
-        sys.exit(1)
-    create_database(root_conn)
-    root_conn.close()
+    if get_backend().name == "mysql":
+        root_conn = connect_db()
+        if not root_conn:
+            sys.exit(1)
+        create_database(root_conn)
+        root_conn.close()
 
     # 2) connect to ALX_prodev, create table, load CSV
-    prod_conn = connect_to_prodev()
+    if args.method == "infile":
+        import mysql.connector
+        try:
+            prod_conn = mysql.connector.connect(allow_local_infile=True,
+                                                **PRODEV_CONFIG)
+        except mysql.connector.Error as err:
+            print(f"[main] {err}")
+            prod_conn = None
+    else:
+        prod_conn = connect_to_prodev()
     if not prod_conn:
         sys.exit(1)
     create_table(prod_conn)
-    insert_data(prod_conn, csv_file)
+    if args.workers > 1:
+        prod_conn.close()
+        parallel_insert(csv_file, args.workers, batch_size=args.batch_size)
+        return
+    insert_data(prod_conn, csv_file, batch_size=args.batch_size,
+                method=args.method)
     prod_conn.close()
 
 if __name__ == "__main__":
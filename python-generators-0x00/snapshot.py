@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Local on-disk snapshot of user_data for repeat streaming.
+
+The first run streams the table from MySQL and writes it, column by
+column, to a compact file; later runs whose table key still matches replay
+from that file through mmap instead of querying MySQL again:
+
+    for user in snapshot_users("user_data.snap"):
+        ...
+    stream_users(snapshot="user_data.snap")       # same thing
+    lazy_paginate(100, snapshot="user_data.snap")
+
+The key is (row count, max user_id) by default. Pass checksum=True to add
+MySQL's CHECKSUM TABLE, which also catches in-place updates at the price
+of a server-side table scan.
+
+File layout (native byte order, 8-byte aligned blocks):
+    int columns:    n x int32
+    string columns: (n + 1) x int64 end offsets, then the UTF-8 bytes
+    footer:         JSON metadata, then uint64 footer offset and MAGIC
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from seed import connect_to_prodev
+from backends import get_backend
+from filters import row_check
+from rows import USER_COLUMNS, check_projection, open_cursor, row_converter
+
+MAGIC = b"UDSNAP01"
+INT_COLUMNS = {"age"}
+_TAIL = struct.Struct("<Q8s")
+
+
+def snapshot_key(checksum=False):
+    """Return the invalidation key of the live user_data table."""
+    conn = connect_to_prodev()
+    cursor = open_cursor(conn)
+    try:
+        cursor.execute("SELECT COUNT(*), MAX(user_id) FROM user_data")
+        count, max_id = cursor.fetchone()
+        key = {"count": count, "max_id": max_id}
+        if checksum:
+            if get_backend().name != "mysql":
+                raise ValueError("checksum keys need the mysql backend")
+            cursor.execute("CHECKSUM TABLE user_data")
+            key["checksum"] = cursor.fetchone()[1]
+        return key
+    finally:
+        cursor.close()
+        conn.close()
+
+
+class _ColumnSpool:
+    """Per-column temp files that rows are appended to while streaming."""
+
+    FLUSH = 8192
+
+    def __init__(self, name, directory):
+        self.name = name
+        self.is_int = name in INT_COLUMNS
+        self.data = tempfile.TemporaryFile(dir=directory)
+        self.offsets = None if self.is_int else tempfile.TemporaryFile(
+            dir=directory)
+        self._values = array("i")
+        self._ends = array("q", [0]) if not self.is_int else None
+        self._size = 0
+        self._chunks = []
+
+    def add(self, value):
+        if self.is_int:
+            self._values.append(value)
+            if len(self._values) >= self.FLUSH:
+                self._values.tofile(self.data)
+                self._values = array("i")
+            return
+        encoded = value.encode("utf-8")
+        self._size += len(encoded)
+        self._chunks.append(encoded)
+        self._ends.append(self._size)
+        if len(self._chunks) >= self.FLUSH:
+            self._flush_strings()
+
+    def _flush_strings(self):
+        self.data.write(b"".join(self._chunks))
+        self._chunks = []
+        self._ends.tofile(self.offsets)
+        self._ends = array("q")
+
+    def finish(self):
+        if self.is_int:
+            self._values.tofile(self.data)
+        else:
+            self._flush_strings()
+
+    def copy_into(self, out):
+        """Append this column's blocks to `out`; return its footer entry."""
+        entry = {"name": self.name, "kind": "int" if self.is_int else "str"}
+        if not self.is_int:
+            entry["offsets"] = _copy_aligned(self.offsets, out)
+        entry["data"] = _copy_aligned(self.data, out)
+        return entry
+
+    def close(self):
+        self.data.close()
+        if self.offsets:
+            self.offsets.close()
+
+
+def _copy_aligned(src, out):
+    out.write(b"\0" * (-out.tell() % 8))
+    start = out.tell()
+    src.seek(0)
+    while True:
+        chunk = src.read(1 << 20)
+        if not chunk:
+            break
+        out.write(chunk)
+    return [start, out.tell() - start]
+
+
+class SnapshotWriter:
+    """Builds a snapshot file from USER_COLUMNS-ordered row tuples."""
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.rows = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        self._spools = [_ColumnSpool(name, directory) for name in USER_COLUMNS]
+
+    def add(self, row):
+        for spool, value in zip(self._spools, row):
+            spool.add(value)
+        self.rows += 1
+
+    def commit(self):
+        """Write the file atomically (temp file + rename)."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                columns = []
+                for spool in self._spools:
+                    spool.finish()
+                    columns.append(spool.copy_into(out))
+                footer = json.dumps({
+                    "key": self.key,
+                    "rows": self.rows,
+                    "byteorder": sys.byteorder,
+                    "columns": columns,
+                }).encode("utf-8")
+                footer_at = out.tell()
+                out.write(footer)
+                out.write(_TAIL.pack(footer_at, MAGIC))
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        finally:
+            self.discard()
+
+    def discard(self):
+        for spool in self._spools:
+            spool.close()
+
+
+class Snapshot:
+    """Read-only, mmap-backed view of a snapshot file."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError(f"not a user_data snapshot: {path}")
+        view = memoryview(self._mm)
+        footer_at, magic = _TAIL.unpack_from(view, len(view) - _TAIL.size)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"not a user_data snapshot: {path}")
+        meta = json.loads(bytes(view[footer_at:len(view) - _TAIL.size]))
+        if meta["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError("snapshot was written with another byte order")
+        self.key = meta["key"]
+        self.rows = meta["rows"]
+        self._columns = {}
+        for entry in meta["columns"]:
+            start, size = entry["data"]
+            data = view[start:start + size]
+            if entry["kind"] == "int":
+                self._columns[entry["name"]] = (data.cast("i"), None)
+            else:
+                o_start, o_size = entry["offsets"]
+                self._columns[entry["name"]] = (
+                    data, view[o_start:o_start + o_size].cast("q"))
+
+    def column(self, name):
+        """
+        Zero-copy memoryview of an int column (e.g. age), or a generator
+        of decoded strings for a string column.
+        """
+        data, ends = self._columns[name]
+        if ends is None:
+            return data
+        return (str(data[ends[i]:ends[i + 1]], "utf-8")
+                for i in range(self.rows))
+
+    def tuples(self, columns=USER_COLUMNS):
+        """Yield rows as tuples of `columns`."""
+        return zip(*(self.column(name) for name in columns))
+
+    def close(self):
+        self._columns = {}
+        try:
+            self._mm.close()
+        except (BufferError, AttributeError):
+            pass  # views still alive; released when collected
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def load_snapshot(path, key):
+    """Return an open Snapshot if `path` exists and matches `key`, else None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        snap = Snapshot(path)
+    except (ValueError, OSError):
+        return None
+    if snap.key != key:
+        snap.close()
+        return None
+    return snap
+
+
+def _live_rows(path, key, checksum):
+    """Stream user_data from MySQL, writing the snapshot as rows go by."""
+    stream_users = __import__('0-stream_users').stream_users
+    writer = SnapshotWriter(path, key)
+    complete = False
+    try:
+        for row in stream_users(streaming=True, columns=USER_COLUMNS,
+                                row_type="tuple"):
+            writer.add(row)
+            yield row
+        complete = True
+    finally:
+        # only keep the snapshot if the whole table was read unchanged
+        if complete and snapshot_key(checksum) == key:
+            writer.commit()
+        else:
+            writer.discard()
+
+
+def snapshot_users(path="user_data.snap", columns=None, row_type="dict",
+                   where=None, checksum=False, refresh=False):
+    """
+    Yield user rows like stream_users, served from the snapshot at `path`
+    when it is current and from MySQL (refreshing the snapshot) otherwise.
+    `where` is evaluated in Python on replay.
+    """
+    columns = check_projection(columns, row_type) or USER_COLUMNS
+    key = snapshot_key(checksum)
+    snap = None if refresh else load_snapshot(path, key)
+    try:
+        source = snap.tuples() if snap else _live_rows(path, key, checksum)
+        check = row_check(where, USER_COLUMNS, "tuple")
+        if check:
+            source = filter(check, source)
+        if columns != USER_COLUMNS:
+            picks = [USER_COLUMNS.index(name) for name in columns]
+            source = (tuple(row[i] for i in picks) for row in source)
+        if row_type == "dict":
+            convert = lambda row: dict(zip(columns, row))  # noqa: E731
+        else:
+            convert = row_converter(columns, row_type)
+        yield from (map(convert, source) if convert else source)
+    finally:
+        if snap:
+            snap.close()
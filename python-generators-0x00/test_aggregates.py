@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Tests for aggregates.py, on the SQLite backend."""
+import os
+import statistics
+import tempfile
+import unittest
+
+import backends
+import seed
+from aggregates import (RunningStats, histogram, mean, percentiles,
+                        summarize)
+from backends import SQLiteBackend, set_backend
+from filters import Col, Custom
+
+AGES = [18, 21, 21, 25, 30, 30, 30, 42, 55, 67, 70, 91]
+# always true, but forces the streaming fallback
+EVERYONE = Custom(lambda name: True, "name")
+
+
+class TestAggregates(unittest.TestCase):
+    """Pushed-down and streaming paths must agree."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.addCleanup(set_backend, backends._backend)
+        set_backend(SQLiteBackend(os.path.join(self.dir.name, "prodev.db")))
+        seed.configure_pool()
+        self.addCleanup(seed.configure_pool)
+        with seed.connect_to_prodev() as conn:
+            seed.create_table(conn)
+            seed.insert_rows(conn, [(f"u{i:02d}", "user", "u@x.io", age)
+                                    for i, age in enumerate(AGES)])
+
+    def test_summarize(self):
+        expected = {"count": len(AGES), "sum": sum(AGES),
+                    "avg": sum(AGES) / len(AGES), "min": 18, "max": 91}
+        self.assertEqual(summarize(), expected)
+        self.assertEqual(summarize(where=EVERYONE), expected)
+        self.assertEqual(summarize(workers=3), expected)
+        self.assertEqual(summarize(where=EVERYONE, workers=3), expected)
+
+    def test_filtered_mean(self):
+        over_25 = [a for a in AGES if a > 25]
+        self.assertAlmostEqual(mean(where=Col("age") > 25),
+                               sum(over_25) / len(over_25))
+        self.assertIsNone(mean(where=Col("age") > 100))
+
+    def test_percentiles(self):
+        qs = (0, 0.5, 0.9, 1)
+        pushed = percentiles(qs)
+        self.assertEqual(pushed, {0: 18, 0.5: 30, 0.9: 70, 1: 91})
+        self.assertEqual(percentiles(qs, where=EVERYONE), pushed)
+        with self.assertRaises(ValueError):
+            percentiles((1.5,))
+
+    def test_histogram(self):
+        expected = [(10, 1), (20, 3), (30, 3), (40, 1), (50, 1), (60, 1),
+                    (70, 1), (90, 1)]
+        self.assertEqual(histogram(10), expected)
+        self.assertEqual(histogram(10, where=EVERYONE), expected)
+
+    def test_only_numeric_columns(self):
+        """Text columns are rejected before any query runs."""
+        for column in ("name", "email", "user_id"):
+            with self.assertRaises(ValueError):
+                summarize(column)
+            with self.assertRaises(ValueError):
+                percentiles(column=column)
+            with self.assertRaises(ValueError):
+                histogram(5, column=column)
+
+
+class TestRunningStats(unittest.TestCase):
+    """Test suite for the single-pass accumulator."""
+
+    def test_merge_matches_single_pass(self):
+        whole, left, right = RunningStats(), RunningStats(), RunningStats()
+        for i, age in enumerate(AGES):
+            whole.add(age)
+            (left if i % 2 else right).add(age)
+        merged = left.merge(right)
+        self.assertEqual(merged.as_dict()["count"], whole.count)
+        self.assertAlmostEqual(merged.mean, statistics.fmean(AGES))
+        self.assertAlmostEqual(merged.variance, statistics.pvariance(AGES))
+        self.assertEqual((merged.min, merged.max), (18, 91))
+
+
+if __name__ == "__main__":
+    unittest.main()
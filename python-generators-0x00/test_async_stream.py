@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Tests for async_stream.py against a temporary SQLite database."""
+import asyncio
+import os
+import tempfile
+import unittest
+
+from async_stream import (AioSQLiteBackend, astream_user_ages, astream_users,
+                          astream_users_in_batches)
+from backends import SQLiteBackend
+
+USERS = [(f"u{i:03d}", f"user {i}", f"u{i}@x.io", 20 + i % 50)
+         for i in range(57)]
+
+
+async def collect(agen):
+    return [item async for item in agen]
+
+
+class TestAsyncStream(unittest.IsolatedAsyncioTestCase):
+    """Test suite for the async generators on the aiosqlite backend."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        path = os.path.join(self.dir.name, "ALX_prodev.db")
+        seed_backend = SQLiteBackend(path)
+        conn = seed_backend.connect()
+        for statement in seed_backend.user_table_ddl():
+            conn.execute(statement)
+        conn.executemany(
+            "INSERT INTO user_data (user_id, name, email, age) "
+            "VALUES (?, ?, ?, ?)", USERS)
+        conn.commit()
+        conn.close()
+        self.backend = AioSQLiteBackend(path)
+
+    async def test_streams_run_concurrently(self):
+        """Row, keyset-batch and age streams share one event loop."""
+        users, batches, ages = await asyncio.gather(
+            collect(astream_users(chunk_size=10, backend=self.backend)),
+            collect(astream_users_in_batches(
+                10, mode="keyset", columns=("user_id", "age"),
+                backend=self.backend)),
+            collect(astream_user_ages(chunk_size=7, backend=self.backend)),
+        )
+        self.assertEqual(
+            sorted(u["user_id"] for u in users), [u[0] for u in USERS])
+        self.assertEqual(users[0], dict(zip(
+            ("user_id", "name", "email", "age"), USERS[0])))
+
+        self.assertEqual([len(b) for b in batches], [10] * 5 + [7])
+        self.assertEqual([row["user_id"] for b in batches for row in b],
+                         [u[0] for u in USERS])
+        self.assertEqual([b.cursor for b in batches],
+                         [b[-1]["user_id"] for b in batches])
+
+        self.assertEqual(sorted(ages), sorted(u[3] for u in USERS))
+
+    async def test_keyset_resumes_after_cursor(self):
+        """`after` continues a keyset scan from a previous batch's cursor."""
+        batches = await collect(astream_users_in_batches(
+            20, mode="keyset", after="u039", row_type="tuple",
+            columns=("user_id",), backend=self.backend))
+        self.assertEqual([row for b in batches for row in b],
+                         [(u[0],) for u in USERS[40:]])
+
+    def test_default_path_follows_sqlite_backend(self):
+        """Without a path the backend opens PRODEV_SQLITE_PATH."""
+        saved = os.environ.pop("PRODEV_SQLITE_PATH", None)
+        try:
+            self.assertEqual(AioSQLiteBackend().path, "ALX_prodev.db")
+            os.environ["PRODEV_SQLITE_PATH"] = "/tmp/prodev.db"
+            self.assertEqual(AioSQLiteBackend().path, "/tmp/prodev.db")
+        finally:
+            if saved is None:
+                os.environ.pop("PRODEV_SQLITE_PATH", None)
+            else:
+                os.environ["PRODEV_SQLITE_PATH"] = saved
+
+
+if __name__ == "__main__":
+    unittest.main()
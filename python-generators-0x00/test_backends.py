@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Tests for backends.py: backend selection and the Postgres backend."""
+import os
+import sys
+import tempfile
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+import backends
+import seed
+from backends import (MySQLBackend, PostgresBackend, SQLiteBackend,
+                      create_backend, get_backend, set_backend)
+
+
+class TestBackendSelection(unittest.TestCase):
+    """Test suite for create_backend, get_backend and set_backend."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.addCleanup(set_backend, backends._backend)
+        self.path = os.path.join(self.dir.name, "prodev.db")
+
+    def test_get_backend_reads_the_environment_once(self):
+        backends._backend = None
+        env = {"PRODEV_BACKEND": "sqlite", "PRODEV_SQLITE_PATH": self.path}
+        with patch.dict(os.environ, env):
+            backend = get_backend()
+        self.assertIsInstance(backend, SQLiteBackend)
+        self.assertEqual(backend.path, self.path)
+        with patch.dict(os.environ, {"PRODEV_BACKEND": "postgres"}):
+            self.assertIs(get_backend(), backend)
+
+    def test_get_backend_defaults_to_mysql(self):
+        backends._backend = None
+        with patch.dict(os.environ):
+            os.environ.pop("PRODEV_BACKEND", None)
+            self.assertIsInstance(get_backend(), MySQLBackend)
+
+    def test_set_backend_takes_an_instance_or_a_name(self):
+        backend = SQLiteBackend(self.path)
+        self.assertIs(set_backend(backend), backend)
+        self.assertIs(get_backend(), backend)
+        named = set_backend("sqlite", path=self.path, timeout=1.5)
+        self.assertIsInstance(named, SQLiteBackend)
+        self.assertEqual(named.options, {"timeout": 1.5})
+        self.assertIs(get_backend(), named)
+        seed.configure_pool()
+        self.addCleanup(seed.configure_pool)
+        with seed.connect_to_prodev() as conn:
+            self.assertEqual(conn.execute("SELECT FLOOR(2.7)").fetchone(),
+                             (2,))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_backend("oracle")
+        with self.assertRaises(ValueError):
+            set_backend("oracle")
+
+    def test_mysql_settings_live_in_seed(self):
+        self.assertIs(MySQLBackend().config, seed.PRODEV_CONFIG)
+        self.assertFalse(hasattr(backends, "PRODEV_CONFIG"))
+        self.assertFalse(hasattr(backends, "PoolError"))
+
+
+def fake_psycopg():
+    """A psycopg stand-in recording connections, cursors and COPY rows."""
+    psycopg = types.ModuleType("psycopg")
+    rows = types.ModuleType("psycopg.rows")
+    psycopg.Error = type("Error", (Exception,), {})
+    psycopg.OperationalError = type("OperationalError", (psycopg.Error,), {})
+    psycopg.connect = MagicMock(name="connect")
+    rows.dict_row = object()
+    psycopg.rows = rows
+    return {"psycopg": psycopg, "psycopg.rows": rows}
+
+
+class TestPostgresBackend(unittest.TestCase):
+    """Test suite for PostgresBackend against a fake psycopg driver."""
+
+    def setUp(self):
+        modules = patch.dict(sys.modules, fake_psycopg())
+        modules.start()
+        self.addCleanup(modules.stop)
+        self.psycopg = sys.modules["psycopg"]
+        self.backend = PostgresBackend("dbname=test")
+
+    def test_connect_uses_the_dsn(self):
+        self.backend.connect()
+        self.psycopg.connect.assert_called_once_with("dbname=test")
+        self.assertIs(self.backend.Error, self.psycopg.Error)
+        with patch.dict(os.environ, {"PRODEV_DSN": "dbname=env"}):
+            self.assertEqual(create_backend("postgres").dsn, "dbname=env")
+
+    def test_streaming_cursors_are_named_server_side_cursors(self):
+        conn = MagicMock()
+        self.backend.cursor(conn, row_type="dict", streaming=True)
+        kwargs = conn.cursor.call_args.kwargs
+        self.assertTrue(kwargs["name"].startswith("stream_"))
+        self.assertIs(kwargs["row_factory"], self.psycopg.rows.dict_row)
+        self.backend.cursor(conn, streaming=True)
+        self.assertNotEqual(conn.cursor.call_args.kwargs["name"],
+                            kwargs["name"])
+        self.backend.cursor(conn)
+        self.assertEqual(conn.cursor.call_args.kwargs, {})
+
+    def test_cursor_translates_mysql_inserts(self):
+        conn = MagicMock()
+        cursor = self.backend.cursor(conn)
+        cursor.execute("INSERT IGNORE INTO t (a) VALUES (%s)", (1,))
+        conn.cursor.return_value.execute.assert_called_once_with(
+            "INSERT INTO t (a) VALUES (%s)", (1,))
+        self.assertEqual(
+            self.backend.insert_ignore_sql("t", ("a", "b")),
+            "INSERT INTO t (a, b) VALUES (%s, %s) ON CONFLICT DO NOTHING")
+
+    def test_ping_rejects_closed_connections(self):
+        self.backend.ping(MagicMock(closed=False))
+        with self.assertRaises(self.psycopg.OperationalError):
+            self.backend.ping(MagicMock(closed=True))
+
+    def test_bulk_insert_copies_then_merges(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        copy = cursor.copy.return_value.__enter__.return_value
+        rows = [("u1", "a", "a@x.io", 30), ("u2", "b", "b@x.io", 40)]
+        self.backend.bulk_insert(conn, "user_data", rows)
+        self.assertEqual([c.args[0] for c in copy.write_row.call_args_list],
+                         rows)
+        cursor.copy.assert_called_once_with(
+            "COPY _load_user_data (user_id, name, email, age) FROM STDIN")
+        statements = [c.args[0] for c in cursor.execute.call_args_list]
+        self.assertIn("CREATE TEMP TABLE", statements[0])
+        self.assertIn("ON CONFLICT DO NOTHING", statements[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
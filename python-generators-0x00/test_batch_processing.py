@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Tests for 1-batch_processing keyset paging, on the SQLite backend."""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import backends
+import seed
+from backends import SQLiteBackend, set_backend
+from filters import Col, Custom
+
+batch_module = __import__('1-batch_processing')
+stream_users_in_batches = batch_module.stream_users_in_batches
+batch_processing = batch_module.batch_processing
+
+# inserted out of key order: keyset batches must still come back sorted
+USERS = [(f"u{i:02d}", f"user {i}", f"u{i}@x.io", 20 + i)
+         for i in reversed(range(11))]
+IDS = [f"u{i:02d}" for i in range(11)]
+
+
+class TestKeysetBatches(unittest.TestCase):
+    """Test suite for mode="keyset" and resuming from Batch.cursor."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.addCleanup(set_backend, backends._backend)
+        set_backend(SQLiteBackend(os.path.join(self.dir.name, "prodev.db")))
+        seed.configure_pool()
+        self.addCleanup(seed.configure_pool)
+        with seed.connect_to_prodev() as conn:
+            seed.create_table(conn)
+            seed.insert_rows(conn, USERS)
+
+    def ids(self, batches):
+        return [row["user_id"] for batch in batches for row in batch]
+
+    def test_cursor_is_the_last_key_of_each_batch(self):
+        batches = list(stream_users_in_batches(4, mode="keyset"))
+        self.assertEqual([len(b) for b in batches], [4, 4, 3])
+        self.assertEqual([b.cursor for b in batches], ["u03", "u07", "u10"])
+        self.assertEqual(self.ids(batches), IDS)
+
+    def test_resume_from_a_saved_cursor(self):
+        """A stream restarted at batch.cursor picks up right after it."""
+        stream = stream_users_in_batches(4, mode="keyset")
+        first = next(stream)
+        stream.close()
+        rest = stream_users_in_batches(4, mode="keyset", after=first.cursor)
+        self.assertEqual(self.ids([first]) + self.ids(rest), IDS)
+        self.assertEqual(
+            list(stream_users_in_batches(4, mode="keyset", after="u10")), [])
+
+    def test_keyset_queries_never_use_offset(self):
+        statements = []
+        open_cursor = batch_module.open_cursor
+
+        def recording_cursor(conn, row_type="tuple"):
+            cursor = open_cursor(conn, row_type)
+            execute = cursor.execute
+
+            def record(sql, params=()):
+                statements.append(sql)
+                return execute(sql, params)
+            cursor.execute = record
+            return cursor
+
+        with patch.object(batch_module, "open_cursor", recording_cursor):
+            list(stream_users_in_batches(4, mode="keyset"))
+            self.assertEqual(len(statements), 4)
+            self.assertFalse(any("OFFSET" in sql for sql in statements))
+            self.assertTrue(all("ORDER BY user_id" in sql
+                                for sql in statements))
+            statements.clear()
+            list(stream_users_in_batches(4))
+            self.assertTrue(all("OFFSET" in sql for sql in statements))
+
+    def test_cursor_advances_past_filtered_out_batches(self):
+        """Rows dropped by a residual filter still move the cursor."""
+        late = Custom(lambda age: age >= 27, "age")
+        batches = list(stream_users_in_batches(
+            4, mode="keyset", columns=("user_id", "age"), row_type="tuple",
+            where=late))
+        self.assertEqual(batches, [[("u07", 27)],
+                                   [("u08", 28), ("u09", 29), ("u10", 30)]])
+        self.assertEqual([b.cursor for b in batches], ["u07", "u10"])
+        pushed = list(stream_users_in_batches(
+            2, mode="keyset", row_type="namedtuple", where=Col("age") > 27))
+        self.assertEqual([b.cursor for b in pushed], ["u09", "u10"])
+        self.assertEqual(pushed[0][0].user_id, "u08")
+
+    def test_offset_batches_have_no_cursor(self):
+        batches = list(stream_users_in_batches(4))
+        self.assertEqual([b.cursor for b in batches], [None] * 3)
+
+    def test_bad_arguments(self):
+        with self.assertRaises(ValueError):
+            next(stream_users_in_batches(4, mode="seek"))
+        with self.assertRaises(ValueError):
+            next(stream_users_in_batches(4, after="u03"))
+        with self.assertRaises(ValueError):
+            next(stream_users_in_batches(4, mode="keyset", columns=("age",)))
+
+    def test_batch_processing_modes_agree(self):
+        offset = list(batch_processing(3))
+        keyset = list(batch_processing(3, mode="keyset"))
+        self.assertEqual(sorted(offset, key=lambda r: r["user_id"]), keyset)
+        self.assertEqual([row["age"] for row in keyset], list(range(26, 31)))
+
+
+if __name__ == "__main__":
+    unittest.main()
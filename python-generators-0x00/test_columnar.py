@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Tests for columnar.py numpy and Arrow batches, on the SQLite backend."""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pyarrow as pa
+
+import backends
+import seed
+from backends import SQLiteBackend, set_backend
+from columnar import ColumnBatch, batch_cursor, stream_column_batches
+from filters import Col
+
+USERS = [(f"u{i:02d}", f"user {i}", f"u{i}@x.io", 20 + i) for i in range(10)]
+
+
+class TestColumnBatches(unittest.TestCase):
+    """Test suite for stream_column_batches in both output formats."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.addCleanup(set_backend, backends._backend)
+        set_backend(SQLiteBackend(os.path.join(self.dir.name, "prodev.db")))
+        seed.configure_pool()
+        self.addCleanup(seed.configure_pool)
+        with seed.connect_to_prodev() as conn:
+            seed.create_table(conn)
+            seed.insert_rows(conn, USERS)
+
+    def test_numpy_batches(self):
+        batches = list(stream_column_batches(4, mode="keyset"))
+        self.assertEqual([b.num_rows for b in batches], [4, 4, 2])
+        first = batches[0]
+        self.assertIsInstance(first, ColumnBatch)
+        self.assertEqual(first["age"].dtype, np.int32)
+        self.assertEqual(first["age"].tolist(), [20, 21, 22, 23])
+        self.assertEqual(first["name"].dtype, object)
+        self.assertEqual([batch_cursor(b) for b in batches],
+                         ["u03", "u07", "u09"])
+        fixed = next(stream_column_batches(4, columns=("name",),
+                                           strings="fixed"))
+        self.assertEqual(fixed["name"].dtype.kind, "U")
+        self.assertEqual(list(fixed), ["name"])
+
+    def test_arrow_batches_keep_the_cursor(self):
+        batches = list(stream_column_batches(4, format="arrow",
+                                             mode="keyset"))
+        self.assertTrue(all(isinstance(b, pa.RecordBatch) for b in batches))
+        self.assertEqual([b.num_rows for b in batches], [4, 4, 2])
+        self.assertEqual(batches[0].schema.field("age").type, pa.int32())
+        self.assertEqual(batches[0].schema.field("email").type, pa.string())
+        self.assertEqual(batches[1].column("user_id").to_pylist(),
+                         ["u04", "u05", "u06", "u07"])
+        self.assertEqual([batch_cursor(b) for b in batches],
+                         ["u03", "u07", "u09"])
+
+    def test_resume_from_a_batch_cursor(self):
+        for format in ("numpy", "arrow"):
+            with self.subTest(format=format):
+                first = next(stream_column_batches(
+                    3, columns=("user_id", "age"), format=format,
+                    mode="keyset", where=Col("age") >= 22))
+                rest = stream_column_batches(
+                    100, columns=("user_id", "age"), format=format,
+                    mode="keyset", where=Col("age") >= 22,
+                    after=batch_cursor(first))
+                ages = [int(age) for batch in rest for age in batch["age"]]
+                self.assertEqual(ages, [25, 26, 27, 28, 29])
+
+    def test_offset_batches_have_no_cursor(self):
+        for format in ("numpy", "arrow"):
+            batch = next(stream_column_batches(4, format=format))
+            self.assertIsNone(batch_cursor(batch))
+
+    def test_bad_options(self):
+        with self.assertRaises(ValueError):
+            next(stream_column_batches(4, format="pandas"))
+        with self.assertRaises(ValueError):
+            next(stream_column_batches(4, strings="bytes"))
+
+
+if __name__ == "__main__":
+    unittest.main()
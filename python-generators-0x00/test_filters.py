@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Unit tests for filters.py: SQL compilation and residual checks."""
+import unittest
+from unittest.mock import patch
+
+from filters import Col, Custom, row_check, split_filter
+
+stream_users_module = __import__('0-stream_users')
+
+
+class TestToSql(unittest.TestCase):
+    """Test suite for compiling filters to WHERE clauses."""
+
+    def test_comparisons(self):
+        """Each builder compiles to a parameterized clause."""
+        self.assertEqual((Col("age") > 25).to_sql(), ("age > %s", (25,)))
+        self.assertEqual(Col("age").between(18, 30).to_sql(),
+                         ("age BETWEEN %s AND %s", (18, 30)))
+        self.assertEqual(Col("name").isin(["a", "b"]).to_sql(),
+                         ("name IN (%s, %s)", ("a", "b")))
+        self.assertEqual(Col("name").isin([]).to_sql(), ("1 = 0", ()))
+        self.assertEqual(Col("email").like("%@x.io").to_sql(),
+                         ("email LIKE %s", ("%@x.io",)))
+
+    def test_combinators(self):
+        """&, | and ~ nest their parts' clauses and params in order."""
+        where = ~((Col("age") >= 18) | (Col("name") == "ada"))
+        self.assertEqual(where.to_sql(),
+                         ("NOT ((age >= %s) OR (name = %s))", (18, "ada")))
+
+    def test_custom_is_not_pushed_down(self):
+        """A Python predicate makes every enclosing OR/NOT unpushable."""
+        custom = Custom(str.isupper, "name")
+        self.assertIsNone(custom.to_sql())
+        self.assertIsNone(((Col("age") > 1) | custom).to_sql())
+        self.assertIsNone((~custom).to_sql())
+
+    def test_unknown_columns(self):
+        """Filters only accept user_data columns."""
+        with self.assertRaises(ValueError):
+            Col("password") == "x"
+        with self.assertRaises(ValueError):
+            Custom(bool, "password")
+
+
+class TestSplitFilter(unittest.TestCase):
+    """Test suite for split_filter."""
+
+    def test_no_filter(self):
+        self.assertEqual(split_filter(None), (None, (), None))
+
+    def test_and_terms_split_independently(self):
+        """Pushable AND terms go to SQL, the rest stay residual."""
+        custom = Custom(str.isupper, "name")
+        clause, params, residual = split_filter(
+            (Col("age") > 25) & custom & Col("email").like("%@x.io"))
+        self.assertEqual(clause, "(age > %s) AND (email LIKE %s)")
+        self.assertEqual(params, (25, "%@x.io"))
+        self.assertIs(residual, custom)
+
+    def test_unpushable_or_is_all_residual(self):
+        where = (Col("age") > 25) | Custom(str.isupper, "name")
+        self.assertEqual(split_filter(where), (None, (), where))
+
+    def test_residual_outside_projection(self):
+        """A residual reading an unprojected column fails up front."""
+        where = Custom(str.isupper, "name")
+        self.assertEqual(split_filter(where, ("user_id", "name"))[2], where)
+        with self.assertRaises(ValueError):
+            split_filter(where, ("user_id", "age"))
+        # pushed-down terms may use any column
+        split_filter(Col("name") == "ada", ("age",))
+
+
+class TestResidual(unittest.TestCase):
+    """Test suite for evaluating residual filters on fetched rows."""
+
+    where = Custom(str.isupper, "name") | Col("email").like("%@X.IO")
+
+    def test_dict_rows(self):
+        check = row_check(self.where, ("name", "email"), "dict")
+        self.assertTrue(check({"name": "ADA", "email": "a@y.io"}))
+        self.assertTrue(check({"name": "ada", "email": "a@x.io"}))
+        self.assertFalse(check({"name": "ada", "email": "a@y.io"}))
+
+    def test_tuple_rows(self):
+        check = row_check(~self.where, ("email", "name"), "tuple")
+        self.assertTrue(check(("a@y.io", "ada")))
+        self.assertFalse(check(("a@y.io", "ADA")))
+
+    def test_column_not_fetched(self):
+        """Dict and tuple rows both reject a column the cursor lacks."""
+        for row_type in ("dict", "tuple"):
+            with self.assertRaises(ValueError):
+                row_check(self.where, ("name",), row_type)
+
+    def test_no_residual(self):
+        self.assertIsNone(row_check(None, ("name",), "dict"))
+
+    def test_generator_validates_before_querying(self):
+        """stream_users rejects the filter without opening a connection."""
+        with patch.object(stream_users_module, "connect_to_prodev") as connect:
+            users = stream_users_module.stream_users(
+                columns=("user_id", "age"), row_type="dict",
+                where=Custom(str.isupper, "name"))
+            with self.assertRaises(ValueError):
+                next(users)
+        connect.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Tests for incremental.py checkpoints, on the SQLite backend."""
+import os
+import tempfile
+import time
+import unittest
+
+import backends
+import seed
+from backends import SQLiteBackend, set_backend
+from incremental import load_checkpoint, stream_changes
+
+stream_users = __import__('0-stream_users').stream_users
+
+OLD = "2024-01-01 00:00:00.000"
+
+
+class TestStreamChanges(unittest.TestCase):
+    """Test suite for stream_changes and stream_users(checkpoint=...)."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.addCleanup(set_backend, backends._backend)
+        backend = set_backend(
+            SQLiteBackend(os.path.join(self.dir.name, "prodev.db")))
+        seed.configure_pool()
+        self.addCleanup(seed.configure_pool)
+        self.checkpoint = os.path.join(self.dir.name, "users.hwm")
+        self.conn = backend.connect()
+        self.addCleanup(self.conn.close)
+        for statement in backend.user_table_ddl():
+            self.conn.execute(statement)
+        # every row shares one timestamp: batches split on the user_id tiebreak
+        self.conn.executemany(
+            "INSERT INTO user_data (user_id, name, email, age, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(f"u{i:02d}", f"user {i}", f"u{i}@x.io", 20 + i, OLD)
+             for i in range(20)])
+        self.conn.commit()
+
+    def changes(self, **kwargs):
+        return stream_changes(self.checkpoint, batch_size=6, lag_seconds=0,
+                              **kwargs)
+
+    def test_first_run_reads_everything_then_nothing(self):
+        rows = list(self.changes())
+        self.assertEqual([r["user_id"] for r in rows],
+                         [f"u{i:02d}" for i in range(20)])
+        self.assertEqual(rows[0], {"user_id": "u00", "name": "user 0",
+                                   "email": "u0@x.io", "age": 20})
+        self.assertEqual(load_checkpoint(self.checkpoint)[1], "u19")
+        self.assertEqual(list(self.changes()), [])
+        other = os.path.join(self.dir.name, "other.hwm")
+        self.assertEqual(list(stream_users(checkpoint=other)), rows)
+
+    def test_interrupted_run_resumes_after_last_full_batch(self):
+        """The mark only moves past batches the consumer finished."""
+        stream = self.changes(columns=("user_id",), row_type="tuple")
+        taken = [next(stream) for _ in range(8)]
+        stream.close()
+        self.assertEqual(load_checkpoint(self.checkpoint)[1], "u05")
+        rest = list(self.changes(columns=("user_id",), row_type="tuple"))
+        self.assertEqual(taken[:6] + rest,
+                         [(f"u{i:02d}",) for i in range(20)])
+
+    def test_updates_are_picked_up(self):
+        """Rows updated after the last run come back, and only those."""
+        list(self.changes())
+        self.conn.execute("UPDATE user_data SET age = 99 WHERE user_id = 'u07'")
+        self.conn.commit()
+        time.sleep(0.01)  # updated_at has millisecond resolution
+        rows = list(self.changes())
+        self.assertEqual([(r["user_id"], r["age"]) for r in rows],
+                         [("u07", 99)])
+
+    def test_lag_holds_back_recent_changes(self):
+        list(self.changes())
+        self.conn.execute("UPDATE user_data SET age = 99 WHERE user_id = 'u07'")
+        self.conn.commit()
+        self.assertEqual(
+            list(stream_changes(self.checkpoint, lag_seconds=60)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
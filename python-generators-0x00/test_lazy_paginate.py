@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Tests for 2-lazy_paginate.lazy_paginate, on the SQLite backend."""
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import backends
+import seed
+from backends import SQLiteBackend, set_backend
+
+paginate_module = __import__('2-lazy_paginate')
+lazy_paginate = paginate_module.lazy_paginate
+
+
+def prefetch_threads():
+    return [t for t in threading.enumerate()
+            if t.name == "lazy_paginate-prefetch"]
+
+
+class TestLazyPaginate(unittest.TestCase):
+    """Test suite for plain and prefetched pagination."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.addCleanup(set_backend, backends._backend)
+        set_backend(SQLiteBackend(os.path.join(self.dir.name, "prodev.db")))
+        seed.configure_pool(size=1, timeout=1)
+        self.addCleanup(seed.configure_pool, size=5, timeout=30.0)
+        with seed.connect_to_prodev() as conn:
+            seed.create_table(conn)
+            seed.insert_rows(conn, [(f"u{i:02d}", "user", "u@x.io", 20 + i)
+                                    for i in range(23)])
+
+    def test_pages_match_with_and_without_prefetch(self):
+        plain = list(lazy_paginate(5))
+        self.assertEqual([len(page) for page in plain], [5, 5, 5, 5, 3])
+        self.assertEqual(list(lazy_paginate(5, prefetch=2)), plain)
+
+    def test_negative_prefetch_is_rejected(self):
+        with self.assertRaises(ValueError):
+            next(lazy_paginate(5, prefetch=-1))
+
+    def test_early_close_stops_producer_and_releases_connection(self):
+        pages = lazy_paginate(2, prefetch=1)
+        next(pages)
+        pages.close()
+        self.assertEqual(prefetch_threads(), [])
+        # the only pooled connection is free again
+        seed.get_pool().get().close()
+
+    def test_producer_error_reaches_consumer(self):
+        real_fetch = paginate_module.fetch_page
+
+        def failing_fetch(page_size, offset, *args):
+            if offset:
+                raise RuntimeError("connection lost")
+            return real_fetch(page_size, offset, *args)
+
+        with patch.object(paginate_module, "fetch_page", failing_fetch):
+            pages = lazy_paginate(5, prefetch=2)
+            self.assertEqual(len(next(pages)), 5)
+            with self.assertRaisesRegex(RuntimeError, "connection lost"):
+                next(pages)
+        self.assertEqual(prefetch_threads(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
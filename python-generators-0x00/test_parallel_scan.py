@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Tests for parallel_scan.py, on the SQLite backend."""
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import backends
+import parallel_scan as scan_module
+import seed
+from backends import SQLiteBackend, set_backend
+from filters import Col
+from parallel_scan import key_ranges, parallel_reduce, parallel_scan
+
+USERS = [(f"u{i:02d}", f"user {i}", f"u{i}@x.io", 18 + i % 50)
+         for i in range(60)]
+IDS = [user[0] for user in USERS]
+PARTS = 4
+
+
+def count_rows(rows):
+    return sum(1 for _ in rows)
+
+
+class TestParallelScan(unittest.TestCase):
+    """Test suite for key_ranges, parallel_scan and parallel_reduce."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.addCleanup(set_backend, backends._backend)
+        set_backend(SQLiteBackend(os.path.join(self.dir.name, "prodev.db")))
+        # one connection per range plus one for key_ranges/the test itself
+        seed.configure_pool(size=PARTS + 1, timeout=1.0)
+        self.addCleanup(seed.configure_pool, size=5, timeout=30.0)
+        with seed.connect_to_prodev() as conn:
+            seed.create_table(conn)
+            seed.insert_rows(conn, USERS)
+
+    def scan_threads(self):
+        return [t for t in threading.enumerate()
+                if t.name.startswith("parallel_scan-")]
+
+    def test_key_ranges_cover_the_table(self):
+        ranges = key_ranges(PARTS)
+        self.assertEqual(len(ranges), PARTS)
+        self.assertIsNone(ranges[0][0])
+        self.assertIsNone(ranges[-1][1])
+        for (_, upto), (after, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(upto, after)
+        self.assertEqual(key_ranges(10, where=Col("age") > 66),
+                         [(None, None)])
+        with self.assertRaises(ValueError):
+            key_ranges(0)
+
+    def test_unordered_scan_returns_every_row(self):
+        rows = list(parallel_scan(PARTS, batch_size=4))
+        self.assertEqual(sorted(r["user_id"] for r in rows), IDS)
+
+    def test_ordered_scan_is_in_key_order(self):
+        rows = list(parallel_scan(PARTS, columns=("user_id", "age"),
+                                  row_type="tuple", batch_size=4,
+                                  ordered=True, depth=1))
+        self.assertEqual([r[0] for r in rows], IDS)
+        filtered = parallel_scan(PARTS, columns=("user_id",),
+                                 row_type="tuple", where=Col("age") >= 60,
+                                 batch_size=2, ordered=True)
+        self.assertEqual([r[0] for r in filtered],
+                         [u[0] for u in USERS if u[3] >= 60])
+        with self.assertRaises(ValueError):
+            next(parallel_scan(PARTS, columns=("age",)))
+
+    def test_early_close_stops_the_workers(self):
+        """Closing the generator joins the threads and frees connections."""
+        rows = parallel_scan(PARTS, batch_size=2, ordered=True, depth=1)
+        self.assertEqual(next(rows)["user_id"], "u00")
+        rows.close()
+        self.assertEqual(self.scan_threads(), [])
+        held = [seed.connect_to_prodev() for _ in range(PARTS + 1)]
+        for conn in held:
+            conn.close()
+
+    def test_worker_errors_reach_the_consumer(self):
+        scan_range = scan_module.scan_range
+
+        def failing(after, upto, *args):
+            if after is not None:
+                raise RuntimeError(f"range after {after} failed")
+            return scan_range(after, upto, *args)
+
+        with patch.object(scan_module, "scan_range", failing):
+            for ordered in (False, True):
+                with self.subTest(ordered=ordered):
+                    with self.assertRaisesRegex(RuntimeError, "failed"):
+                        list(parallel_scan(PARTS, batch_size=4,
+                                           ordered=ordered))
+                    self.assertEqual(self.scan_threads(), [])
+
+    def test_parallel_reduce_in_key_order(self):
+        counts = parallel_reduce(count_rows, PARTS, batch_size=4)
+        self.assertEqual(len(counts), PARTS)
+        self.assertEqual(sum(counts), len(USERS))
+
+        def first_id(rows):
+            return next(iter(rows))["user_id"]
+        firsts = parallel_reduce(first_id, PARTS, batch_size=4)
+        self.assertEqual(firsts, sorted(firsts))
+        self.assertEqual(firsts[0], "u00")
+
+
+if __name__ == "__main__":
+    unittest.main()
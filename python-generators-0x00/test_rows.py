@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Tests for rows.py projections and row types, on the SQLite backend."""
+import os
+import tempfile
+import unittest
+
+import backends
+import seed
+from backends import SQLiteBackend, set_backend
+from rows import (USER_COLUMNS, check_projection, field_getter,
+                  row_converter, select_list)
+
+stream_users = __import__('0-stream_users').stream_users
+stream_users_in_batches = __import__(
+    '1-batch_processing').stream_users_in_batches
+lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+
+USERS = [(f"u{i}", f"user {i}", f"u{i}@x.io", 30 + i) for i in range(3)]
+
+
+class TestProjection(unittest.TestCase):
+    """Test suite for the helpers in rows.py."""
+
+    def test_check_projection(self):
+        self.assertIsNone(check_projection(None, "dict"))
+        self.assertEqual(check_projection(["age", "name"], "tuple"),
+                         ("age", "name"))
+        with self.assertRaises(ValueError):
+            check_projection(None, "list")
+        with self.assertRaises(ValueError):
+            check_projection((), "tuple")
+        with self.assertRaises(ValueError):
+            check_projection(("age", "updated_at"), "tuple")
+
+    def test_select_list(self):
+        self.assertEqual(select_list(("age",)), "age")
+        self.assertEqual(select_list(None), ", ".join(USER_COLUMNS))
+
+    def test_converters_and_getters(self):
+        self.assertIsNone(row_converter(("age",), "tuple"))
+        self.assertIsNone(row_converter(("age",), "dict"))
+        make = row_converter(("name", "age"), "namedtuple")
+        row = make(("ada", 30))
+        self.assertEqual((row.name, row.age), ("ada", 30))
+        self.assertIs(type(make(("bayo", 31))), type(row))
+        self.assertEqual(field_getter(("name", "age"), "tuple", "age")(
+            ("ada", 30)), 30)
+        self.assertEqual(field_getter(("age",), "dict", "age")({"age": 30}),
+                         30)
+        with self.assertRaises(ValueError):
+            field_getter(("name",), "tuple", "age")
+
+
+class TestProjectedRows(unittest.TestCase):
+    """Every generator returns exactly the projected columns in row_type."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.addCleanup(set_backend, backends._backend)
+        set_backend(SQLiteBackend(os.path.join(self.dir.name, "prodev.db")))
+        seed.configure_pool()
+        self.addCleanup(seed.configure_pool)
+        with seed.connect_to_prodev() as conn:
+            seed.create_table(conn)
+            seed.insert_rows(conn, USERS)
+
+    def generators(self, columns, row_type):
+        rows = {
+            "stream_users": stream_users(columns=columns, row_type=row_type),
+            "streaming": stream_users(streaming=True, chunk_size=2,
+                                      columns=columns, row_type=row_type),
+            "batches": (row for batch in stream_users_in_batches(
+                2, columns=columns, row_type=row_type) for row in batch),
+            "pages": (row for page in lazy_paginate(
+                2, columns=columns, row_type=row_type) for row in page),
+        }
+        return {name: sorted(gen, key=repr) for name, gen in rows.items()}
+
+    def test_tuple_rows(self):
+        for name, rows in self.generators(("age",), "tuple").items():
+            with self.subTest(name):
+                self.assertEqual(rows, [(30,), (31,), (32,)])
+
+    def test_namedtuple_rows(self):
+        for name, rows in self.generators(("user_id", "age"),
+                                          "namedtuple").items():
+            with self.subTest(name):
+                self.assertEqual([tuple(r) for r in rows],
+                                 [("u0", 30), ("u1", 31), ("u2", 32)])
+                self.assertEqual(rows[0]._fields, ("user_id", "age"))
+                self.assertEqual(rows[2].age, 32)
+
+    def test_dict_rows(self):
+        for name, rows in self.generators(("email",), "dict").items():
+            with self.subTest(name):
+                self.assertEqual(rows, [{"email": f"u{i}@x.io"}
+                                        for i in range(3)])
+        everything = list(stream_users())
+        self.assertEqual(everything[0], dict(zip(USER_COLUMNS, USERS[0])))
+
+    def test_bad_projection_fails_before_querying(self):
+        with self.assertRaises(ValueError):
+            next(stream_users(columns=("password",)))
+        with self.assertRaises(ValueError):
+            next(stream_users(row_type="list"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Tests for the seed.py connection pool, on the SQLite backend."""
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import backends
+import seed
+from backends import SQLiteBackend, set_backend
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Test suite for ConnectionPool, configure_pool and connect_to_prodev."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.addCleanup(set_backend, backends._backend)
+        set_backend(SQLiteBackend(os.path.join(self.dir.name, "prodev.db")))
+        seed.configure_pool(size=1, timeout=0.05)
+        self.addCleanup(seed.configure_pool, size=5, timeout=30.0)
+
+    def test_checkout_timeout_raises(self):
+        """An exhausted pool raises PoolError instead of returning None."""
+        conn = seed.connect_to_prodev()
+        with self.assertRaises(seed.PoolError):
+            seed.connect_to_prodev()
+        conn.close()
+        seed.connect_to_prodev().close()
+
+    def test_release_reuses_connection(self):
+        """close() hands the connection back for the next caller."""
+        for _ in range(3):
+            with seed.connect_to_prodev() as conn:
+                conn.execute("SELECT 1")
+        self.assertEqual(seed.get_pool().created, 1)
+
+    def test_closed_wrapper_refuses_use(self):
+        conn = seed.connect_to_prodev()
+        conn.close()
+        with self.assertRaises(seed.PoolError):
+            conn.cursor()
+
+    def test_reconfigure_closes_checked_out_connections(self):
+        """Connections out during configure_pool() close on return."""
+        wrapper = seed.connect_to_prodev()
+        raw = wrapper._conn
+        old_pool = seed.get_pool()
+        seed.configure_pool(size=2)
+        raw.execute("SELECT 1")
+        wrapper.close()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            raw.execute("SELECT 1")
+        self.assertIsNot(seed.get_pool(), old_pool)
+        self.assertEqual(seed.get_pool().size, 2)
+
+
+class TestParseArgs(unittest.TestCase):
+    """Test suite for the seed.py command line."""
+
+    def test_workers_load_with_executemany(self):
+        args = seed.parse_args(["users.csv", "--workers", "4"])
+        self.assertEqual((args.workers, args.method), (4, "executemany"))
+        args = seed.parse_args(["users.csv", "--method", "infile"])
+        self.assertEqual((args.workers, args.method), (1, "infile"))
+
+    def test_workers_reject_other_methods(self):
+        """Shard workers cannot honor --method, so the combination fails."""
+        for method in ("infile", "rows"):
+            with self.subTest(method=method):
+                stderr = io.StringIO()
+                with contextlib.redirect_stderr(stderr):
+                    with self.assertRaises(SystemExit):
+                        seed.parse_args(["users.csv", "--workers", "2",
+                                         "--method", method])
+                self.assertIn("only supports --method executemany",
+                              stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Tests for snapshot.py write/replay, on the SQLite backend."""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import backends
+import seed
+import snapshot
+from backends import SQLiteBackend, set_backend
+from filters import Col
+from snapshot import Snapshot, snapshot_key, snapshot_users
+
+stream_users = __import__('0-stream_users').stream_users
+
+USERS = [(f"u{i:02d}", f"user {i} é", f"u{i}@x.io", 20 + i)
+         for i in range(25)]
+
+
+class TestSnapshot(unittest.TestCase):
+    """Test suite for snapshot_users and the snapshot file format."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.addCleanup(set_backend, backends._backend)
+        set_backend(SQLiteBackend(os.path.join(self.dir.name, "prodev.db")))
+        seed.configure_pool()
+        self.addCleanup(seed.configure_pool)
+        self.path = os.path.join(self.dir.name, "user_data.snap")
+        with seed.connect_to_prodev() as conn:
+            seed.create_table(conn)
+            seed.insert_rows(conn, USERS)
+
+    def replay_only(self):
+        """Fail the test if snapshot_users goes back to the database."""
+        def live(*args):
+            raise AssertionError("read user_data instead of the snapshot")
+            yield  # pragma: no cover
+        return patch.object(snapshot, "_live_rows", live)
+
+    def test_round_trip(self):
+        """The first run writes the file; later runs replay it unchanged."""
+        first = list(snapshot_users(self.path, row_type="tuple"))
+        self.assertEqual(first, USERS)
+        self.assertTrue(os.path.exists(self.path))
+        with Snapshot(self.path) as snap:
+            self.assertEqual(snap.key, snapshot_key())
+            self.assertEqual(snap.rows, len(USERS))
+            self.assertEqual(list(snap.column("age")),
+                             [row[3] for row in USERS])
+        with self.replay_only():
+            self.assertEqual(list(snapshot_users(self.path,
+                                                 row_type="tuple")), USERS)
+            self.assertEqual(
+                list(stream_users(snapshot=self.path, columns=("name",),
+                                  where=Col("age") >= 43)),
+                [{"name": "user 23 é"}, {"name": "user 24 é"}])
+
+    def test_key_mismatch_reads_the_table_again(self):
+        """A changed row count or max id invalidates the snapshot."""
+        list(snapshot_users(self.path))
+        added = ("u99", "late", "late@x.io", 99)
+        with seed.connect_to_prodev() as conn:
+            seed.insert_rows(conn, [added])
+        rows = list(snapshot_users(self.path, row_type="tuple"))
+        self.assertEqual(rows, USERS + [added])
+        with Snapshot(self.path) as snap:
+            self.assertEqual(snap.key, {"count": 26, "max_id": "u99"})
+        with self.replay_only():
+            self.assertEqual(list(snapshot_users(self.path,
+                                                 row_type="tuple")), rows)
+
+    def test_partial_read_writes_nothing(self):
+        """Only a fully streamed table is kept."""
+        users = snapshot_users(self.path)
+        next(users)
+        users.close()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(os.listdir(self.dir.name), ["prodev.db"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Memory-ceiling tests for 0-stream_users.stream_users."""
+import tracemalloc
+import unittest
+from unittest.mock import MagicMock, patch
+
+stream_users_module = __import__('0-stream_users')
+
+
+class FakeUnbufferedCursor:
+    """Cursor that produces rows lazily, like a server-side cursor."""
+
+    column_names = ("user_id", "name", "email", "age")
+
+    def __init__(self, total_rows):
+        self.total_rows = total_rows
+        self.produced = 0
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self.produced = 0
+
+    def fetchmany(self, size):
+        start = self.produced
+        self.produced = min(start + size, self.total_rows)
+        return [
+            {"user_id": str(i), "name": "user", "email": "u@x.io", "age": 30}
+            for i in range(start, self.produced)
+        ]
+
+    def close(self):
+        self.closed = True
+
+
+class StrictUnbufferedCursor(FakeUnbufferedCursor):
+    """Like mysql-connector: close() refuses while rows are unread."""
+
+    def close(self):
+        if self.produced < self.total_rows:
+            raise RuntimeError("Unread result found")
+        super().close()
+
+
+def fake_connection(total_rows):
+    """Connection handing out a single FakeUnbufferedCursor."""
+    conn = MagicMock()
+    conn.cursor.return_value = FakeUnbufferedCursor(total_rows)
+    return conn
+
+
+def peak_streaming_memory(total_rows, chunk_size):
+    """Stream `total_rows` rows and return the traced peak allocation."""
+    conn = fake_connection(total_rows)
+    with patch.object(stream_users_module, "connect_to_prodev",
+                      return_value=conn):
+        tracemalloc.start()
+        count = 0
+        for _ in stream_users_module.stream_users(streaming=True,
+                                                  chunk_size=chunk_size):
+            count += 1
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return count, peak, conn
+
+
+class TestStreamUsersStreaming(unittest.TestCase):
+    """Test suite for the streaming mode of stream_users."""
+
+    def test_uses_unbuffered_cursor(self):
+        """streaming=True asks the driver for an unbuffered cursor."""
+        count, _, conn = peak_streaming_memory(10, chunk_size=4)
+        self.assertEqual(count, 10)
+        conn.cursor.assert_called_once_with(dictionary=True, buffered=False)
+        self.assertTrue(conn.cursor.return_value.closed)
+        conn.close.assert_called_once()
+
+    def test_memory_stays_flat_as_table_grows(self):
+        """Peak memory does not grow with the number of rows streamed."""
+        _, small_peak, _ = peak_streaming_memory(10_000, chunk_size=500)
+        _, large_peak, _ = peak_streaming_memory(100_000, chunk_size=500)
+        self.assertLess(large_peak, small_peak * 1.5)
+
+    def test_early_exit_releases_connection(self):
+        """Stopping the consumer early still closes cursor and connection."""
+        conn = fake_connection(1_000)
+        with patch.object(stream_users_module, "connect_to_prodev",
+                          return_value=conn):
+            gen = stream_users_module.stream_users(streaming=True,
+                                                   chunk_size=10)
+            next(gen)
+            gen.close()
+        self.assertTrue(conn.cursor.return_value.closed)
+        conn.close.assert_called_once()
+
+    def test_connection_released_when_cursor_close_fails(self):
+        """A cursor that will not close still lets the connection go."""
+        conn = MagicMock()
+        conn.cursor.return_value = StrictUnbufferedCursor(1_000)
+        with patch.object(stream_users_module, "connect_to_prodev",
+                          return_value=conn):
+            gen = stream_users_module.stream_users(streaming=True,
+                                                   chunk_size=10)
+            next(gen)
+            with self.assertRaises(RuntimeError):
+                gen.close()
+        conn.close.assert_called_once()
+
+    def test_mysql_connections_consume_unread_results(self):
+        """MySQL connections drain unread rows instead of refusing close()."""
+        from backends import MySQLBackend
+        driver = MagicMock()
+        with patch.object(MySQLBackend, "_driver", driver):
+            MySQLBackend({"database": "ALX_prodev"}).connect()
+        driver.connect.assert_called_once_with(consume_results=True,
+                                               database="ALX_prodev")
+
+
+if __name__ == "__main__":
+    unittest.main()